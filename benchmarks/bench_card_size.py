@@ -0,0 +1,64 @@
+"""Wire size of alert and digest cards before/after ``fit_card``, and its CPU cost.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_card_size
+"""
+from __future__ import annotations
+
+import time
+
+from src.teams_gw.card_size import DEFAULT_CARD_BUDGET, card_size, fit_card
+from src.teams_gw.cards import build_alert_card, build_alert_digest_card
+
+ALERT = {
+    "nivel": "Nivel 2",
+    "titulo": "Alerta temprana",
+    "cuerpo": "El ticket #147 lleva 1.2 días sin atención.",
+    "url": "https://mi-tablero",
+    "ticket_id": 147,
+    "subject": "Reporte de Incidentes",
+    "requester": {"name": "Luis Flores"},
+    "technician": {"name": "Juan Carlos Melquiades"},
+    "created_at": "Nov 20, 2025 06:13 PM",
+    "umbral": "1.0 días",
+}
+
+
+def _digest(count: int) -> dict:
+    alerts = [
+        {
+            "ticket_id": 1000 + n,
+            "subject": f"Falla intermitente de VPN en sede {n % 40}",
+            "technician": {"name": "Juan Carlos Melquiades"},
+            "umbral": "1.0 días",
+        }
+        for n in range(count)
+    ]
+    return build_alert_digest_card({"nivel": "Nivel 3", "alertas": alerts, "url": "https://mi-tablero"})
+
+
+def _report(label: str, card: dict, repeat: int) -> None:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        pages = fit_card(card)
+    per_call = (time.perf_counter() - start) / repeat * 1e6
+    before = card_size(card)
+    after = sum(card_size(page) for page in pages)
+    biggest = max(card_size(page) for page in pages)
+    print(
+        f"{label:<22} {before:>8,} B -> {after:>8,} B ({1 - after / before:>4.0%} smaller) "
+        f"in {len(pages)} card(s), largest {biggest:,} B, {per_call:,.0f} µs"
+    )
+
+
+def main() -> None:
+    print(f"budget: {DEFAULT_CARD_BUDGET:,} bytes per card")
+    _report("alert card", build_alert_card(ALERT), 2000)
+    _report("digest, 20 tickets", _digest(20), 500)
+    _report("digest, 150 tickets", _digest(150), 100)
+    _report("digest, 600 tickets", _digest(600), 20)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Alert cards per second before/after the compiled card template.
+
+Demo cards are not measured: they are plain literals, and building one is
+cheaper than any copy of a cached dict, so they are built fresh on each call.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_cards
+"""
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Callable, Dict
+
+from src.teams_gw.cards import (
+    _extract_text,
+    _resolve_alert_level,
+    build_alert_card,
+)
+
+PAYLOAD = {
+    "nivel": "Nivel 2",
+    "titulo": "Alerta temprana",
+    "cuerpo": "El ticket #147 lleva 1.2 días sin atención.",
+    "url": "https://mi-tablero",
+    "ticket_id": 147,
+    "subject": "Reporte de Incidentes",
+    "requester": {"name": "Luis Flores"},
+    "technician": {"name": "Juan Carlos Melquiades"},
+    "created_at": "Nov 20, 2025 06:13 PM",
+    "umbral": "1.0 días",
+}
+
+
+def legacy_build_alert_card(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """build_alert_card as it was before the compiled template (rebuilds everything)."""
+
+    level = payload.get("nivel") or "Nivel 1"
+    config = _resolve_alert_level(level)
+    title = payload.get("titulo") or "Alerta temprana"
+    body = payload.get("cuerpo") or ""
+    url = payload.get("url") or "https://example.org"
+    ticket_id = _extract_text(payload.get("ticket_id"))
+    subject = _extract_text(payload.get("subject"))
+    umbral = _extract_text(payload.get("umbral"))
+    requester = _extract_text(payload.get("requester"))
+    technician = _extract_text(payload.get("technician"))
+    created_at = _extract_text(payload.get("created_at"))
+
+    def _row(label: str, value: str | None) -> dict[str, Any] | None:
+        if not value:
+            return None
+        return {
+            "type": "TableRow",
+            "cells": [
+                {
+                    "type": "TableCell",
+                    "items": [{"type": "TextBlock", "text": label, "weight": "Bolder"}],
+                    "style": "accent",
+                },
+                {
+                    "type": "TableCell",
+                    "items": [{"type": "TextBlock", "text": value, "wrap": True}],
+                },
+            ],
+        }
+
+    detail_rows = [
+        _row("Ticket", ticket_id or "N/A"),
+        _row("Asunto", subject or "-"),
+        _row("Solicitante", requester or "-"),
+        _row("Asignado a", technician or "-"),
+        _row("Creado", created_at or "-"),
+        _row("Umbral", umbral or "-"),
+        _row("Nivel", level),
+    ]
+
+    return {
+        "type": "AdaptiveCard",
+        "version": "1.5",
+        "body": [
+            {
+                "type": "ColumnSet",
+                "style": config["style"],
+                "bleed": True,
+                "columns": [
+                    {
+                        "type": "Column",
+                        "width": "auto",
+                        "items": [
+                            {
+                                "type": "Image",
+                                "url": config["icon"],
+                                "size": "Small",
+                                "style": "person",
+                            }
+                        ],
+                    },
+                    {
+                        "type": "Column",
+                        "width": "stretch",
+                        "items": [
+                            {
+                                "type": "TextBlock",
+                                "text": title,
+                                "weight": "Bolder",
+                                "size": "Medium",
+                            },
+                            {
+                                "type": "TextBlock",
+                                "text": f"Dirigido a: {config['audience']}",
+                                "isSubtle": True,
+                                "spacing": "None",
+                            },
+                        ],
+                    },
+                ],
+            },
+            {"type": "TextBlock", "text": body, "wrap": True, "spacing": "Small"},
+            {
+                "type": "Table",
+                "columns": [
+                    {"width": 0.8},
+                    {"width": 1.2},
+                ],
+                "rows": detail_rows or [
+                    _row("Ticket", ticket_id or "N/A"),
+                    _row("Umbral", umbral or "-"),
+                ],
+            },
+            {
+                "type": "ActionSet",
+                "actions": [
+                    {
+                        "type": "Action.OpenUrl",
+                        "title": "Ver tablero",
+                        "url": url,
+                    }
+                ],
+            },
+        ],
+    }
+
+
+def _rate(fn: Callable[[], Any], seconds: float = 1.0) -> float:
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            fn()
+        count += 100
+    return count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    assert json.dumps(build_alert_card(PAYLOAD), sort_keys=True) == json.dumps(
+        legacy_build_alert_card(PAYLOAD), sort_keys=True
+    ), "compiled template must render the same card"
+
+    cases: Dict[str, tuple[Callable[[], Any], Callable[[], Any]]] = {
+        "alert card": (lambda: legacy_build_alert_card(PAYLOAD), lambda: build_alert_card(PAYLOAD)),
+    }
+    print(f"{'case':<18}{'before/s':>14}{'after/s':>14}{'speedup':>10}")
+    for name, (before, after) in cases.items():
+        before_rate = _rate(before)
+        after_rate = _rate(after)
+        print(f"{name:<18}{before_rate:>14,.0f}{after_rate:>14,.0f}{after_rate / before_rate:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Proactive sends per second against a local stub Bot Connector.
+
+Compares the stock ``ConnectorClient`` transport (``requests`` in the executor)
+with clients sharing the gateway's keep-alive pool. The stub listens on plain
+HTTP on localhost, so TLS handshakes — the larger cost of cold connections
+against ``smba.trafficmanager.net`` — are not even counted here.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_connector
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Callable
+
+from aiohttp import web
+from botbuilder.schema import Activity
+from botframework.connector.aio import ConnectorClient
+from botframework.connector.auth import MicrosoftAppCredentials
+
+from src.teams_gw.connector_pool import ConnectorSessionPool, build_pooled_connector_client
+
+SENDS = 600
+CONCURRENCY = 16
+CONVERSATION_ID = "a:bench-conversation"
+
+
+async def _send_activity(request: web.Request) -> web.Response:
+    await request.read()
+    return web.json_response({"id": "1"})
+
+
+async def _start_stub() -> tuple[web.AppRunner, str]:
+    stub = web.Application()
+    stub.router.add_post("/v3/conversations/{conversation_id}/activities", _send_activity)
+    runner = web.AppRunner(stub, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/"
+
+
+async def _measure(label: str, client_for: Callable[[], ConnectorClient]) -> float:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    activity = Activity(type="message", text="ping")
+
+    async def one() -> None:
+        async with semaphore:
+            await client_for().conversations.send_to_conversation(CONVERSATION_ID, activity)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(SENDS)))
+    rate = SENDS / (time.perf_counter() - start)
+    print(f"{label:<40} {rate:>10,.0f} msg/s")
+    return rate
+
+
+async def main() -> None:
+    runner, service_url = await _start_stub()
+    credentials = MicrosoftAppCredentials.empty()
+    pool = ConnectorSessionPool()
+    try:
+        await _measure("stock client, new per send", lambda: ConnectorClient(credentials, base_url=service_url))
+        stock = ConnectorClient(credentials, base_url=service_url)
+        baseline = await _measure("stock client, cached", lambda: stock)
+        pooled_client = build_pooled_connector_client(credentials, service_url, pool)
+        pooled = await _measure("pooled keep-alive client", lambda: pooled_client)
+        print(f"speedup vs cached stock client: {pooled / baseline:.1f}x")
+    finally:
+        await pool.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
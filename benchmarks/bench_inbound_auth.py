@@ -0,0 +1,107 @@
+"""Per-request cost of validating the inbound Bearer token on ``/api/messages``.
+
+Signs a token locally and serves OpenID metadata/JWKS from a stub endpoint,
+then times ``_authenticate_request`` for the stock adapter, for the shared
+pre-parsed key registry alone, and with the validated-token cache on top.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_inbound_auth
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from botbuilder.core import BotFrameworkAdapter, BotFrameworkAdapterSettings
+from botbuilder.schema import Activity
+from botframework.connector.auth import ChannelValidation, JwtTokenExtractor
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from src.teams_gw.adapter import GatewayAdapter
+from src.teams_gw.dedup import TimedDedupCache
+from src.teams_gw.inbound_auth import OpenIdMetadataRegistry
+
+APP_ID = "00000000-0000-0000-0000-000000000001"
+SERVICE_URL = "https://smba.trafficmanager.net/amer/"
+KEY_ID = "bench-key"
+REQUESTS = 2000
+
+
+def _start_stub(jwk: dict) -> tuple[ThreadingHTTPServer, str]:
+    # Own thread: the stock metadata client fetches with blocking requests on the loop.
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path == "/.well-known/openid-configuration":
+                body = {"jwks_uri": f"http://{self.headers['Host']}/keys"}
+            else:
+                body = {"keys": [jwk]}
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/.well-known/openid-configuration"
+
+
+async def _measure(label: str, adapter: BotFrameworkAdapter, activity: Activity, header: str) -> float:
+    await adapter._authenticate_request(activity, header)  # warm metadata
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        identity = await adapter._authenticate_request(activity, header)
+    per_request = (time.perf_counter() - start) / REQUESTS * 1e6
+    assert identity.is_authenticated
+    print(f"{label:<44} {per_request:>9.1f} µs/request")
+    return per_request
+
+
+async def main() -> None:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update(kid=KEY_ID, endorsements=["msteams"])
+    server, metadata_url = _start_stub(jwk)
+    ChannelValidation.open_id_metadata_endpoint = metadata_url
+
+    now = int(time.time())
+    token = jwt.encode(
+        {"iss": "https://api.botframework.com", "aud": APP_ID, "serviceurl": SERVICE_URL, "nbf": now - 60, "exp": now + 3600},
+        private_key,
+        algorithm="RS256",
+        headers={"kid": KEY_ID},
+    )
+    header = f"Bearer {token}"
+    activity = Activity(type="message", channel_id="msteams", service_url=SERVICE_URL)
+    adapter_settings = BotFrameworkAdapterSettings(APP_ID, "secret")
+
+    try:
+        stock_get_metadata = JwtTokenExtractor.get_open_id_metadata
+        baseline = await _measure("stock adapter", BotFrameworkAdapter(adapter_settings), activity, header)
+
+        OpenIdMetadataRegistry().install()
+        await _measure("pre-parsed shared JWKS", GatewayAdapter(adapter_settings), activity, header)
+        cached = await _measure(
+            "pre-parsed JWKS + validated-token cache",
+            GatewayAdapter(adapter_settings, auth_cache=TimedDedupCache(ttl=3600)),
+            activity,
+            header,
+        )
+        print(f"speedup: {baseline / cached:.0f}x")
+    finally:
+        JwtTokenExtractor.get_open_id_metadata = stock_get_metadata
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""CPU spent per ``/api/messages`` call on serviceUrl trust and inbound logging.
+
+Compares the former per-request work (urlparse + URL variants + trust calls and
+two INFO lines) with the memoized trust and the sampled access log. Logs go to
+an in-memory stream so formatting cost is counted but no I/O.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_inbound_overhead
+"""
+from __future__ import annotations
+
+import io
+import logging
+import os
+import time
+from urllib.parse import urlparse
+
+os.environ.setdefault("MICROSOFT_APP_ID", "bench-app")
+os.environ.setdefault("MICROSOFT_APP_PASSWORD", "bench-secret")
+
+from botbuilder.schema import Activity, ChannelAccount, ConversationAccount  # noqa: E402
+from botframework.connector.auth import MicrosoftAppCredentials  # noqa: E402
+
+from src.teams_gw import app as gateway  # noqa: E402
+
+REQUESTS = 20_000
+log = logging.getLogger("teams_gw.app")
+
+
+def legacy_prepare(activity: Activity) -> None:
+    rid = (activity.recipient and activity.recipient.id) or ""
+    rid_norm = rid.split(":", 1)[-1] if rid else ""
+    log.info(
+        "Incoming activity: {'type': %s, 'channel_id': %s, 'service_url': %s, "
+        "'conversation_id': %s, 'from_id': %s, 'recipient_id': %s, "
+        "'recipient_id_normalized': %s, 'env_app_id': %s}",
+        activity.type,
+        activity.channel_id,
+        activity.service_url,
+        (activity.conversation and activity.conversation.id),
+        (activity.from_property and activity.from_property.id),
+        rid,
+        rid_norm,
+        gateway.settings.MICROSOFT_APP_ID,
+    )
+    svc = activity.service_url
+    p = urlparse(svc)
+    host_root = f"{p.scheme}://{p.netloc}/"
+    path_parts = [seg for seg in p.path.split("/") if seg]
+    region_base = f"{p.scheme}://{p.netloc}/{path_parts[0]}/" if path_parts else host_root
+    variants = {svc, host_root, region_base}
+    variants |= {u.rstrip("/") for u in variants if u.endswith("/")}
+    for u in variants:
+        if u:
+            MicrosoftAppCredentials.trust_service_url(u)
+    log.info("Trusted service URLs: %s", sorted(variants))
+
+
+def current_prepare(activity: Activity) -> None:
+    started = time.perf_counter()
+    gateway._trust_service_url(activity.service_url)
+    gateway._log_inbound(activity, 200, started)
+
+
+def _measure(label: str, prepare, activity: Activity) -> float:
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        prepare(activity)
+    per_request = (time.perf_counter() - start) / REQUESTS * 1e6
+    print(f"{label:<36} {per_request:>8.2f} µs/request")
+    return per_request
+
+
+def main() -> None:
+    sink = logging.StreamHandler(io.StringIO())
+    # Same sampling the gateway's log pipeline applies (LOG_SAMPLE_EVERY).
+    sink.addFilter(gateway.log_pipeline.sampler)
+    for name in ("teams_gw.app", "teams_gw.access"):
+        logger = logging.getLogger(name)
+        logger.handlers = [sink]
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+
+    activity = Activity(
+        type="message",
+        id="1700000000000",
+        channel_id="msteams",
+        service_url="https://smba.trafficmanager.net/amer/",
+        conversation=ConversationAccount(id="a:1bench-conversation"),
+        from_property=ChannelAccount(id="29:user"),
+        recipient=ChannelAccount(id="28:bench-app"),
+    )
+    before = _measure("per-request trust + INFO logs", legacy_prepare, activity)
+    every = gateway.settings.LOG_SAMPLE_EVERY.get("teams_gw.access", 1)
+    after = _measure(f"memoized trust + 1/{every} sampled log", current_prepare, activity)
+    print(f"saved {before - after:.2f} µs/request ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
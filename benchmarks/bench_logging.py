@@ -0,0 +1,57 @@
+"""Time the event loop spends inside ``log.info`` when stdout is slow.
+
+A stream that sleeps on every write stands in for a congested container
+stdout. The stock ``StreamHandler`` pays that latency on the calling thread;
+``LogPipeline`` only enqueues and lets its listener thread absorb it.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_logging
+"""
+from __future__ import annotations
+
+import io
+import logging
+import time
+
+from src.teams_gw.logs import LogPipeline
+
+RECORDS = 500
+WRITE_DELAY = 0.0005
+
+
+class SlowStream(io.StringIO):
+    def write(self, text: str) -> int:
+        time.sleep(WRITE_DELAY)
+        return super().write(text)
+
+
+def _measure(label: str, logger: logging.Logger) -> float:
+    fields = {"status": 200, "type": "message", "convo": "a:1bench", "region": "smba.trafficmanager.net/amer"}
+    start = time.perf_counter()
+    for n in range(RECORDS):
+        logger.info("status=200 activity=%s", n, extra={"access": fields})
+    per_record = (time.perf_counter() - start) / RECORDS * 1e6
+    print(f"{label:<32} {per_record:>9.1f} µs/record on the caller")
+    return per_record
+
+
+def main() -> None:
+    logger = logging.getLogger("teams_gw.bench_logging")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    logger.handlers = [logging.StreamHandler(SlowStream())]
+    before = _measure("StreamHandler (sync)", logger)
+
+    pipeline = LogPipeline(stream=SlowStream())
+    pipeline.install(logger)
+    after = _measure("LogPipeline (queue + JSON)", logger)
+    flush_start = time.perf_counter()
+    pipeline.stop()
+    print(f"listener drained the backlog in {time.perf_counter() - flush_start:.2f}s off the caller")
+    print(f"caller time cut {before / after:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import time
+from functools import partial
+from typing import List, Optional
+
+from botbuilder.core import BotFrameworkAdapter, BotFrameworkAdapterSettings, TurnContext
+from botbuilder.core.bot_framework_adapter import USER_AGENT
+from botbuilder.schema import Activity, ResourceResponse
+from botframework.connector.aio import ConnectorClient
+from botframework.connector.auth import AppCredentials, ClaimsIdentity, MicrosoftAppCredentials
+
+from .connector_pool import ConnectorClientCache, ConnectorSessionPool, build_pooled_connector_client
+from .dedup import TimedDedupCache
+from .inbound_auth import auth_cache_key
+from .ratelimit import OutboundRateLimiter
+
+_UNTHROTTLED_TYPES = {"delay", "invokeResponse", "trace"}
+
+
+class GatewayAdapter(BotFrameworkAdapter):
+    """BotFrameworkAdapter that routes every outbound call through the gateway's rate limiter.
+
+    Both bot replies and ``continue_conversation`` end up in ``send_activities``, so
+    throttling here covers every ``send_activity`` path. Connector clients come
+    from a bounded cache and, when ``connector_pool`` is set, share its
+    keep-alive HTTP session. Validated inbound tokens are remembered until their
+    ``exp`` when ``auth_cache`` is set.
+    """
+
+    def __init__(
+        self,
+        adapter_settings: BotFrameworkAdapterSettings,
+        *,
+        rate_limiter: Optional[OutboundRateLimiter] = None,
+        connector_pool: Optional[ConnectorSessionPool] = None,
+        connector_cache_size: int = 256,
+        auth_cache: Optional[TimedDedupCache[ClaimsIdentity]] = None,
+    ) -> None:
+        super().__init__(adapter_settings)
+        self.rate_limiter = rate_limiter
+        self.connector_pool = connector_pool
+        self.connector_clients = ConnectorClientCache(connector_cache_size)
+        self.auth_cache = auth_cache
+
+    async def _authenticate_request(self, request: Activity, auth_header: str) -> ClaimsIdentity:
+        if self.auth_cache is None or not auth_header:
+            return await super()._authenticate_request(request, auth_header)
+        key = auth_cache_key(auth_header, request.channel_id, request.service_url)
+        identity = self.auth_cache.get(key)
+        if identity is not None:
+            return identity
+        identity = await super()._authenticate_request(request, auth_header)
+        expires_at = identity.claims.get("exp") if identity.claims else None
+        if isinstance(expires_at, (int, float)):
+            ttl = expires_at - time.time()
+            if ttl > 0:
+                self.auth_cache.put(key, identity, ttl=ttl)
+        return identity
+
+    async def authenticate(self, activity: Activity, auth_header: str) -> ClaimsIdentity:
+        """Validate ``auth_header`` for ``activity``; raises ``PermissionError`` when it is rejected.
+
+        Public entry point for routes that authenticate before running the turn,
+        so they do not depend on botbuilder's private ``_authenticate_request``.
+        """
+        return await self._authenticate_request(activity, auth_header)
+
+    def _get_or_create_connector_client(self, service_url: str, credentials: AppCredentials) -> ConnectorClient:
+        if not credentials:
+            credentials = MicrosoftAppCredentials.empty()
+        key = BotFrameworkAdapter.key_for_connector_client(
+            service_url, credentials.microsoft_app_id, credentials.oauth_scope
+        )
+        client = self.connector_clients.get(key)
+        if client is None:
+            if self.connector_pool is not None:
+                client = build_pooled_connector_client(credentials, service_url, self.connector_pool)
+            else:
+                client = ConnectorClient(credentials, base_url=service_url)
+            client.config.add_user_agent(USER_AGENT)
+            self.connector_clients.put(key, client)
+        return client
+
+    async def send_activities(self, context: TurnContext, activities: List[Activity]) -> List[ResourceResponse]:
+        if not self.rate_limiter:
+            return await super().send_activities(context, activities)
+
+        responses: List[ResourceResponse] = []
+        for activity in activities:
+            send = partial(BotFrameworkAdapter.send_activities, self, context, [activity])
+            if activity.type in _UNTHROTTLED_TYPES:
+                responses.extend(await send())
+                continue
+            conversation_id = activity.conversation.id if activity.conversation else None
+            responses.extend(await self.rate_limiter.call(conversation_id, activity.service_url, send))
+        return responses
+
+    async def update_activity(self, context: TurnContext, activity: Activity):
+        if not self.rate_limiter:
+            return await super().update_activity(context, activity)
+        conversation_id = activity.conversation.id if activity.conversation else None
+        update = partial(BotFrameworkAdapter.update_activity, self, context, activity)
+        return await self.rate_limiter.call(conversation_id, activity.service_url, update)
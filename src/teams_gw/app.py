@@ -1,35 +1,45 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
 import inspect
+import json
 import logging
 import os
 import time
-from typing import Any, Optional
+from contextlib import asynccontextmanager
+from typing import Any, Literal, Optional
 from urllib.parse import urlparse
 
-from fastapi import Depends, FastAPI, Header, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 from botbuilder.core import (
-    BotFrameworkAdapter,
     BotFrameworkAdapterSettings,
     ConversationState,
-    MemoryStorage,
     MessageFactory,
     TurnContext,
 )
-from botbuilder.schema import Activity, Attachment
+from botbuilder.schema import Activity, ActivityTypes, Attachment, ConversationReference
 from botframework.connector import models as connector_models  # <-- para capturar el error
-from botframework.connector.auth import MicrosoftAppCredentials
+from botframework.connector.auth import ClaimsIdentity, MicrosoftAppCredentials
 from botframework.connector.auth import microsoft_app_credentials as mac
-from msal import ConfidentialClientApplication
 
+from .adapter import GatewayAdapter
+from .card_size import fit_card
+from .connector_pool import ConnectorSessionPool
 from .bot import TeamsGatewayBot
-from .cards import build_alert_card
-from .conversation_store import conversation_store
+from .cards import alert_priority, build_alert_card, build_alert_digest_card
+from .coalesce import AlertCoalescer
+from .controller_cache import controller_snapshot
+from .conversation_store import conversation_store, parse_ndjson_lines
+from .dedup import TimedDedupCache
+from .delivery import DeliveryQueue, PermanentDeliveryError
 from .dashboard import (
+    ROLE_META,
     build_dashboard_payload,
+    controller_base_url,
     fetch_controller_generic,
     fetch_controller_metrics,
     normalize_roles,
@@ -41,10 +51,26 @@ from .dashboard import (
     render_executive_dashboard_html,
 )
 from .health import router as health_router
+from .inbound_auth import OpenIdMetadataRegistry
+from .logs import LogPipeline
+from .ratelimit import OutboundRateLimiter, region_key
 from .settings import settings
-
-logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+from .state_storage import state_storage
+from .tokens import AppTokenProvider, default_token_provider, normalize_scope, token_refresher, token_registry
+from .turns import TurnExecutor, TurnFailed
+
+# Los registros se escriben desde un hilo aparte: stdout lento no bloquea el event loop.
+log_pipeline = LogPipeline(
+    level=settings.LOG_LEVEL,
+    json_format=settings.LOG_FORMAT == "json",
+    sample_every=settings.LOG_SAMPLE_EVERY,
+    rate_limits=settings.LOG_RATE_LIMITS,
+    max_queue=settings.LOG_QUEUE_MAX_ITEMS,
+)
+log_pipeline.install(capture=("uvicorn", "uvicorn.error", "uvicorn.access"))
+atexit.register(log_pipeline.stop)
 log = logging.getLogger("teams_gw.app")
+access_log = logging.getLogger("teams_gw.access")
 
 
 class ProactiveMessageRequest(BaseModel):
@@ -55,6 +81,10 @@ class ProactiveMessageRequest(BaseModel):
     user_id: Optional[str] = Field(default=None, description="ChannelAccount.id del usuario.")
     aad_object_id: Optional[str] = Field(default=None, description="Azure AD object id del usuario.")
     payload: Optional[dict[str, Any]] = Field(default=None, description="Payload opcional para renderizar tarjetas.")
+    update: bool = Field(
+        default=False,
+        description="Reemplaza la tarjeta ya enviada a la conversación para el mismo payload.ticket_id en lugar de publicar otra.",
+    )
 
     @model_validator(mode="after")
     def validate_target(self) -> "ProactiveMessageRequest":
@@ -65,6 +95,46 @@ class ProactiveMessageRequest(BaseModel):
         return self
 
 
+class ProactiveBatchRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    items: list[ProactiveMessageRequest] = Field(min_length=1, description="Destinos y mensajes a enviar.")
+    concurrency: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Envíos simultáneos; por defecto PROACTIVE_BATCH_CONCURRENCY.",
+    )
+
+
+class ProactiveBroadcastRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    tenant_id: Optional[str] = Field(default=None, description="Todas las conversaciones del tenant, o filtro de los demás selectores.")
+    aad_object_ids: list[str] = Field(default_factory=list, description="Usuarios destino por Azure AD object id.")
+    roles: list[str] = Field(default_factory=list, description="Roles del tablero o de notificación registrados en /api/roles.")
+    message: Optional[str] = Field(default=None, description="Texto opcional que se enviará a cada destino.")
+    payload: Optional[dict[str, Any]] = Field(default=None, description="Payload opcional para renderizar tarjetas.")
+    update: bool = Field(
+        default=False,
+        description="Reemplaza la tarjeta ya enviada a la conversación para el mismo payload.ticket_id en lugar de publicar otra.",
+    )
+    concurrency: Optional[int] = Field(default=None, ge=1, description="Envíos simultáneos; por defecto PROACTIVE_BATCH_CONCURRENCY.")
+
+    @model_validator(mode="after")
+    def validate_target(self) -> "ProactiveBroadcastRequest":
+        if not (self.tenant_id or self.aad_object_ids or self.roles):
+            raise ValueError("Debes indicar tenant_id, aad_object_ids o roles.")
+        if not (self.message or self.payload):
+            raise ValueError("Debes enviar al menos message o payload.")
+        return self
+
+
+class RoleMembersRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    members: list[str] = Field(description="aad_object_id (o user_id) de los usuarios del rol.")
+
+
 async def verify_api_key(
     x_api_key: Optional[str] = Header(default=None),
     authorization: Optional[str] = Header(default=None),
@@ -81,7 +151,39 @@ async def verify_api_key(
         raise HTTPException(status_code=401, detail="invalid_api_key")
 
 
-app = FastAPI(title="teams_gw")
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await _load_conversation_snapshot()
+    for role, members in settings.BROADCAST_ROLE_MEMBERS.items():
+        await conversation_store.set_role_members(role, members)
+    if delivery_queue:
+        await delivery_queue.start()
+    if settings.MICROSOFT_APP_ID:
+        # Token listo antes de aceptar tráfico: get_access_token nunca llama a MSAL en el event loop.
+        provider = default_token_provider()
+        try:
+            await provider.refresh(force=False)
+        except Exception as exc:
+            log.warning("Could not warm the app token at startup, retrying in background: %r", exc)
+            token_refresher.track(provider, warm=True)
+    token_refresher.start()
+    openid_metadata.start()
+    controller_snapshot.start()
+    yield
+    if turn_executor:
+        await turn_executor.drain(settings.INBOUND_TURN_DRAIN_SECONDS)
+    await controller_snapshot.stop()
+    await openid_metadata.stop()
+    await token_refresher.stop()
+    if alert_coalescer:
+        await alert_coalescer.flush_all()
+    if delivery_queue:
+        await delivery_queue.stop(settings.PROACTIVE_QUEUE_DRAIN_SECONDS)
+    if connector_pool:
+        await connector_pool.close()
+
+
+app = FastAPI(title="teams_gw", lifespan=lifespan)
 app.include_router(health_router)
 
 for env_key, env_value in {
@@ -101,110 +203,203 @@ log.info(
 )
 
 
-def _msal_authority(creds: MicrosoftAppCredentials) -> str:
+def _msal_tenant(creds: MicrosoftAppCredentials) -> str:
     authority = getattr(creds, "authority", None)
     if authority:
-        return authority
-    tenant = getattr(creds, "oauth_tenant", None) or os.getenv("MicrosoftAppTenantId") or "botframework.com"
-    return f"https://login.microsoftonline.com/{tenant}"
+        return authority.rstrip("/").rsplit("/", 1)[-1]
+    return getattr(creds, "oauth_tenant", None) or os.getenv("MicrosoftAppTenantId") or "botframework.com"
+
+
+def _token_provider(creds: MicrosoftAppCredentials) -> AppTokenProvider:
+    """Proveedor compartido del proceso para (app_id, tenant, scope) de estas credenciales."""
+    provider = getattr(creds, "_patched_token_provider", None)
+    if provider is None:
+        provider = token_registry.provider(
+            getattr(creds, "microsoft_app_id", None) or settings.MICROSOFT_APP_ID,
+            getattr(creds, "microsoft_app_password", None) or settings.MICROSOFT_APP_PASSWORD,
+            _msal_tenant(creds),
+            normalize_scope(getattr(creds, "oauth_scope", None) or os.getenv("MicrosoftAppOAuthScope")),
+        )
+        creds._patched_token_provider = provider
+    return provider
 
 
 def _patched_get_access_token(self: MicrosoftAppCredentials) -> str:
-    cached = getattr(self, "_patched_token", None)
-    expires_at = getattr(self, "_patched_token_expires_at", 0)
-    if cached and expires_at - time.time() > 300:
-        return cached
-
-    scope = getattr(self, "oauth_scope", None) or os.getenv("MicrosoftAppOAuthScope") or "https://api.botframework.com/.default"
-    scope = scope.strip()
-    if not scope.endswith("/.default"):
-        scope = f"{scope.rstrip('/')}/.default"
-    app = getattr(self, "_patched_msal_app", None)
-    if not app:
-        app = ConfidentialClientApplication(
-            client_id=getattr(self, "microsoft_app_id", None) or settings.MICROSOFT_APP_ID,
-            client_credential=getattr(self, "microsoft_app_password", None) or settings.MICROSOFT_APP_PASSWORD,
-            authority=_msal_authority(self),
-        )
-        self._patched_msal_app = app
+    # signed_session síncrono (sin pool): en el event loop nunca llama a MSAL, falla rápido si no hay token.
+    return _token_provider(self).get_token()
+
 
-    result = app.acquire_token_for_client(scopes=[scope])
-    token = result.get("access_token")
-    if not token:
-        raise RuntimeError(f"Could not acquire access token via MSAL: {result}")
-    ttl = int(result.get("expires_in", 3600))
-    self._patched_token = token
-    self._patched_token_expires_at = time.time() + ttl
-    return token
+async def _patched_get_access_token_async(self: MicrosoftAppCredentials) -> str:
+    # Usado por el pool del Bot Connector: MSAL corre en un hilo, nunca en el event loop.
+    return await _token_provider(self).get_token_async()
 
 
 mac.MicrosoftAppCredentials.get_access_token = _patched_get_access_token
+mac.MicrosoftAppCredentials.get_access_token_async = _patched_get_access_token_async
 
 
 adapter_settings = BotFrameworkAdapterSettings(
     settings.MICROSOFT_APP_ID,
     settings.MICROSOFT_APP_PASSWORD,
 )
-adapter = BotFrameworkAdapter(adapter_settings)
+rate_limiter = (
+    OutboundRateLimiter(
+        conversation_rate=settings.TEAMS_CONVERSATION_RATE,
+        conversation_burst=settings.TEAMS_CONVERSATION_BURST,
+        region_rate=settings.TEAMS_REGION_RATE,
+        region_burst=settings.TEAMS_REGION_BURST,
+        max_retries=settings.TEAMS_THROTTLE_MAX_RETRIES,
+    )
+    if settings.TEAMS_RATE_LIMIT_ENABLED
+    else None
+)
+connector_pool = (
+    ConnectorSessionPool(
+        limit=settings.CONNECTOR_POOL_LIMIT,
+        limit_per_host=settings.CONNECTOR_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=settings.CONNECTOR_POOL_KEEPALIVE_SECONDS,
+    )
+    if settings.CONNECTOR_POOL_ENABLED
+    else None
+)
+openid_metadata = OpenIdMetadataRegistry(
+    refresh_interval=settings.OPENID_METADATA_REFRESH_SECONDS,
+    unknown_kid_interval=settings.OPENID_UNKNOWN_KID_REFRESH_SECONDS,
+)
+openid_metadata.install()
+adapter = GatewayAdapter(
+    adapter_settings,
+    rate_limiter=rate_limiter,
+    connector_pool=connector_pool,
+    connector_cache_size=settings.CONNECTOR_CLIENT_CACHE_SIZE,
+    auth_cache=(
+        TimedDedupCache(ttl=3600, max_items=settings.INBOUND_AUTH_CACHE_MAX_ITEMS)
+        if settings.INBOUND_AUTH_CACHE_ENABLED
+        else None
+    ),
+)
 ADAPTER_KIND = "BotFrameworkAdapter"
 
 
-conversation_state = ConversationState(MemoryStorage())
+conversation_state = ConversationState(state_storage)
 bot = TeamsGatewayBot(conversation_state)
 ACTIVE_DASHBOARD_ROLES = normalize_roles(settings.DASHBOARD_ROLES)
 
+# Reintentos de Teams: misma (conversación, activity id) dentro de la ventana se confirma sin procesar.
+inbound_dedup: TimedDedupCache[bool] = TimedDedupCache(
+    ttl=settings.INBOUND_DEDUP_SECONDS,
+    max_items=settings.INBOUND_DEDUP_MAX_ITEMS,
+)
+
+turn_executor: Optional[TurnExecutor] = (
+    TurnExecutor(
+        concurrency=settings.INBOUND_TURN_CONCURRENCY,
+        max_pending=settings.INBOUND_TURN_MAX_PENDING,
+    )
+    if settings.INBOUND_FAST_ACK
+    else None
+)
+
+# serviceUrl ya confiados: se confían una vez por URL distinta.
+trusted_service_urls: TimedDedupCache[bool] = TimedDedupCache(
+    ttl=settings.SERVICE_URL_TRUST_SECONDS,
+    max_items=settings.SERVICE_URL_TRUST_MAX_ITEMS,
+)
+
+# Idempotency-Key (o ticket_id + nivel + destino) de los envíos proactivos.
+proactive_dedup: TimedDedupCache[dict[str, Any]] = TimedDedupCache(
+    ttl=settings.PROACTIVE_DEDUP_SECONDS,
+    max_items=settings.PROACTIVE_DEDUP_MAX_ITEMS,
+)
+
+# Tarjeta publicada por (conversación, ticket_id) para actualizarla en sitio.
+card_activity_index: TimedDedupCache[str] = TimedDedupCache(
+    ttl=settings.PROACTIVE_CARD_TRACK_SECONDS,
+    max_items=settings.PROACTIVE_CARD_TRACK_MAX_ITEMS,
+)
+
+# Coalescer y cola durable: sus funciones de envío se definen más abajo y se resuelven al llamarlas.
+alert_coalescer: Optional[AlertCoalescer] = None
+if settings.PROACTIVE_COALESCE_SECONDS > 0:
+    alert_coalescer = AlertCoalescer(
+        lambda reference, level, items: _flush_alert_digest(reference, level, items),
+        window=settings.PROACTIVE_COALESCE_SECONDS,
+        max_items=settings.PROACTIVE_COALESCE_MAX_ITEMS,
+    )
+
+delivery_queue: Optional[DeliveryQueue] = None
+if settings.PROACTIVE_QUEUE_PATH:
+    delivery_queue = DeliveryQueue(
+        settings.PROACTIVE_QUEUE_PATH,
+        lambda request: _send_queued_delivery(request),
+        workers=settings.PROACTIVE_QUEUE_WORKERS,
+        max_attempts=settings.PROACTIVE_QUEUE_MAX_ATTEMPTS,
+        aging_seconds=settings.PROACTIVE_QUEUE_AGING_SECONDS,
+        reserved_workers=settings.PROACTIVE_QUEUE_RESERVED_WORKERS,
+        reserved_min_priority=settings.PROACTIVE_QUEUE_RESERVED_MIN_PRIORITY,
+        retention_seconds=settings.PROACTIVE_QUEUE_RETENTION_HOURS * 3600 or None,
+    )
+
+
 @app.post("/api/messages")
 async def messages(request: Request):
+    started = time.perf_counter()
     body = await request.json()
     activity = Activity().deserialize(body)
     auth_header = request.headers.get("Authorization", "")
 
-    rid = (activity.recipient and activity.recipient.id) or ""
-    rid_norm = rid.split(":", 1)[-1] if rid else ""
+    _trust_service_url(getattr(activity, "service_url", None))
+    dedup_key = _inbound_dedup_key(activity)
+
+    # El token se valida una sola vez y antes que nada, en línea o en fast-ack: un token inválido es 401.
+    try:
+        identity = await adapter.authenticate(activity, auth_header)
+    except Exception as e:
+        log.warning("Rejected inbound activity: %r", e)
+        _log_inbound(activity, 401, started)
+        return JSONResponse(status_code=401, content={"ok": False, "error": "unauthorized"})
+    if dedup_key and not inbound_dedup.add(dedup_key):
+        return _ack_duplicate(activity, started)
+
+    # Fast-ack: se responde 200 y el turno corre en segundo plano.
+    # Los invoke necesitan la respuesta del bot en el cuerpo, así que siempre van en línea.
+    if turn_executor and activity.type != ActivityTypes.invoke:
+        conversation_id = activity.conversation.id if activity.conversation else ""
+        if turn_executor.submit(conversation_id, lambda: _background_turn(activity, identity)):
+            _log_inbound(activity, 200, started)
+            return {"ok": True, "queued": True}
+        log.warning("Turn executor full (pending=%s), processing inline", turn_executor.pending)
+    status, response = await _run_turn(activity, identity)
+    if dedup_key and status != 200:
+        # Sin respuesta 200 Teams reintenta; ese reintento sí debe procesarse.
+        inbound_dedup.discard(dedup_key)
+    _log_inbound(activity, status, started)
+    return response
+
+
+def _inbound_dedup_key(activity: Activity) -> Optional[tuple[str, str]]:
+    # Los invoke esperan la respuesta del bot en el cuerpo; no se pueden confirmar a ciegas.
+    if activity.type == ActivityTypes.invoke or not activity.id or not activity.conversation:
+        return None
+    return activity.conversation.id, activity.id
+
+
+def _ack_duplicate(activity: Activity, started: float) -> dict[str, Any]:
     log.info(
-        "Incoming activity: {'type': %s, 'channel_id': %s, 'service_url': %s, "
-        "'conversation_id': %s, 'from_id': %s, 'recipient_id': %s, "
-        "'recipient_id_normalized': %s, 'env_app_id': %s}",
-        activity.type,
-        activity.channel_id,
-        activity.service_url,
-        (activity.conversation and activity.conversation.id),
-        (activity.from_property and activity.from_property.id),
-        rid,
-        rid_norm,
-        settings.MICROSOFT_APP_ID,
+        "Suppressed inbound retry: convo=%s activityId=%s (total=%s)",
+        activity.conversation.id, activity.id, inbound_dedup.hits,
     )
+    _log_inbound(activity, 200, started)
+    return {"ok": True, "duplicate": True}
 
-    # Confiamos explíticamente serviceUrl y host base (bien para Teams)
-    svc = getattr(activity, "service_url", None)
-    if svc:
-        try:
-            p = urlparse(svc)
-            # host raíz
-            host_root = f"{p.scheme}://{p.netloc}/"
-            # base regional (primer segmento del path, p.ej. "amer/")
-            path_parts = [seg for seg in p.path.split("/") if seg]
-            region_base = f"{p.scheme}://{p.netloc}/{path_parts[0]}/" if path_parts else host_root
-
-            # Confiar: URL completa, host raíz y base regional (ambos con/sin "/")
-            variants = {svc, host_root, region_base}
-            variants |= {u.rstrip("/") for u in variants if u.endswith("/")}
-
-            for u in variants:
-                if u:
-                    MicrosoftAppCredentials.trust_service_url(u)
-
-            log.info("Trusted service URLs: %s", sorted(variants))
-        except Exception as e:
-            log.warning("Could not trust serviceUrl variants: %s (%s)", svc, e)
-   
 
+async def _run_turn(activity: Activity, identity: ClaimsIdentity) -> tuple[int, Any]:
     async def aux_logic(turn_context: TurnContext):
         await bot.on_turn(turn_context)
 
     try:
-        await adapter.process_activity(activity, auth_header, aux_logic)
-        return {"ok": True}
+        await adapter.process_activity_with_identity(activity, identity, aux_logic)
+        return 200, {"ok": True}
     except connector_models.ErrorResponseException as e:
         status, reason, body_text = await _extract_error_details(e)
         inner_details = _format_inner_error(e)
@@ -215,12 +410,87 @@ async def messages(request: Request):
             getattr(activity, "id", None),
             body_text, e, getattr(e, "inner_exception", None), inner_details,
         )
-        return JSONResponse(status_code=502, content={"ok": False, "error": "connector_unauthorized"})
+        return 502, JSONResponse(status_code=502, content={"ok": False, "error": "connector_unauthorized"})
     except Exception as e:
         if isinstance(e, KeyError) and e.args == ("access_token",):
             await _log_auth_context()
         log.exception("Unexpected error replying to Teams: %s", e)
-        return JSONResponse(status_code=500, content={"ok": False, "error": "unexpected"})
+        return 500, JSONResponse(status_code=500, content={"ok": False, "error": "unexpected"})
+
+
+async def _background_turn(activity: Activity, identity: ClaimsIdentity) -> None:
+    # _run_turn ya registró el error; TurnFailed solo lo cuenta en las estadísticas del executor.
+    status, _ = await _run_turn(activity, identity)
+    if status != 200:
+        raise TurnFailed(status)
+
+
+@app.get("/api/messages/stats")
+async def inbound_stats(_: None = Depends(verify_api_key)):
+    return {
+        "suppressed_retries": inbound_dedup.hits,
+        "dedup": inbound_dedup.stats(),
+        "turns": turn_executor.stats() if turn_executor else None,
+        "logging": log_pipeline.stats(),
+        "bot_state": await state_storage.stats(),
+        "rate_limit": rate_limiter.stats() if rate_limiter else None,
+        "coalescer": alert_coalescer.stats() if alert_coalescer else None,
+        "connector_pool": connector_pool.stats() if connector_pool else None,
+        "connector_clients": adapter.connector_clients.stats(),
+        "tokens": token_registry.stats(),
+        "openid_metadata": openid_metadata.stats(),
+        "auth_cache": adapter.auth_cache.stats() if adapter.auth_cache else None,
+        "controller_snapshot": controller_snapshot.stats(),
+    }
+
+
+def _trust_service_url(svc: Optional[str]) -> None:
+    """Confía serviceUrl, host raíz y base regional una sola vez por serviceUrl distinto."""
+    if not svc or not trusted_service_urls.add(svc):
+        return
+    try:
+        p = urlparse(svc)
+        # host raíz
+        host_root = f"{p.scheme}://{p.netloc}/"
+        # base regional (primer segmento del path, p.ej. "amer/")
+        path_parts = [seg for seg in p.path.split("/") if seg]
+        region_base = f"{p.scheme}://{p.netloc}/{path_parts[0]}/" if path_parts else host_root
+
+        # Confiar: URL completa, host raíz y base regional (ambos con/sin "/")
+        variants = {svc, host_root, region_base}
+        variants |= {u.rstrip("/") for u in variants if u.endswith("/")}
+
+        for u in variants:
+            if u:
+                MicrosoftAppCredentials.trust_service_url(u)
+
+        log.info("Trusted service URLs: %s", sorted(variants))
+    except Exception as e:
+        trusted_service_urls.discard(svc)
+        log.warning("Could not trust serviceUrl variants: %s (%s)", svc, e)
+
+
+_ACCESS_LOG_FORMAT = "status=%s ms=%s type=%s channel=%s convo=%s activity_id=%s region=%s"
+
+
+def _log_inbound(activity: Activity, status: int, started: float) -> None:
+    """Access log estructurado de /api/messages; los éxitos se muestrean con LOG_SAMPLE_EVERY["teams_gw.access"]."""
+    fields = {
+        "status": status,
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+        "type": activity.type,
+        "channel": activity.channel_id,
+        "convo": activity.conversation.id if activity.conversation else None,
+        "activity_id": activity.id,
+        "region": region_key(activity.service_url),
+    }
+    # El texto se arma solo si el registro sobrevive al muestreo de LogSampler.
+    access_log.log(
+        logging.WARNING if status >= 400 else logging.INFO,
+        _ACCESS_LOG_FORMAT,
+        *fields.values(),
+        extra={"access": fields},
+    )
 
 
 @app.get("/api/conversations")
@@ -229,8 +499,118 @@ async def list_conversations(_: None = Depends(verify_api_key)):
     return {"items": items}
 
 
+@app.get("/api/conversations/export")
+async def export_conversations(_: None = Depends(verify_api_key)):
+    async def _lines():
+        async for record in conversation_store.iter_export():
+            yield json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
+# Referencias que se cargan por lote al importar: el cuerpo nunca se guarda entero en memoria.
+IMPORT_BATCH_SIZE = 500
+
+
+async def _ndjson_batches(request: Request, size: int):
+    """Lotes de ``size`` líneas del cuerpo, como ``(número de la primera línea, líneas)``."""
+    buffer = b""
+    batch: list[bytes] = []
+    first = 1
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= size:
+                yield first, batch
+                first += len(batch)
+                batch = []
+    if buffer:
+        batch.append(buffer)
+    if batch:
+        yield first, batch
+
+
+@app.post("/api/conversations/import")
+async def import_conversations(request: Request, _: None = Depends(verify_api_key)):
+    received = loaded = 0
+    async for first, lines in _ndjson_batches(request, IMPORT_BATCH_SIZE):
+        try:
+            records = parse_ndjson_lines(lines, start=first)
+        except (UnicodeDecodeError, ValueError) as exc:
+            # Los lotes anteriores ya quedaron cargados (imported); reenviar el archivo completo es seguro.
+            log.warning("Conversation import stopped at line %s after %s references: %s", first, loaded, exc)
+            raise HTTPException(status_code=400, detail=f"invalid_ndjson: {exc} (imported={loaded})")
+        received += len(records)
+        loaded += await conversation_store.bulk_load(records)
+    return {"ok": True, "received": received, "imported": loaded}
+
+
+async def _load_conversation_snapshot() -> None:
+    path = settings.CONVERSATION_SNAPSHOT_PATH
+    if not path:
+        return
+    if not os.path.exists(path):
+        log.warning("Conversation snapshot not found: %s", path)
+        return
+    try:
+        loaded = await conversation_store.load_snapshot(path)
+    except Exception as exc:
+        log.error("Could not load conversation snapshot %s: %s", path, exc)
+        return
+    log.info("Loaded %s conversation references from %s", loaded, path)
+
+
 @app.post("/api/proactive")
-async def send_proactive(payload: ProactiveMessageRequest, _: None = Depends(verify_api_key)):
+async def send_proactive(
+    payload: ProactiveMessageRequest,
+    response: Response,
+    mode: Optional[Literal["sync", "async"]] = Query(
+        default=None,
+        description="async: encola y responde 202 con delivery_id; sync: entrega en línea. "
+        "Por defecto async si la cola está activa.",
+    ),
+    idempotency_key: Optional[str] = Header(default=None),
+    _: None = Depends(verify_api_key),
+):
+    if mode == "async" and not delivery_queue:
+        raise HTTPException(status_code=503, detail="proactive_queue_disabled")
+    use_queue = mode == "async" or (mode is None and delivery_queue is not None)
+
+    key = idempotency_key or _derive_idempotency_key(payload)
+    result, replayed = await _run_idempotent(key, lambda: _handle_proactive(payload, use_queue))
+    if replayed:
+        log.info("Proactive request replayed from dedup cache: key=%s", key)
+        response.headers["Idempotent-Replayed"] = "true"
+    if result.get("queued"):
+        response.status_code = 202
+        response.headers["Location"] = f"/api/proactive/{result['delivery_id']}"
+    return result
+
+
+def _derive_idempotency_key(payload: ProactiveMessageRequest) -> Optional[str]:
+    return _ticket_idempotency_key(payload.payload, payload.conversation_id or payload.user_id or payload.aad_object_id)
+
+
+def _ticket_idempotency_key(custom_payload: Optional[dict[str, Any]], target: Optional[str]) -> Optional[str]:
+    """ticket_id + nivel + destino, cuando el payload trae ticket y nivel."""
+    card = custom_payload or {}
+    ticket_id = card.get("ticket_id")
+    nivel = card.get("nivel")
+    if ticket_id in (None, "") or not nivel:
+        return None
+    return f"{ticket_id}|{nivel}|{target}"
+
+
+async def _run_idempotent(key: Optional[str], factory) -> tuple[dict[str, Any], bool]:
+    """``(resultado, replayed)``: con clave, las repeticiones dentro de la ventana devuelven el primer resultado."""
+    if not key or settings.PROACTIVE_DEDUP_SECONDS <= 0:
+        return await factory(), False
+    return await proactive_dedup.run_once(key, factory)
+
+
+async def _handle_proactive(payload: ProactiveMessageRequest, use_queue: bool) -> dict[str, Any]:
     reference = await conversation_store.resolve(
         conversation_id=payload.conversation_id,
         user_id=payload.user_id,
@@ -238,35 +618,316 @@ async def send_proactive(payload: ProactiveMessageRequest, _: None = Depends(ver
     )
     if not reference:
         raise HTTPException(status_code=404, detail="conversation_reference_not_found")
+    return await _route_proactive(reference, payload.message, payload.payload, use_queue=use_queue, update=payload.update)
+
+
+async def _route_proactive(
+    reference: ConversationReference,
+    message: Optional[str],
+    custom_payload: Optional[dict[str, Any]],
+    *,
+    use_queue: Optional[bool] = None,
+    update: bool = False,
+) -> dict[str, Any]:
+    """Alertas sueltas al coalescer; el resto a la cola durable o en línea (ver ``_dispatch_proactive``)."""
+    if alert_coalescer and not message and not update and _is_alert_payload(custom_payload):
+        pending = await alert_coalescer.add(
+            reference.conversation.id, custom_payload.get("nivel") or "Nivel 1", reference, custom_payload
+        )
+        return {"ok": True, "coalesced": True, "pending": pending}
+    return await _dispatch_proactive(reference, message, custom_payload, use_queue=use_queue, update=update)
+
+
+async def _dispatch_proactive(
+    reference: ConversationReference,
+    message: Optional[str],
+    custom_payload: Optional[dict[str, Any]],
+    *,
+    use_queue: Optional[bool] = None,
+    update: bool = False,
+) -> dict[str, Any]:
+    """Encola el envío si la cola durable está activa (o se pide); si no, lo entrega en línea."""
+    if use_queue is None:
+        use_queue = delivery_queue is not None
+    if use_queue and delivery_queue:
+        request: dict[str, Any] = {"reference": reference.serialize(), "message": message, "payload": custom_payload}
+        if update:
+            request["update"] = True
+        delivery_id = await delivery_queue.enqueue(request, priority=alert_priority(custom_payload))
+        return {"ok": True, "queued": True, "delivery_id": delivery_id}
+
+    card_key = _card_key(reference.conversation.id, custom_payload)
+    previous_id = card_activity_index.get(card_key) if update and card_key else None
+    activity_ids = await _deliver_proactive(reference, message, custom_payload, update=update)
+    result: dict[str, Any] = {"ok": True, "activity_ids": activity_ids}
+    if update:
+        result["updated"] = previous_id is not None and previous_id in activity_ids
+    return result
+
+
+def _is_alert_payload(custom_payload: Optional[dict[str, Any]]) -> bool:
+    return isinstance(custom_payload, dict) and (custom_payload.get("type") or "").lower() == "alerta"
+
+
+async def _flush_alert_digest(reference: ConversationReference, level: str, items: list[dict[str, Any]]) -> None:
+    if len(items) == 1:
+        custom_payload = items[0]
+    else:
+        custom_payload = {"type": "alerta_digest", "nivel": level, "alertas": items}
+    await _dispatch_proactive(reference, None, custom_payload)
+    log.info("Flushed alert digest: convo=%s level=%s alerts=%s", reference.conversation.id, level, len(items))
+
+
+@app.get("/api/proactive/queue")
+async def proactive_queue_stats(_: None = Depends(verify_api_key)):
+    if not delivery_queue:
+        raise HTTPException(status_code=404, detail="proactive_queue_disabled")
+    lanes = await delivery_queue.lane_stats()
+    return {
+        "statuses": await delivery_queue.stats(),
+        "lanes": {str(priority): lane for priority, lane in lanes.items()},
+    }
+
+
+@app.delete("/api/proactive/cards/{conversation_id}/{ticket_id}")
+async def forget_proactive_card(conversation_id: str, ticket_id: str, _: None = Depends(verify_api_key)):
+    """Olvida la tarjeta registrada para el ticket (p. ej. al cerrarlo); el próximo envío publica una nueva."""
+    removed = card_activity_index.discard(f"{conversation_id}|{ticket_id}")
+    return {"ok": True, "removed": removed}
+
+
+@app.get("/api/proactive/{delivery_id}")
+async def proactive_delivery_status(delivery_id: str, _: None = Depends(verify_api_key)):
+    if not delivery_queue:
+        raise HTTPException(status_code=404, detail="proactive_queue_disabled")
+    item = await delivery_queue.get(delivery_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="delivery_not_found")
+    result = item.pop("result") or {}
+    activity_ids = result.get("activity_ids") or []
+    return {
+        **item,
+        "conversation_id": result.get("conversation_id"),
+        "activity_id": activity_ids[-1] if activity_ids else None,
+        "activity_ids": activity_ids,
+    }
+
+
+@app.post("/api/proactive/batch")
+async def send_proactive_batch(
+    batch: ProactiveBatchRequest,
+    idempotency_key: Optional[str] = Header(default=None),
+    _: None = Depends(verify_api_key),
+):
+    references = await conversation_store.resolve_many(
+        (item.conversation_id, item.user_id, item.aad_object_id) for item in batch.items
+    )
+    jobs = [
+        (reference, item.message, item.payload, item.conversation_id, item.update)
+        for item, reference in zip(batch.items, references)
+    ]
+    results = await _fan_out(jobs, batch.concurrency, idempotency_key)
+    sent = sum(1 for item in results if item["ok"])
+    return {"ok": sent == len(results), "sent": sent, "failed": len(results) - sent, "results": results}
+
+
+@app.post("/api/proactive/broadcast")
+async def send_proactive_broadcast(
+    request: ProactiveBroadcastRequest,
+    idempotency_key: Optional[str] = Header(default=None),
+    _: None = Depends(verify_api_key),
+):
+    roles: set[str] = set()
+    for role in request.roles:
+        # Un rol del tablero incluye a los registrados bajo sus notification_roles.
+        roles.add(role)
+        roles.update(ROLE_META.get(role, {}).get("notification_roles", ()))
+    references = await conversation_store.select(
+        tenant_id=request.tenant_id,
+        aad_object_ids=request.aad_object_ids,
+        roles=roles,
+    )
+    jobs = [(reference, request.message, request.payload, None, request.update) for reference in references]
+    results = await _fan_out(jobs, request.concurrency, idempotency_key)
+    sent = sum(1 for item in results if item["ok"])
+    return {
+        "ok": sent == len(results),
+        "targets": len(results),
+        "sent": sent,
+        "failed": len(results) - sent,
+        "results": results,
+    }
+
+
+@app.get("/api/roles")
+async def list_role_members(_: None = Depends(verify_api_key)):
+    return {"roles": await conversation_store.role_members()}
+
+
+@app.put("/api/roles/{role}")
+async def update_role_members(role: str, body: RoleMembersRequest, _: None = Depends(verify_api_key)):
+    await conversation_store.set_role_members(role, body.members)
+    return {"ok": True, "role": role, "members": len(set(body.members))}
+
+
+async def _fan_out(
+    jobs: list[tuple[Optional[ConversationReference], Optional[str], Optional[dict[str, Any]], Optional[str], bool]],
+    concurrency: Optional[int],
+    idempotency_key: Optional[str] = None,
+) -> list[dict[str, Any]]:
+    """Send ``(reference, message, payload, conversation_id, update)`` jobs concurrently, one result per job.
+
+    Each target goes the way a single ``/api/proactive`` send does: alerts to the
+    coalescer, then the durable queue when enabled, else inline. Targets are
+    deduplicated by ``idempotency_key`` + conversation (or ticket_id + nivel +
+    conversation), so a retried batch or broadcast only sends what failed.
+    """
+    if not jobs:
+        return []
+    limit = min(concurrency or settings.PROACTIVE_BATCH_CONCURRENCY, len(jobs))
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def _send_one(index: int, reference, message, custom_payload, conversation_id, update) -> dict[str, Any]:
+        result: dict[str, Any] = {
+            "index": index,
+            "conversation_id": reference.conversation.id if reference else conversation_id,
+            "ok": False,
+        }
+        if not reference:
+            result["error"] = "conversation_reference_not_found"
+            return result
+        key = _ticket_idempotency_key(custom_payload, result["conversation_id"])
+        if idempotency_key:
+            key = f"{idempotency_key}|{result['conversation_id']}"
+        async with semaphore:
+            try:
+                outcome, replayed = await _run_idempotent(
+                    key, lambda: _route_proactive(reference, message, custom_payload, update=update)
+                )
+            except connector_models.ErrorResponseException as e:
+                status, _reason, body_text = await _extract_error_details(e)
+                log.error("Proactive fan-out send failed: convo=%s status=%s body=%s", result["conversation_id"], status, body_text)
+                result.update(error="connector_error", status=status)
+                return result
+            except Exception as e:
+                log.exception("Proactive fan-out send failed: convo=%s", result["conversation_id"])
+                result["error"] = type(e).__name__
+                return result
+        result.update({field: outcome[field] for field in ("activity_ids", "queued", "delivery_id", "coalesced") if field in outcome})
+        result["ok"] = True
+        if replayed:
+            result["replayed"] = True
+        return result
+
+    # Los niveles altos toman primero el semáforo; el orden de la respuesta se conserva.
+    order = sorted(range(len(jobs)), key=lambda idx: -alert_priority(jobs[idx][2]))
+    tasks = {idx: asyncio.ensure_future(_send_one(idx, *jobs[idx])) for idx in order}
+    return [await tasks[idx] for idx in range(len(jobs))]
+
+
+async def _deliver_proactive(
+    reference,
+    message: Optional[str],
+    custom_payload: Optional[dict[str, Any]],
+    *,
+    update: bool = False,
+) -> list[str]:
+    """Send through the Bot Connector and return the Teams activity ids of what was posted."""
+    activities = _build_proactive_activities(message, custom_payload)
+    # Solo una tarjeta de una página se puede reemplazar in situ.
+    single_card = sum(1 for activity in activities if activity.attachments) == 1
+    card_key = _card_key(reference.conversation.id, custom_payload) if single_card and activities[-1].attachments else None
+    existing_id = card_activity_index.get(card_key) if update and card_key else None
+    activity_ids: list[str] = []
 
     async def _send_proactive(turn_context: TurnContext):
-        if payload.message:
-            await turn_context.send_activity(payload.message)
-        attachment = _maybe_build_attachment(payload.payload)
-        if attachment:
-            await turn_context.send_activity(attachment)
+        pending = activities
+        if existing_id:
+            card = activities[-1]
+            card.id = existing_id
+            try:
+                await turn_context.update_activity(card)
+            except connector_models.ErrorResponseException as e:
+                status, _reason, _body = await _extract_error_details(e)
+                if status != 404:
+                    raise
+                # La tarjeta original fue borrada: se publica una nueva.
+                log.info("Card to update no longer exists: convo=%s activity_id=%s", reference.conversation.id, existing_id)
+                card.id = None
+            else:
+                pending = activities[:-1]
+        if pending:
+            responses = await turn_context.send_activities(pending)
+            activity_ids.extend(sent.id for sent in responses or [] if sent and sent.id)
+        if existing_id and activities[-1].id:
+            activity_ids.append(existing_id)
 
     await adapter.continue_conversation(reference, _send_proactive, settings.MICROSOFT_APP_ID)
-    return {"ok": True}
+    if card_key and activity_ids:
+        card_activity_index.put(card_key, activity_ids[-1])
+    return activity_ids
 
 
-def _maybe_build_attachment(custom_payload: Optional[dict[str, Any]]):
-    if not custom_payload or not isinstance(custom_payload, dict):
+def _card_key(conversation_id: str, custom_payload: Optional[dict[str, Any]]) -> Optional[str]:
+    """conversation.id + ticket_id: identifica la tarjeta que se actualiza al escalar el ticket."""
+    if not isinstance(custom_payload, dict):
         return None
+    ticket_id = custom_payload.get("ticket_id")
+    if ticket_id in (None, ""):
+        return None
+    return f"{conversation_id}|{ticket_id}"
+
+
+def _build_proactive_activities(message: Optional[str], custom_payload: Optional[dict[str, Any]]) -> list[Activity]:
+    """Texto y tarjeta viajan en una sola actividad (un round trip) salvo que se desactive el modo compuesto.
+
+    Las tarjetas que exceden ``CARD_MAX_BYTES`` llegan como varias páginas, una actividad por página.
+    """
+    card_activities = _maybe_build_attachments(custom_payload)
+    if card_activities and message and settings.PROACTIVE_COMPOSITE_MESSAGES:
+        card_activities[0].text = message
+        return card_activities
+    activities = [MessageFactory.text(message)] if message else []
+    activities.extend(card_activities)
+    return activities
+
+
+async def _send_queued_delivery(request: dict[str, Any]) -> dict[str, Any]:
+    reference = ConversationReference().deserialize(request["reference"])
+    try:
+        activity_ids = await _deliver_proactive(
+            reference, request.get("message"), request.get("payload"), update=bool(request.get("update"))
+        )
+    except connector_models.ErrorResponseException as e:
+        status, _reason, body_text = await _extract_error_details(e)
+        if status in (400, 403, 404):
+            raise PermanentDeliveryError(f"status={status} body={body_text}") from e
+        raise
+    return {"conversation_id": reference.conversation.id, "activity_ids": activity_ids}
+
+
+def _maybe_build_attachments(custom_payload: Optional[dict[str, Any]]) -> list[Activity]:
+    if not custom_payload or not isinstance(custom_payload, dict):
+        return []
     payload_type = (custom_payload.get("type") or "").lower()
     card_content: Optional[dict[str, Any]] = None
 
     if payload_type == "alerta":
         card_content = build_alert_card(custom_payload)
+    elif payload_type == "alerta_digest":
+        card_content = build_alert_digest_card(custom_payload)
 
     if not card_content:
-        return None
+        return []
 
-    attachment = Attachment(
-        content_type="application/vnd.microsoft.card.adaptive",
-        content=card_content,
-    )
-    return MessageFactory.attachment(attachment)
+    return [
+        MessageFactory.attachment(
+            Attachment(content_type="application/vnd.microsoft.card.adaptive", content=page)
+        )
+        for page in fit_card(
+            card_content, settings.CARD_MAX_BYTES, implied_types=settings.CARD_COMPACT_IMPLIED_TYPES
+        )
+    ]
 
 
 async def _extract_error_details(error: connector_models.ErrorResponseException) -> tuple[Any, Any, str]:
@@ -399,12 +1060,7 @@ async def dashboard_data():
 
 
 def _controller_base_url() -> str:
-    if settings.CONTROLLER_BASE_URL:
-        return settings.CONTROLLER_BASE_URL.rstrip("/")
-    # Derivar base removiendo el último segmento de metrics
-    url = settings.CONTROLLER_METRICS_URL.rstrip("/")
-    parts = url.rsplit("/", 1)
-    return parts[0] if len(parts) == 2 else url
+    return controller_base_url(settings.CONTROLLER_METRICS_URL, settings.CONTROLLER_BASE_URL)
 
 
 @app.get("/dashboard/data/risk")
@@ -485,16 +1141,8 @@ async def dashboard_executive():
 
 @app.get("/__bf-token")
 async def bf_token():
-    from botframework.connector.auth import MicrosoftAppCredentials
-    creds = MicrosoftAppCredentials(
-        settings.MICROSOFT_APP_ID,
-        settings.MICROSOFT_APP_PASSWORD,
-        settings.MICROSOFT_APP_TENANT_ID,
-        settings.MICROSOFT_APP_OAUTH_SCOPE,
-    )
-    tok = creds.get_access_token()
-    if inspect.isawaitable(tok):
-        tok = await tok
+    provider = default_token_provider()
+    tok = await provider.get_token_async()
     # Solo inspección: header.payload (sin verificación)
     import base64, json
     def _b64url_decode(seg):
@@ -507,7 +1155,7 @@ async def bf_token():
     except Exception:
         pass
     return {
-        "oauth_scope": getattr(creds, "oauth_scope", "<unknown>"),
+        "oauth_scope": provider.scope,
         "aud": payload.get("aud"),
         "appid": payload.get("appid"),
         "iss": payload.get("iss"),
@@ -523,16 +1171,8 @@ async def _log_auth_context() -> None:
         os.getenv("MicrosoftAppOAuthScope"),
         settings.MICROSOFT_APP_ID,
     )
-    creds = MicrosoftAppCredentials(
-        settings.MICROSOFT_APP_ID,
-        settings.MICROSOFT_APP_PASSWORD,
-        settings.MICROSOFT_APP_TENANT_ID,
-        settings.MICROSOFT_APP_OAUTH_SCOPE,
-    )
     try:
-        tok = creds.get_access_token()
-        if inspect.isawaitable(tok):
-            tok = await tok
+        tok = await default_token_provider().get_token_async()
     except Exception as auth_exc:
         log.error("Access-token fetch raised: %r", auth_exc)
         return
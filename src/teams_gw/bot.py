@@ -1,29 +1,207 @@
 from __future__ import annotations
 
 import logging
-from typing import Any
+import string
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
 
 from botbuilder.core import ActivityHandler, ConversationState, MessageFactory, TurnContext
 from botbuilder.schema import Attachment
 
+from .card_size import fit_card
 from .cards import (
+    build_ticket_list_card,
+    build_ticket_status_card,
     demo_alert_card,
     demo_report_card,
     demo_summary_card,
     demo_table_card,
     demo_ticket_card,
 )
+from .controller_cache import controller_snapshot
 from .conversation_store import conversation_store
 from .settings import settings
 
 log = logging.getLogger("teams_gw.bot")
 
+# (turn_context, args) -> None; ``args`` is the text after the command word.
+CommandHandler = Callable[[TurnContext, str], Awaitable[None]]
+
+
+class CommandRouter:
+    """Dispatches a message on its leading words through a dict of commands and aliases.
+
+    A command may be a phrase ("mis tickets"); the longest registered phrase that
+    matches whole words wins, so lookup cost depends on the longest phrase, not on
+    how many commands are registered. Matching is case-insensitive and the rest of
+    the message is passed to the handler as ``args``.
+    """
+
+    def __init__(self) -> None:
+        self._handlers: Dict[str, CommandHandler] = {}
+        self._max_words = 1
+
+    def register(self, name: str, handler: CommandHandler, *, aliases: Iterable[str] = ()) -> None:
+        for phrase in (name, *aliases):
+            words = phrase.lower().split()
+            phrase = " ".join(words)
+            if phrase in self._handlers:
+                raise ValueError(f"Command already registered: {phrase}")
+            self._handlers[phrase] = handler
+            self._max_words = max(self._max_words, len(words))
+
+    def command(self, name: str, *aliases: str) -> Callable[[CommandHandler], CommandHandler]:
+        def decorator(handler: CommandHandler) -> CommandHandler:
+            self.register(name, handler, aliases=aliases)
+            return handler
+
+        return decorator
+
+    def resolve(self, text: str) -> Optional[Tuple[CommandHandler, str]]:
+        for count in range(self._max_words, 0, -1):
+            words = text.split(maxsplit=count)
+            if len(words) < count:
+                continue
+            handler = self._handlers.get(" ".join(words[:count]).lower())
+            if handler is not None:
+                return handler, words[count].strip() if len(words) > count else ""
+        return None
+
+    def __contains__(self, phrase: str) -> bool:
+        return " ".join(phrase.lower().split()) in self._handlers
+
+
+def _card_attachments(payload: dict[str, Any]) -> list[Attachment]:
+    """Tarjeta compactada y, si excede ``CARD_MAX_BYTES``, partida en páginas."""
+    return [
+        Attachment(content_type="application/vnd.microsoft.card.adaptive", content=page)
+        for page in fit_card(payload, settings.CARD_MAX_BYTES, implied_types=settings.CARD_COMPACT_IMPLIED_TYPES)
+    ]
+
+
+async def _send_card(turn_context: TurnContext, attachments: list[Attachment], title: str | None = None) -> None:
+    # El título va como texto de la primera actividad; las páginas salen en un solo lote.
+    activities = [MessageFactory.attachment(attachment) for attachment in attachments]
+    activities[0].text = title
+    await turn_context.send_activities(activities)
+
+
+def _demo_card_command(builder: Callable[[], dict[str, Any]], title: str) -> CommandHandler:
+    attachments: Optional[list[Attachment]] = None
+
+    async def handler(turn_context: TurnContext, args: str) -> None:
+        nonlocal attachments
+        if attachments is None:
+            # Las demos son estáticas: el adjunto se arma una vez y se reutiliza.
+            attachments = _card_attachments(builder())
+        await _send_card(turn_context, attachments, title=title)
+
+    return handler
+
+
+# Filas máximas en las tablas de tickets que devuelve el bot.
+TICKET_LIST_LIMIT = 15
+CONTROLLER_UNAVAILABLE = "No pude consultar el controller en este momento; intenta de nuevo en unos minutos."
+
+
+def _list_subtitle(tickets: list[dict[str, Any]]) -> str:
+    high = sum(1 for item in tickets if str(item.get("risk_band") or "").lower() in ("rojo", "naranja"))
+    shown = min(len(tickets), TICKET_LIST_LIMIT)
+    suffix = f" · mostrando {shown}" if shown < len(tickets) else ""
+    return f"{len(tickets)} tickets · {high} en riesgo alto{suffix}"
+
+
+_demo_ticket = _demo_card_command(demo_ticket_card, "Demo: Ticket")
+
+
+async def ticket_command(turn_context: TurnContext, args: str) -> None:
+    ticket_id = args.split(" ", 1)[0].lstrip("#")
+    if not ticket_id.isdigit():
+        # Sin número («ticket», «tickets abiertos») se mantiene la tarjeta de ejemplo.
+        await _demo_ticket(turn_context, args)
+        return
+    if not await controller_snapshot.ensure():
+        await turn_context.send_activity(CONTROLLER_UNAVAILABLE)
+        return
+    item = controller_snapshot.ticket(ticket_id)
+    if item is None:
+        await turn_context.send_activity(f"No encontré el ticket #{ticket_id} entre los tickets abiertos del controller.")
+        return
+    await _send_card(turn_context, _card_attachments(build_ticket_status_card(item)), title=f"Ticket #{ticket_id}")
+
+
+async def risk_command(turn_context: TurnContext, args: str) -> None:
+    if not await controller_snapshot.ensure():
+        await turn_context.send_activity(CONTROLLER_UNAVAILABLE)
+        return
+    found = controller_snapshot.group_tickets(args)
+    if found is None:
+        groups = ", ".join(controller_snapshot.group_names()) or "-"
+        hint = f"No encontré el grupo «{args}». " if args else ""
+        await turn_context.send_activity(f"{hint}Uso: riesgo <grupo>. Grupos: {groups}")
+        return
+    group, tickets = found
+    card = build_ticket_list_card(f"Riesgo · {group}", _list_subtitle(tickets), tickets[:TICKET_LIST_LIMIT])
+    await _send_card(turn_context, _card_attachments(card), title=f"Riesgo · {group}")
+
+
+async def my_tickets_command(turn_context: TurnContext, args: str) -> None:
+    if not await controller_snapshot.ensure():
+        await turn_context.send_activity(CONTROLLER_UNAVAILABLE)
+        return
+    user = turn_context.activity.from_property
+    name = getattr(user, "name", None)
+    tickets = controller_snapshot.technician_tickets(name, getattr(user, "aad_object_id", None))
+    if not tickets:
+        await turn_context.send_activity(f"No encontré tickets abiertos asignados a {name or 'tu usuario'}.")
+        return
+    card = build_ticket_list_card(f"Tickets de {name}", _list_subtitle(tickets), tickets[:TICKET_LIST_LIMIT])
+    await _send_card(turn_context, _card_attachments(card), title="Mis tickets")
+
+
+commands = CommandRouter()
+commands.register("ticket", ticket_command, aliases=("tickets",))
+commands.register("riesgo", risk_command)
+commands.register("mis tickets", my_tickets_command)
+commands.register("tabla", _demo_card_command(demo_table_card, "Demo: Tabla"), aliases=("tablas",))
+commands.register("reporte", _demo_card_command(demo_report_card, "Demo: Reporte"), aliases=("reportes",))
+commands.register("alerta", _demo_card_command(demo_alert_card, "Demo: Alerta"), aliases=("alertas",))
+commands.register("resumen", _demo_card_command(demo_summary_card, "Demo: Resumen diario"))
+
+
+@lru_cache(maxsize=8)
+def _compile_reply(template: str, bot_name: str) -> Callable[[str], str]:
+    """Reply renderer for ``template``; constant when it does not use ``{user_input}``."""
+
+    def render(user_text: str) -> str:
+        try:
+            return template.format(user_input=user_text, bot_name=bot_name)
+        except KeyError:
+            # In case the template uses unknown placeholders, just return it raw.
+            return template
+
+    try:
+        fields = {name.split(".")[0].split("[")[0] for _, name, _, _ in string.Formatter().parse(template) if name}
+    except ValueError:
+        return render
+    if "user_input" in fields:
+        return render
+    reply = render("")
+    return lambda _user_text: reply
+
 
 class TeamsGatewayBot(ActivityHandler):
     """Minimal bot that replies to any incoming text and stores conversation references."""
 
-    def __init__(self, conversation_state: ConversationState):
+    def __init__(self, conversation_state: ConversationState, router: CommandRouter = commands):
         self.conversation_state = conversation_state
+        self.router = router
+
+    async def on_turn(self, turn_context: TurnContext):
+        await super().on_turn(turn_context)
+        # BotState solo escribe si el estado cambió durante el turno.
+        if self.conversation_state:
+            await self.conversation_state.save_changes(turn_context)
 
     async def on_message_activity(self, turn_context: TurnContext):
         stored = await conversation_store.remember(turn_context.activity)
@@ -36,44 +214,15 @@ class TeamsGatewayBot(ActivityHandler):
             )
 
         incoming_text = (turn_context.activity.text or "").strip()
-        normalized = incoming_text.lower()
-
-        if normalized.startswith("ticket"):
-            await self._send_card(turn_context, demo_ticket_card(), title="Demo: Ticket")
-            return
-        if normalized.startswith("tabla"):
-            await self._send_card(turn_context, demo_table_card(), title="Demo: Tabla")
-            return
-        if normalized.startswith("reporte"):
-            await self._send_card(turn_context, demo_report_card(), title="Demo: Reporte")
-            return
-        if normalized.startswith("alerta"):
-            await self._send_card(turn_context, demo_alert_card(), title="Demo: Alerta")
-            return
-        if normalized.startswith("resumen"):
-            await self._send_card(turn_context, demo_summary_card(), title="Demo: Resumen diario")
+        match = self.router.resolve(incoming_text)
+        if match:
+            handler, args = match
+            await handler(turn_context, args)
             return
 
         reply_text = self._render_reply(incoming_text)
         await turn_context.send_activity(reply_text)
 
-    async def _send_card(self, turn_context: TurnContext, payload: dict[str, Any], title: str | None = None):
-        if title:
-            await turn_context.send_activity(title)
-        attachment = Attachment(
-            content_type="application/vnd.microsoft.card.adaptive",
-            content=payload,
-        )
-        await turn_context.send_activity(MessageFactory.attachment(attachment))
-
     def _render_reply(self, user_text: str) -> str:
         template = settings.BOT_DEFAULT_REPLY or "Hola, soy tu bot de Teams."
-        placeholders = {
-            "user_input": user_text or "",
-            "bot_name": settings.BOT_DISPLAY_NAME,
-        }
-        try:
-            return template.format(**placeholders)
-        except KeyError:
-            # In case the template uses unknown placeholders, just return it raw.
-            return template
+        return _compile_reply(template, settings.BOT_DISPLAY_NAME)(user_text or "")
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+log = logging.getLogger("teams_gw.card_size")
+
+# Teams rejects messages over ~28 KB; leave room for the activity envelope (text, ids, reference).
+DEFAULT_CARD_BUDGET = 26_000
+
+# Properties whose value equals the Adaptive Cards 1.5 default, per element type ("*" = any element).
+# Enum values are compared case-insensitively. Container ``style`` is deliberately absent: an explicit
+# "default" resets an inherited style, so it is not redundant.
+_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "*": {"spacing": "default", "separator": False, "isVisible": True, "height": "auto"},
+    "TextBlock": {
+        "wrap": False,
+        "isSubtle": False,
+        "weight": "default",
+        "size": "default",
+        "color": "default",
+        "fontType": "default",
+        "maxLines": 0,
+    },
+    "Image": {"size": "auto", "style": "default"},
+    "Container": {"bleed": False},
+    "ColumnSet": {"bleed": False},
+    "Column": {"bleed": False},
+    "Table": {"firstRowAsHeader": True, "showGridLines": True},
+}
+
+# Collections whose items can only be one element type, so their "type" is implied.
+_IMPLIED_TYPES = {"columns": "Column", "rows": "TableRow", "cells": "TableCell"}
+
+# Per-type defaults merged with the common ones, built once.
+_TYPE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    element_type: {**_DEFAULTS["*"], **defaults} for element_type, defaults in _DEFAULTS.items() if element_type != "*"
+}
+_NO_DEFAULTS: Dict[str, Any] = {}
+
+
+def _is_default(value: Any, default: Any) -> bool:
+    if isinstance(default, str):
+        return isinstance(value, str) and value.lower() == default
+    return type(value) is type(default) and value == default
+
+
+def _compact(node: Any, implied_type: Optional[str], implied_types: bool) -> Any:
+    if isinstance(node, list):
+        return [_compact(item, implied_type, implied_types) for item in node]
+    if not isinstance(node, dict):
+        return node
+    element_type = node.get("type") or implied_type
+    if element_type:
+        defaults = _TYPE_DEFAULTS.get(element_type, _DEFAULTS["*"])
+    else:
+        defaults = _NO_DEFAULTS
+    out: Dict[str, Any] = {}
+    for key, value in node.items():
+        if value is None:
+            continue
+        if isinstance(value, (dict, list)):
+            out[key] = _compact(value, _IMPLIED_TYPES.get(key), implied_types)
+            continue
+        if key == "type":
+            if implied_types and value == implied_type:
+                continue
+        elif key in defaults and _is_default(value, defaults[key]):
+            continue
+        out[key] = value
+    return out
+
+
+def compact_card(card: Dict[str, Any], *, implied_types: bool = True) -> Dict[str, Any]:
+    """Copy of ``card`` without ``None`` values and properties set to their schema default.
+
+    With ``implied_types`` the ``type`` of columns, table rows and table cells is
+    dropped too, since their parent collection already determines it. The input
+    is not modified (compiled card templates share nodes between cards).
+    """
+    return _compact(card, None, implied_types)
+
+
+def card_size(card: Dict[str, Any]) -> int:
+    """Bytes ``card`` takes on the wire (msrest sends ``json.dumps`` with its defaults)."""
+    return len(json.dumps(card))
+
+
+def _largest_table(card: Dict[str, Any]) -> Optional[Tuple[int, Dict[str, Any]]]:
+    tables = [
+        (index, element)
+        for index, element in enumerate(card.get("body") or [])
+        if isinstance(element, dict) and element.get("type") == "Table" and element.get("rows")
+    ]
+    if not tables:
+        return None
+    return max(tables, key=lambda item: len(item[1]["rows"]))
+
+
+def _page(card: Dict[str, Any], index: int, table: Dict[str, Any], rows: List[Any], label: Optional[str]) -> Dict[str, Any]:
+    body = list(card["body"])
+    body[index] = {**table, "rows": rows}
+    if label:
+        body.insert(index + 1, {"type": "TextBlock", "text": label, "isSubtle": True, "size": "small"})
+    return {**card, "body": body}
+
+
+def split_card(card: Dict[str, Any], budget: int = DEFAULT_CARD_BUDGET, page_label: str = "Página {page} de {pages}") -> List[Dict[str, Any]]:
+    """Split the card's largest table across as few cards as fit in ``budget`` bytes.
+
+    Every page keeps the rest of the card (header, actions) and the table's header
+    row, and gets a "page N of M" line under the table. A card without a table, or
+    one whose fixed part alone exceeds the budget, is returned as is.
+    """
+    if card_size(card) <= budget:
+        return [card]
+    found = _largest_table(card)
+    if found is None:
+        log.warning("Card of %s bytes exceeds the %s byte budget and has no table to split", card_size(card), budget)
+        return [card]
+    index, table = found
+    rows = table["rows"]
+    header = rows[:1] if table.get("firstRowAsHeader", True) else []
+    data_rows = rows[len(header):]
+    widest_label = page_label.format(page=len(data_rows), pages=len(data_rows))
+    fixed = card_size(_page(card, index, table, header, widest_label))
+    if fixed >= budget or not data_rows:
+        log.warning("Card fixed part (%s bytes) leaves no room for table rows within %s bytes", fixed, budget)
+        return [card]
+
+    chunks: List[List[Any]] = [[]]
+    used = fixed
+    for row in data_rows:
+        row_size = card_size(row) + 2  # ", " separator
+        if chunks[-1] and used + row_size > budget:
+            chunks.append([])
+            used = fixed
+        chunks[-1].append(row)
+        used += row_size
+    pages = len(chunks)
+    return [
+        _page(card, index, table, header + chunk, page_label.format(page=page, pages=pages))
+        for page, chunk in enumerate(chunks, 1)
+    ]
+
+
+def fit_card(card: Dict[str, Any], budget: int = DEFAULT_CARD_BUDGET, *, implied_types: bool = True) -> List[Dict[str, Any]]:
+    """Smallest deliverable form of ``card``: compacted, and split into pages if still too big."""
+    return split_card(compact_card(card, implied_types=implied_types), budget)
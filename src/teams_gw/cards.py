@@ -7,21 +7,25 @@ ALERT_LEVEL_CONFIG = {
     "Nivel 1": {
         "style": "emphasis",
         "audience": "Supervisor de Mesa",
+        "priority": 1,
         "icon": "https://i.ibb.co/tprYrjgX/N1.png",
     },
     "Nivel 2": {
         "style": "warning",
         "audience": "Jefe de Operaciones",
+        "priority": 2,
         "icon": "https://i.ibb.co/yFFCgbsP/N2.png",
     },
     "Nivel 3": {
         "style": "accent",
         "audience": "Jefe de Servicios",
+        "priority": 3,
         "icon": "https://i.ibb.co/k6BDfgXL/N3.png",
     },
     "Nivel 4": {
         "style": "attention",
         "audience": "Gerente de TI",
+        "priority": 4,
         "icon": "https://i.ibb.co/8DxrZDpW/N4.png",
     },
 }
@@ -36,6 +40,14 @@ def _resolve_alert_level(level: str) -> Dict[str, str]:
     return ALERT_LEVEL_CONFIG.get(level, default)
 
 
+def alert_priority(payload: Optional[Dict[str, Any]]) -> int:
+    """Prioridad de envío según ``payload["nivel"]``; 0 para mensajes sin nivel conocido."""
+
+    if not isinstance(payload, dict):
+        return 0
+    return int(ALERT_LEVEL_CONFIG.get(payload.get("nivel") or "", {}).get("priority", 0))
+
+
 def _extract_text(value: Any) -> Optional[str]:
     if value is None:
         return None
@@ -238,112 +250,299 @@ def demo_report_card() -> Dict[str, Any]:
     }
 
 
+class _AlertCardTemplate:
+    """Plantilla compilada de la tarjeta de alerta.
+
+    Lo que no depende del payload (estilo, icono y texto de audiencia de cada
+    nivel) se resuelve una sola vez y se guarda como tupla inmutable; cada
+    render arma dicts nuevos, así que quien reciba una tarjeta puede mutarla
+    sin afectar las siguientes.
+    """
+
+    _MAX_LEVELS = 64
+
+    def __init__(self) -> None:
+        self._levels: Dict[str, tuple[str, str, str]] = {}
+
+    def _level_parts(self, level: str) -> tuple[str, str, str]:
+        parts = self._levels.get(level)
+        if parts is None:
+            config = _resolve_alert_level(level)
+            parts = (config["style"], config["icon"], f"Dirigido a: {config['audience']}")
+            if len(self._levels) < self._MAX_LEVELS:
+                self._levels[level] = parts
+        return parts
+
+    def row(self, label: str, value: str) -> Dict[str, Any]:
+        """Fila etiqueta/valor de la tabla de detalle."""
+        return {
+            "type": "TableRow",
+            "cells": [
+                {"type": "TableCell", "items": [{"type": "TextBlock", "text": label, "weight": "Bolder"}], "style": "accent"},
+                {"type": "TableCell", "items": [{"type": "TextBlock", "text": value, "wrap": True}]},
+            ],
+        }
+
+    def render(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        level = payload.get("nivel") or "Nivel 1"
+        style, icon, audience = self._level_parts(level)
+        row = self.row
+        return {
+            "type": "AdaptiveCard",
+            "version": "1.5",
+            "body": [
+                {
+                    "type": "ColumnSet",
+                    "style": style,
+                    "bleed": True,
+                    "columns": [
+                        {
+                            "type": "Column",
+                            "width": "auto",
+                            "items": [{"type": "Image", "url": icon, "size": "Small", "style": "person"}],
+                        },
+                        {
+                            "type": "Column",
+                            "width": "stretch",
+                            "items": [
+                                {
+                                    "type": "TextBlock",
+                                    "text": payload.get("titulo") or "Alerta temprana",
+                                    "weight": "Bolder",
+                                    "size": "Medium",
+                                },
+                                {"type": "TextBlock", "text": audience, "isSubtle": True, "spacing": "None"},
+                            ],
+                        },
+                    ],
+                },
+                {"type": "TextBlock", "text": payload.get("cuerpo") or "", "wrap": True, "spacing": "Small"},
+                {
+                    "type": "Table",
+                    "columns": [{"width": 0.8}, {"width": 1.2}],
+                    "rows": [
+                        row("Ticket", _extract_text(payload.get("ticket_id")) or "N/A"),
+                        row("Asunto", _extract_text(payload.get("subject")) or "-"),
+                        row("Solicitante", _extract_text(payload.get("requester")) or "-"),
+                        row("Asignado a", _extract_text(payload.get("technician")) or "-"),
+                        row("Creado", _extract_text(payload.get("created_at")) or "-"),
+                        row("Umbral", _extract_text(payload.get("umbral")) or "-"),
+                        row("Nivel", level),
+                    ],
+                },
+                {
+                    "type": "ActionSet",
+                    "actions": [
+                        {
+                            "type": "Action.OpenUrl",
+                            "title": "Ver tablero",
+                            "url": payload.get("url") or "https://example.org",
+                        }
+                    ],
+                },
+            ],
+        }
+
+
+_ALERT_TEMPLATE = _AlertCardTemplate()
+
+
 def build_alert_card(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Construye la tarjeta de alerta a partir del JSON recibido."""
 
+    return _ALERT_TEMPLATE.render(payload)
+
+
+def _table_cell(text: str, **extra: Any) -> Dict[str, Any]:
+    return {"type": "TableCell", "items": [{"type": "TextBlock", "text": text, **extra}]}
+
+
+def build_alert_digest_card(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Resume varias alertas del mismo nivel en una sola tarjeta con tabla de tickets."""
+
     level = payload.get("nivel") or "Nivel 1"
     config = _resolve_alert_level(level)
-    title = payload.get("titulo") or "Alerta temprana"
-    body = payload.get("cuerpo") or ""
-    url = payload.get("url") or "https://example.org"
-    ticket_id = _extract_text(payload.get("ticket_id"))
-    subject = _extract_text(payload.get("subject"))
-    umbral = _extract_text(payload.get("umbral"))
-    requester = _extract_text(payload.get("requester"))
-    technician = _extract_text(payload.get("technician"))
-    created_at = _extract_text(payload.get("created_at"))
-
-    def _row(label: str, value: str | None) -> dict[str, Any] | None:
-        if not value:
-            return None
-        return {
+    alerts = payload.get("alertas") or []
+    title = payload.get("titulo") or f"{len(alerts)} alertas · {level}"
+    url = payload.get("url") or next((item.get("url") for item in alerts if item.get("url")), None)
+
+    rows = [
+        {
             "type": "TableRow",
             "cells": [
+                _table_cell("Ticket"),
+                _table_cell("Asunto"),
+                _table_cell("Asignado a"),
+                _table_cell("Umbral"),
+            ],
+        }
+    ]
+    for item in alerts:
+        rows.append(
+            {
+                "type": "TableRow",
+                "cells": [
+                    _table_cell(_extract_text(item.get("ticket_id")) or "N/A"),
+                    _table_cell(_extract_text(item.get("subject")) or item.get("titulo") or "-", wrap=True),
+                    _table_cell(_extract_text(item.get("technician")) or "-"),
+                    _table_cell(_extract_text(item.get("umbral")) or "-"),
+                ],
+            }
+        )
+
+    body: list[Dict[str, Any]] = [
+        {
+            "type": "ColumnSet",
+            "style": config["style"],
+            "bleed": True,
+            "columns": [
                 {
-                    "type": "TableCell",
-                    "items": [{"type": "TextBlock", "text": label, "weight": "Bolder"}],
-                    "style": "accent",
+                    "type": "Column",
+                    "width": "auto",
+                    "items": [{"type": "Image", "url": config["icon"], "size": "Small", "style": "person"}],
                 },
                 {
-                    "type": "TableCell",
-                    "items": [{"type": "TextBlock", "text": value, "wrap": True}],
+                    "type": "Column",
+                    "width": "stretch",
+                    "items": [
+                        {"type": "TextBlock", "text": title, "weight": "Bolder", "size": "Medium"},
+                        {
+                            "type": "TextBlock",
+                            "text": f"Dirigido a: {config['audience']}",
+                            "isSubtle": True,
+                            "spacing": "None",
+                        },
+                    ],
                 },
             ],
-        }
-
-    detail_rows = [
-        _row("Ticket", ticket_id or "N/A"),
-        _row("Asunto", subject or "-"),
-        _row("Solicitante", requester or "-"),
-        _row("Asignado a", technician or "-"),
-        _row("Creado", created_at or "-"),
-        _row("Umbral", umbral or "-"),
-        _row("Nivel", level),
+        },
+        {
+            "type": "Table",
+            "firstRowAsHeader": True,
+            "columns": [{"width": 0.8}, {"width": 1.6}, {"width": 1.2}, {"width": 0.8}],
+            "rows": rows,
+        },
     ]
+    if url:
+        body.append(
+            {
+                "type": "ActionSet",
+                "actions": [{"type": "Action.OpenUrl", "title": "Ver tablero", "url": url}],
+            }
+        )
+    return {"type": "AdaptiveCard", "version": "1.5", "body": body}
+
+
+RISK_BAND_CONFIG = {
+    "rojo": {"style": "attention", "label": "Rojo"},
+    "naranja": {"style": "warning", "label": "Naranja"},
+    "amarillo": {"style": "accent", "label": "Amarillo"},
+    "verde": {"style": "good", "label": "Verde"},
+}
+
+
+def _risk_band(item: Dict[str, Any]) -> Dict[str, str]:
+    return RISK_BAND_CONFIG.get(str(item.get("risk_band") or "").lower(), {"style": "emphasis", "label": "-"})
+
+
+def _days(value: Any) -> str:
+    try:
+        return f"{float(value):.1f} d"
+    except (TypeError, ValueError):
+        return "-"
 
+
+def _technician(item: Dict[str, Any]) -> str:
+    for key in ("technician_name", "technician", "technician_id"):
+        text = _extract_text(item.get(key))
+        if text:
+            return text
+    return "-"
+
+
+def _header(style: str, title: str, subtitle: str) -> Dict[str, Any]:
+    return {
+        "type": "Container",
+        "style": style,
+        "bleed": True,
+        "items": [
+            {"type": "TextBlock", "text": title, "weight": "Bolder", "size": "Medium", "wrap": True},
+            {"type": "TextBlock", "text": subtitle, "isSubtle": True, "spacing": "None", "wrap": True},
+        ],
+    }
+
+
+def _open_action(url: Optional[str], title: str) -> list[Dict[str, Any]]:
+    if not url:
+        return []
+    return [{"type": "ActionSet", "actions": [{"type": "Action.OpenUrl", "title": title, "url": url}]}]
+
+
+def build_ticket_status_card(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Estado de un ticket según el snapshot del controller (comando «ticket N»)."""
+
+    band = _risk_band(item)
+    row = _ALERT_TEMPLATE.row
+    rows = [
+        row("Asunto", _extract_text(item.get("subject")) or "-"),
+        row("Grupo", _extract_text(item.get("group")) or "-"),
+        row("Asignado a", _technician(item)),
+        row("Riesgo", f"{band['label']} · {_days(item.get('active_days'))} de {_days(item.get('threshold_days'))}"),
+    ]
+    if item.get("pause_days"):
+        pause = _extract_text(item.get("pause_category")) or "pausa"
+        rows.append(row("En pausa", f"{pause} · {_days(item.get('pause_days'))} de {_days(item.get('pause_threshold_days'))}"))
+    if item.get("created_at"):
+        rows.append(row("Creado", _extract_text(item.get("created_at")) or "-"))
     return {
         "type": "AdaptiveCard",
         "version": "1.5",
         "body": [
+            _header(band["style"], f"Ticket #{item.get('ticket_id')}", f"Riesgo {band['label'].lower()}"),
+            {"type": "Table", "columns": [{"width": 0.8}, {"width": 1.2}], "rows": rows},
+            *_open_action(item.get("ticket_link"), "Abrir ticket"),
+        ],
+    }
+
+
+def build_ticket_list_card(
+    title: str, subtitle: str, tickets: list[Dict[str, Any]], url: Optional[str] = None
+) -> Dict[str, Any]:
+    """Tabla de tickets del snapshot (comandos «riesgo <grupo>» y «mis tickets»)."""
+
+    rows = [
+        {
+            "type": "TableRow",
+            "cells": [_table_cell("Ticket"), _table_cell("Asunto"), _table_cell("Asignado a"), _table_cell("Riesgo")],
+        }
+    ]
+    for item in tickets:
+        band = _risk_band(item)
+        rows.append(
             {
-                "type": "ColumnSet",
-                "style": config["style"],
-                "bleed": True,
-                "columns": [
-                    {
-                        "type": "Column",
-                        "width": "auto",
-                        "items": [
-                            {
-                                "type": "Image",
-                                "url": config["icon"],
-                                "size": "Small",
-                                "style": "person",
-                            }
-                        ],
-                    },
-                    {
-                        "type": "Column",
-                        "width": "stretch",
-                        "items": [
-                            {
-                                "type": "TextBlock",
-                                "text": title,
-                                "weight": "Bolder",
-                                "size": "Medium",
-                            },
-                            {
-                                "type": "TextBlock",
-                                "text": f"Dirigido a: {config['audience']}",
-                                "isSubtle": True,
-                                "spacing": "None",
-                            },
-                        ],
-                    },
+                "type": "TableRow",
+                "style": band["style"],
+                "cells": [
+                    _table_cell(f"#{item.get('ticket_id')}"),
+                    _table_cell(_extract_text(item.get("subject")) or "-", wrap=True),
+                    _table_cell(_technician(item), wrap=True),
+                    _table_cell(f"{band['label']} · {_days(item.get('active_days'))}"),
                 ],
-            },
-            {"type": "TextBlock", "text": body, "wrap": True, "spacing": "Small"},
+            }
+        )
+    worst = _risk_band(tickets[0]) if tickets else {"style": "good"}
+    return {
+        "type": "AdaptiveCard",
+        "version": "1.5",
+        "body": [
+            _header(worst["style"], title, subtitle),
             {
                 "type": "Table",
-                "columns": [
-                    {"width": 0.8},
-                    {"width": 1.2},
-                ],
-                "rows": detail_rows or [
-                    _row("Ticket", ticket_id or "N/A"),
-                    _row("Umbral", umbral or "-"),
-                ],
-            },
-            {
-                "type": "ActionSet",
-                "actions": [
-                    {
-                        "type": "Action.OpenUrl",
-                        "title": "Ver tablero",
-                        "url": url,
-                    }
-                ],
+                "firstRowAsHeader": True,
+                "columns": [{"width": 0.7}, {"width": 1.6}, {"width": 1.2}, {"width": 0.9}],
+                "rows": rows,
             },
+            *_open_action(url, "Ver tablero"),
         ],
     }
 
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+log = logging.getLogger("teams_gw.coalesce")
+
+FlushCallback = Callable[[Any, str, List[Dict[str, Any]]], Awaitable[None]]
+
+
+@dataclass
+class _PendingDigest:
+    reference: Any
+    level: str
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    timer: Optional[asyncio.Task] = None
+    attempts: int = 0
+
+
+class AlertCoalescer:
+    """Merges alerts aimed at the same recipient and level into a single send.
+
+    The first alert for a ``(conversation_id, level)`` opens a window of
+    ``window`` seconds; alerts arriving inside it are buffered and handed to
+    ``flush`` together when the window closes or ``max_items`` is reached. A
+    full buffer is flushed by a background task, so the caller that hit the cap
+    returns without waiting on the send.
+
+    The caller has already been answered when a flush runs, so a failed flush
+    puts its alerts back in the buffer and retries after ``window * 2**n``
+    seconds, up to ``max_retries`` times; only then are the alerts dropped.
+    """
+
+    def __init__(self, flush: FlushCallback, *, window: float, max_items: int = 20, max_retries: int = 3) -> None:
+        self._flush = flush
+        self._window = window
+        self._max_items = max(1, max_items)
+        self._max_retries = max(0, max_retries)
+        self._pending: Dict[Tuple[str, str], _PendingDigest] = {}
+        self._flushing: Set[asyncio.Task] = set()
+        self.flushed = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.dropped = 0
+
+    async def add(self, conversation_id: str, level: str, reference: Any, payload: Dict[str, Any]) -> int:
+        """Buffer ``payload``; returns how many alerts are pending for this recipient and level."""
+        key = (conversation_id, level)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _PendingDigest(reference=reference, level=level)
+            pending.timer = asyncio.create_task(self._flush_later(key, self._window))
+        else:
+            self.coalesced += 1
+        pending.items.append(payload)
+        count = len(pending.items)
+        if count >= self._max_items:
+            del self._pending[key]
+            if pending.timer:
+                pending.timer.cancel()
+            task = asyncio.create_task(self._send(key, pending))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+        return count
+
+    async def flush_all(self) -> None:
+        """Flush every buffer now, without retries, and wait for in-flight flushes (used on shutdown)."""
+        await asyncio.gather(
+            *(self._flush_key(key, retry=False) for key in list(self._pending)), *list(self._flushing)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending_digests": len(self._pending),
+            "pending_alerts": sum(len(item.items) for item in self._pending.values()),
+            "flushed": self.flushed,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+            "dropped": self.dropped,
+        }
+
+    async def _flush_later(self, key: Tuple[str, str], delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self._flush_key(key, from_timer=True)
+
+    async def _flush_key(self, key: Tuple[str, str], from_timer: bool = False, retry: bool = True) -> None:
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        if pending.timer and not from_timer:
+            pending.timer.cancel()
+        await self._send(key, pending, retry)
+
+    async def _send(self, key: Tuple[str, str], pending: _PendingDigest, retry: bool = True) -> None:
+        try:
+            await self._flush(pending.reference, pending.level, pending.items)
+        except Exception:
+            if retry and pending.attempts < self._max_retries:
+                log.warning(
+                    "Could not flush %s coalesced alerts for convo=%s (attempt %s), will retry",
+                    len(pending.items), key[0], pending.attempts + 1, exc_info=True,
+                )
+                self._requeue(key, pending)
+            else:
+                self.dropped += len(pending.items)
+                log.exception("Dropped %s coalesced alerts for convo=%s", len(pending.items), key[0])
+            return
+        self.flushed += 1
+
+    def _requeue(self, key: Tuple[str, str], failed: _PendingDigest) -> None:
+        self.retried += 1
+        failed.attempts += 1
+        current = self._pending.get(key)
+        if current is not None:
+            # Alerts that arrived during the failed flush already opened a window; go out with them.
+            current.items[:0] = failed.items
+            current.attempts = max(current.attempts, failed.attempts)
+            return
+        failed.timer = asyncio.create_task(self._flush_later(key, self._window * 2**failed.attempts))
+        self._pending[key] = failed
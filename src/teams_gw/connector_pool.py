@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import aiohttp
+from botframework.connector.aio import ConnectorClient
+from msrest.pipeline import AsyncHTTPPolicy, AsyncHTTPSender, AsyncPipeline, Request, Response
+from msrest.pipeline.universal import RawDeserializer
+from msrest.universal_http.aiohttp import AioHttpClientResponse
+
+log = logging.getLogger("teams_gw.connector_pool")
+
+
+class ConnectorSessionPool:
+    """One keep-alive ``aiohttp`` session shared by every Bot Connector client.
+
+    The stock connector transport runs ``requests`` in the default executor with
+    a session per client and per thread, so each new client (and each executor
+    thread) pays its own TCP + TLS handshake. Sharing one connector lets every
+    ``ConnectorClient`` reuse warm connections to ``smba.trafficmanager.net``.
+    """
+
+    def __init__(
+        self,
+        *,
+        limit: int = 100,
+        limit_per_host: int = 32,
+        keepalive_timeout: float = 60.0,
+        request_timeout: float = 30.0,
+    ) -> None:
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._timeout = aiohttp.ClientTimeout(total=request_timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.requests = 0
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session binds to the running event loop.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit,
+                limit_per_host=self._limit_per_host,
+                keepalive_timeout=self._keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self) -> Dict[str, Any]:
+        connector = self._session.connector if self._session and not self._session.closed else None
+        return {
+            "open": connector is not None,
+            "limit": self._limit,
+            "limit_per_host": self._limit_per_host,
+            "requests": self.requests,
+        }
+
+
+class _HeaderCarrier:
+    """Stand-in for the ``requests.Session`` that ``AppCredentials.signed_session`` expects."""
+
+    __slots__ = ("headers",)
+
+    def __init__(self) -> None:
+        self.headers: Dict[str, str] = {}
+
+
+class _AppCredentialsPolicy(AsyncHTTPPolicy):
+    """Adds the bot's bearer token using the credentials' own ``signed_session`` rules.
+
+    When the credentials expose ``get_access_token_async`` the token is awaited
+    instead, so a cold or expiring token never blocks the event loop.
+    """
+
+    def __init__(self, credentials) -> None:
+        super().__init__()
+        self._credentials = credentials
+
+    async def send(self, request: Request, **kwargs: Any) -> Response:
+        acquire = getattr(self._credentials, "get_access_token_async", None)
+        # Same rule signed_session applies: anonymous/empty credentials send no token.
+        if acquire is not None and self._credentials._should_set_token(None):
+            request.http_request.headers["Authorization"] = f"Bearer {await acquire()}"
+        else:
+            carrier = _HeaderCarrier()
+            self._credentials.signed_session(carrier)
+            authorization = carrier.headers.get("Authorization")
+            if authorization:
+                request.http_request.headers["Authorization"] = authorization
+        return await self.next.send(request, **kwargs)
+
+
+class _PooledSender(AsyncHTTPSender):
+    def __init__(self, pool: ConnectorSessionPool) -> None:
+        self._pool = pool
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_details):
+        # The session belongs to the pool; clients never close it.
+        return None
+
+    def build_context(self) -> Any:
+        return None
+
+    async def send(self, request: Request, **config: Any) -> Response:
+        http_request = request.http_request
+        self._pool.requests += 1
+        raw = await self._pool.session.request(
+            http_request.method,
+            http_request.url,
+            headers=dict(http_request.headers),
+            data=http_request.data,
+        )
+        response = AioHttpClientResponse(http_request, raw)
+        await response.load_body()
+        return Response(request, response)
+
+
+def build_pooled_connector_client(credentials, service_url: str, pool: ConnectorSessionPool) -> ConnectorClient:
+    def pipeline(config) -> AsyncPipeline:
+        return AsyncPipeline(
+            [
+                config.user_agent_policy,
+                _AppCredentialsPolicy(config.credentials),
+                RawDeserializer(),
+                config.http_logger_policy,
+            ],
+            _PooledSender(pool),
+        )
+
+    return ConnectorClient(credentials, base_url=service_url, pipeline_type=pipeline)
+
+
+class ConnectorClientCache:
+    """LRU of ``ConnectorClient`` per (service_url, app_id, scope).
+
+    The adapter's own cache is an unbounded dict; service URLs are few in
+    practice but come from inbound traffic, so the cache is capped.
+    """
+
+    def __init__(self, max_items: int = 256) -> None:
+        self._max_items = max(1, max_items)
+        self._clients: "OrderedDict[str, ConnectorClient]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def get(self, key: str) -> Optional[ConnectorClient]:
+        client = self._clients.get(key)
+        if client is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._clients.move_to_end(key)
+        return client
+
+    def put(self, key: str, client: ConnectorClient) -> None:
+        self._clients[key] = client
+        self._clients.move_to_end(key)
+        while len(self._clients) > self._max_items:
+            evicted, _ = self._clients.popitem(last=False)
+            log.debug("Evicted connector client %s", evicted)
+
+    def clear(self) -> None:
+        self._clients.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._clients), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .dashboard import controller_base_url, fetch_controller_generic
+from .refresh import PeriodicRefresher
+from .settings import settings
+
+log = logging.getLogger("teams_gw.controller_cache")
+
+SnapshotFetcher = Callable[[], Awaitable[Tuple[Dict[str, Any], Dict[str, Any]]]]
+
+_TECHNICIAN_FIELDS = ("technician_name", "technician", "technician_id", "technician_email")
+
+
+def normalize_key(value: Any) -> str:
+    """Case-, accent- and whitespace-insensitive key for names and groups."""
+    text = unicodedata.normalize("NFKD", str(value or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def _ratio(item: Dict[str, Any]) -> float:
+    try:
+        return float(item.get("ratio") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ControllerSnapshot(PeriodicRefresher):
+    """In-gateway copy of the controller's operations and risk data, indexed for lookups.
+
+    Tickets are indexed by ``ticket_id``, technician and group so chat commands
+    answer without a controller round trip. The first lookup fetches (concurrent
+    callers share that fetch); afterwards a background task refreshes every
+    ``refresh_interval`` seconds, and a failed refresh keeps serving the last
+    good snapshot. Nothing is fetched until the snapshot is first used.
+    """
+
+    def __init__(self, fetch: SnapshotFetcher, *, refresh_interval: float = 60.0, retry_delay: float = 15.0) -> None:
+        super().__init__()
+        self._fetch = fetch
+        self._refresh_interval = refresh_interval
+        self._retry_delay = retry_delay
+        self._tickets: Dict[str, Dict[str, Any]] = {}
+        self._by_technician: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_group: Dict[str, Tuple[str, List[Dict[str, Any]]]] = {}
+        self._inflight: Optional[asyncio.Future] = None
+        self._failed_at = float("-inf")
+        self.last_updated = 0.0
+        self.refreshes = 0
+        self.failures = 0
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.last_updated)
+
+    async def ensure(self) -> bool:
+        """Make sure there is data to answer from; fetches only when the cache is cold.
+
+        After a failed cold fetch, further attempts wait ``retry_delay`` seconds
+        so a down controller does not stall every chat message.
+        """
+        if not self.last_updated and time.monotonic() - self._failed_at >= self._retry_delay:
+            try:
+                await self.refresh()
+            except Exception as exc:
+                log.warning("Controller snapshot unavailable: %r", exc)
+        return self.loaded
+
+    async def refresh(self) -> None:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._load())
+        await asyncio.shield(self._inflight)
+
+    async def _load(self) -> None:
+        try:
+            operations, risk = await self._fetch()
+        except Exception:
+            self.failures += 1
+            self._failed_at = time.monotonic()
+            raise
+        self._index(operations, risk)
+        self.last_updated = time.time()
+        self.refreshes += 1
+
+    def _index(self, operations: Dict[str, Any], risk: Dict[str, Any]) -> None:
+        tickets: Dict[str, Dict[str, Any]] = {}
+        for item in risk.get("items") or []:
+            if item.get("ticket_id") is not None:
+                tickets[str(item["ticket_id"])] = dict(item)
+        for group in operations.get("groups") or []:
+            for item in group.get("tickets") or []:
+                if item.get("ticket_id") is None:
+                    continue
+                merged = tickets.setdefault(str(item["ticket_id"]), {})
+                merged.update({key: value for key, value in item.items() if value is not None})
+                merged.setdefault("group", group.get("group"))
+
+        by_technician: Dict[str, List[Dict[str, Any]]] = {}
+        by_group: Dict[str, Tuple[str, List[Dict[str, Any]]]] = {}
+        ordered = sorted(tickets.values(), key=_ratio, reverse=True)
+        for item in ordered:
+            keys = {normalize_key(item.get(field)) for field in _TECHNICIAN_FIELDS}
+            for key in keys - {""}:
+                by_technician.setdefault(key, []).append(item)
+            group_key = normalize_key(item.get("group"))
+            if group_key:
+                by_group.setdefault(group_key, (item["group"], []))[1].append(item)
+        # Commands read the three indexes without a lock; replacing them together keeps them consistent.
+        self._tickets, self._by_technician, self._by_group = tickets, by_technician, by_group
+
+    def ticket(self, ticket_id: Any) -> Optional[Dict[str, Any]]:
+        return self._tickets.get(str(ticket_id).lstrip("#"))
+
+    def technician_tickets(self, *names: Any) -> List[Dict[str, Any]]:
+        """Tickets assigned to the first of ``names`` (display name, id, email) that matches."""
+        for name in names:
+            found = self._by_technician.get(normalize_key(name))
+            if found:
+                return found
+        return []
+
+    def group_tickets(self, query: str) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """``(group name, tickets by ratio desc)``; exact match first, then a unique partial one."""
+        key = normalize_key(query)
+        if not key:
+            return None
+        found = self._by_group.get(key)
+        if found:
+            return found
+        partial = [value for group_key, value in self._by_group.items() if key in group_key]
+        return partial[0] if len(partial) == 1 else None
+
+    def group_names(self) -> List[str]:
+        return sorted(name for name, _ in self._by_group.values())
+
+    async def refresh_due(self) -> float:
+        """Refresh a snapshot older than the interval; returns seconds until the next check."""
+        if not self.last_updated:
+            # No chat command has asked for tickets yet: don't poll the controller for nobody.
+            return self._refresh_interval
+        age = time.time() - self.last_updated
+        if age < self._refresh_interval:
+            return self._refresh_interval - age
+        try:
+            await self.refresh()
+        except Exception as exc:
+            log.warning("Controller snapshot refresh failed: %r", exc)
+            return self._retry_delay
+        return self._refresh_interval
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tickets": len(self._tickets),
+            "groups": len(self._by_group),
+            "technicians": len(self._by_technician),
+            "age": int(time.time() - self.last_updated) if self.last_updated else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+
+async def fetch_controller_tickets() -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    base = controller_base_url(settings.CONTROLLER_METRICS_URL, settings.CONTROLLER_BASE_URL)
+    operations, risk = await asyncio.gather(
+        fetch_controller_generic(f"{base}/operations"),
+        fetch_controller_generic(f"{base}/risk"),
+    )
+    return operations, risk
+
+
+controller_snapshot = ControllerSnapshot(
+    fetch_controller_tickets,
+    refresh_interval=settings.CONTROLLER_SNAPSHOT_SECONDS,
+)
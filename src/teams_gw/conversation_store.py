@@ -1,12 +1,18 @@
 from __future__ import annotations
 
 import asyncio
+import json
+import sqlite3
+import threading
+import time
 from dataclasses import asdict, dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Union
 
 from botbuilder.core import TurnContext
 from botbuilder.schema import Activity, ChannelAccount, ConversationAccount, ConversationReference
 
+from .settings import settings
+
 
 @dataclass
 class StoredConversation:
@@ -18,6 +24,22 @@ class StoredConversation:
     service_url: Optional[str]
     user_name: Optional[str]
 
+    @classmethod
+    def from_reference(cls, reference: ConversationReference) -> Optional["StoredConversation"]:
+        convo = reference.conversation or ConversationAccount()
+        user = reference.user or ChannelAccount()
+        if not convo.id:
+            return None
+        return cls(
+            reference=reference,
+            conversation_id=convo.id,
+            user_id=user.id,
+            aad_object_id=getattr(user, "aad_object_id", None),
+            tenant_id=getattr(convo, "tenant_id", None),
+            service_url=reference.service_url,
+            user_name=user.name,
+        )
+
     def summary(self) -> Dict[str, Optional[str]]:
         payload = asdict(self)
         payload.pop("reference", None)
@@ -32,32 +54,28 @@ class ConversationStore:
         self._by_conversation: Dict[str, StoredConversation] = {}
         self._user_index: Dict[str, str] = {}
         self._aad_index: Dict[str, str] = {}
+        self._tenant_index: Dict[str, Set[str]] = {}
+        self._role_members: Dict[str, Set[str]] = {}
 
-    async def remember(self, activity: Activity) -> Optional[StoredConversation]:
-        reference = TurnContext.get_conversation_reference(activity)
-        convo = reference.conversation or ConversationAccount()
-        user = reference.user or ChannelAccount()
+    async def remember(
+        self, activity: Union[Activity, ConversationReference]
+    ) -> Optional[StoredConversation]:
+        if isinstance(activity, ConversationReference):
+            reference = activity
+        else:
+            reference = TurnContext.get_conversation_reference(activity)
+            if reference.conversation and not reference.conversation.tenant_id:
+                # Teams sends the tenant as conversation.tenantId / channelData.tenant.id, which the
+                # schema (key "tenantID") does not pick up; keep it for tenant broadcasts.
+                reference.conversation.tenant_id = _activity_tenant_id(activity)
 
-        conversation_id = convo.id
-        if not conversation_id:
+        stored = StoredConversation.from_reference(reference)
+        if not stored:
             return None
 
-        stored = StoredConversation(
-            reference=reference,
-            conversation_id=conversation_id,
-            user_id=user.id,
-            aad_object_id=getattr(user, "aad_object_id", None),
-            tenant_id=getattr(convo, "tenant_id", None),
-            service_url=reference.service_url,
-            user_name=user.name,
-        )
-
+        await self._persist([stored])
         async with self._lock:
-            self._by_conversation[conversation_id] = stored
-            if stored.user_id:
-                self._user_index[stored.user_id] = conversation_id
-            if stored.aad_object_id:
-                self._aad_index[stored.aad_object_id] = conversation_id
+            self._index(stored)
         return stored
 
     async def resolve(
@@ -67,18 +85,371 @@ class ConversationStore:
         user_id: Optional[str] = None,
         aad_object_id: Optional[str] = None,
     ) -> Optional[ConversationReference]:
+        await self._refresh()
+        reference = await self._lookup(conversation_id, user_id, aad_object_id)
+        if reference is None and await self._refresh(force=True):
+            reference = await self._lookup(conversation_id, user_id, aad_object_id)
+        return reference
+
+    async def resolve_many(
+        self, targets: Iterable[tuple[Optional[str], Optional[str], Optional[str]]]
+    ) -> List[Optional[ConversationReference]]:
+        """Resolve ``(conversation_id, user_id, aad_object_id)`` tuples in a single pass."""
+        targets = list(targets)
+        await self._refresh()
         async with self._lock:
-            key = conversation_id
-            if not key and user_id:
-                key = self._user_index.get(user_id)
-            if not key and aad_object_id:
-                key = self._aad_index.get(aad_object_id)
-            stored = self._by_conversation.get(key) if key else None
-            return stored.reference if stored else None
+            resolved = [self._lookup_locked(*target) for target in targets]
+        if None in resolved and await self._refresh(force=True):
+            async with self._lock:
+                resolved = [ref or self._lookup_locked(*target) for ref, target in zip(resolved, targets)]
+        return resolved
+
+    async def select(
+        self,
+        *,
+        tenant_id: Optional[str] = None,
+        aad_object_ids: Iterable[str] = (),
+        roles: Iterable[str] = (),
+    ) -> List[ConversationReference]:
+        """Broadcast targets in one pass over the indexes.
+
+        ``aad_object_ids`` and the members registered for ``roles`` are combined;
+        ``tenant_id`` alone selects the whole tenant and, combined with the other
+        selectors, restricts them to that tenant.
+        """
+        await self._refresh()
+        async with self._lock:
+            members = set(aad_object_ids)
+            for role in roles:
+                members |= self._role_members.get(role, set())
+
+            if members:
+                keys = {
+                    self._aad_index.get(member) or self._user_index.get(member) for member in members
+                }
+                keys.discard(None)
+                if tenant_id:
+                    keys &= self._tenant_index.get(tenant_id, set())
+            elif tenant_id and not roles:
+                keys = set(self._tenant_index.get(tenant_id, set()))
+            else:
+                keys = set()
+            return [self._by_conversation[key].reference for key in keys]
+
+    async def set_role_members(self, role: str, members: Iterable[str]) -> None:
+        """Register the aad_object_ids (or user ids) that receive broadcasts for ``role``."""
+        members = {member for member in members if member}
+        await self._persist_role(role, members)
+        async with self._lock:
+            if members:
+                self._role_members[role] = members
+            else:
+                self._role_members.pop(role, None)
+
+    async def role_members(self) -> Dict[str, List[str]]:
+        await self._refresh()
+        async with self._lock:
+            return {role: sorted(members) for role, members in self._role_members.items()}
 
     async def summaries(self) -> List[Dict[str, Optional[str]]]:
+        await self._refresh()
         async with self._lock:
             return [stored.summary() for stored in self._by_conversation.values()]
 
+    async def export(self) -> List[Dict[str, Any]]:
+        """Serialized references, one dict per stored conversation."""
+        return [record async for record in self.iter_export()]
+
+    async def iter_export(self) -> AsyncIterator[Dict[str, Any]]:
+        """Like :meth:`export`, serializing one reference at a time as the caller consumes them."""
+        await self._refresh()
+        async with self._lock:
+            references = [stored.reference for stored in self._by_conversation.values()]
+        for reference in references:
+            yield reference.serialize()
+
+    async def bulk_load(
+        self,
+        records: Iterable[Union[ConversationReference, Dict[str, Any]]],
+        *,
+        overwrite: bool = True,
+    ) -> int:
+        """Load many references at once: one storage write, then only the loaded records are indexed.
+
+        Records without ``conversation.id`` are ignored. With ``overwrite=False``
+        conversations already in the store keep their (newer) reference. Returns
+        how many were loaded.
+        """
+        items: Dict[str, StoredConversation] = {}
+        for record in records:
+            reference = record if isinstance(record, ConversationReference) else _load_reference(record)
+            stored = StoredConversation.from_reference(reference)
+            if stored:
+                items[stored.conversation_id] = stored
+        if not overwrite:
+            await self._refresh(force=True)
+            async with self._lock:
+                items = {key: item for key, item in items.items() if key not in self._by_conversation}
+        if not items:
+            return 0
+
+        await self._persist(list(items.values()), overwrite=overwrite)
+        async with self._lock:
+            for stored in items.values():
+                self._index(stored)
+        return len(items)
+
+    async def load_snapshot(self, path: str) -> int:
+        """Load a line-delimited JSON export produced by :meth:`export`.
+
+        Only conversations missing from the store are added: every worker loads
+        the snapshot on start, and references remembered since it was taken win.
+        """
+        records = await asyncio.to_thread(_read_ndjson_file, path)
+        return await self.bulk_load(records, overwrite=False)
+
+    async def _lookup(
+        self,
+        conversation_id: Optional[str],
+        user_id: Optional[str],
+        aad_object_id: Optional[str],
+    ) -> Optional[ConversationReference]:
+        async with self._lock:
+            return self._lookup_locked(conversation_id, user_id, aad_object_id)
+
+    def _lookup_locked(
+        self,
+        conversation_id: Optional[str],
+        user_id: Optional[str],
+        aad_object_id: Optional[str],
+    ) -> Optional[ConversationReference]:
+        key = conversation_id
+        if not key and user_id:
+            key = self._user_index.get(user_id)
+        if not key and aad_object_id:
+            key = self._aad_index.get(aad_object_id)
+        stored = self._by_conversation.get(key) if key else None
+        return stored.reference if stored else None
+
+    def _index(self, stored: StoredConversation) -> None:
+        """Register ``stored`` in the lookup tables. Caller must hold ``self._lock``."""
+        previous = self._by_conversation.get(stored.conversation_id)
+        if previous:
+            self._unindex_secondary(previous)
+        self._by_conversation[stored.conversation_id] = stored
+        self._index_secondary(stored)
+
+    def _index_secondary(self, stored: StoredConversation) -> None:
+        if stored.user_id:
+            self._user_index[stored.user_id] = stored.conversation_id
+        if stored.aad_object_id:
+            self._aad_index[stored.aad_object_id] = stored.conversation_id
+        if stored.tenant_id:
+            self._tenant_index.setdefault(stored.tenant_id, set()).add(stored.conversation_id)
+
+    def _unindex_secondary(self, stored: StoredConversation) -> None:
+        """Drop the lookups that still point at ``stored``, so a replaced reference leaves none behind."""
+        key = stored.conversation_id
+        if stored.user_id and self._user_index.get(stored.user_id) == key:
+            del self._user_index[stored.user_id]
+        if stored.aad_object_id and self._aad_index.get(stored.aad_object_id) == key:
+            del self._aad_index[stored.aad_object_id]
+        if stored.tenant_id:
+            self._tenant_index.get(stored.tenant_id, set()).discard(key)
+
+    async def _persist(self, items: List[StoredConversation], overwrite: bool = True) -> None:
+        """Hook for stores backed by shared storage; the in-memory store keeps nothing else."""
+
+    async def _persist_role(self, role: str, members: Set[str]) -> None:
+        """Hook for stores backed by shared storage."""
+
+    async def _refresh(self, force: bool = False) -> bool:
+        """Pull changes written by other processes. Returns True when something was applied."""
+        return False
+
+
+class SqliteConversationStore(ConversationStore):
+    """Conversation registry shared by several worker processes through a SQLite file.
+
+    The database runs in WAL mode so readers never block the writer. Every write
+    stamps the row with a monotonically increasing ``seq``; each process keeps the
+    in-memory indexes of :class:`ConversationStore` as a local cache and tails the
+    rows whose ``seq`` is greater than the last one it applied; role membership
+    carries a version bumped on every change and is only re-read when it moves.
+    Tailing happens at
+    most every ``sync_interval`` seconds and immediately on a lookup miss, so a
+    ``remember`` in one worker is visible to ``resolve`` in the others within that
+    bound.
+    """
+
+    def __init__(self, path: str, *, sync_interval: float = 1.0) -> None:
+        super().__init__()
+        self._path = path
+        self._sync_interval = max(0.0, sync_interval)
+        self._last_seq = 0
+        self._roles_version = -1
+        self._last_sync = 0.0
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " conversation_id TEXT PRIMARY KEY,"
+            " seq INTEGER NOT NULL,"
+            " reference TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS conversations_seq ON conversations(seq)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS role_members ("
+            " role TEXT NOT NULL,"
+            " member TEXT NOT NULL,"
+            " PRIMARY KEY (role, member))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS roles_version ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0),"
+            " version INTEGER NOT NULL)"
+        )
+        self._conn.execute("INSERT OR IGNORE INTO roles_version (id, version) VALUES (0, 0)")
+
+    async def _persist(self, items: List[StoredConversation], overwrite: bool = True) -> None:
+        rows = [
+            (item.conversation_id, json.dumps(item.reference.serialize(), separators=(",", ":")))
+            for item in items
+        ]
+        await asyncio.to_thread(self._write_rows, rows, overwrite)
+
+    def _write_rows(self, rows: List[tuple[str, str]], overwrite: bool = True) -> None:
+        # OR IGNORE also covers rows another worker inserted after our last sync.
+        conflict = "REPLACE" if overwrite else "IGNORE"
+        with self._db_lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                (seq,) = cur.execute("SELECT COALESCE(MAX(seq), 0) FROM conversations").fetchone()
+                cur.executemany(
+                    f"INSERT OR {conflict} INTO conversations (conversation_id, seq, reference) VALUES (?, ?, ?)",
+                    [(conversation_id, seq + offset, ref) for offset, (conversation_id, ref) in enumerate(rows, 1)],
+                )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    async def _persist_role(self, role: str, members: Set[str]) -> None:
+        await asyncio.to_thread(self._write_role, role, sorted(members))
+
+    def _write_role(self, role: str, members: List[str]) -> None:
+        with self._db_lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.execute("DELETE FROM role_members WHERE role = ?", (role,))
+                cur.executemany(
+                    "INSERT INTO role_members (role, member) VALUES (?, ?)", [(role, m) for m in members]
+                )
+                cur.execute("UPDATE roles_version SET version = version + 1 WHERE id = 0")
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    def _read_since(
+        self, seq: int, roles_version: int
+    ) -> tuple[List[tuple[int, str]], Optional[tuple[int, List[tuple[str, str]]]]]:
+        """Conversation rows after ``seq`` and, if the version moved, ``(version, role rows)``."""
+        with self._db_lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                rows = cur.execute(
+                    "SELECT seq, reference FROM conversations WHERE seq > ? ORDER BY seq", (seq,)
+                ).fetchall()
+                (version,) = cur.execute("SELECT version FROM roles_version WHERE id = 0").fetchone()
+                roles = None
+                if version != roles_version:
+                    roles = (version, cur.execute("SELECT role, member FROM role_members").fetchall())
+            finally:
+                cur.execute("COMMIT")
+        return rows, roles
+
+    async def _refresh(self, force: bool = False) -> bool:
+        now = time.monotonic()
+        if not force and now - self._last_sync < self._sync_interval:
+            return False
+        self._last_sync = now
+        rows, roles = await asyncio.to_thread(self._read_since, self._last_seq, self._roles_version)
+        if roles is not None:
+            version, members = roles
+            role_members: Dict[str, Set[str]] = {}
+            for role, member in members:
+                role_members.setdefault(role, set()).add(member)
+            async with self._lock:
+                self._role_members = role_members
+                self._roles_version = version
+        if not rows:
+            return False
+        async with self._lock:
+            for seq, raw in rows:
+                stored = StoredConversation.from_reference(_load_reference(raw))
+                if stored:
+                    self._index(stored)
+                self._last_seq = max(self._last_seq, seq)
+        return True
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._conn.close()
+
+
+def _activity_tenant_id(activity: Activity) -> Optional[str]:
+    channel_data = activity.channel_data if isinstance(activity.channel_data, dict) else {}
+    tenant = channel_data.get("tenant") if isinstance(channel_data.get("tenant"), dict) else {}
+    extra = getattr(activity.conversation, "additional_properties", None) or {}
+    return tenant.get("id") or extra.get("tenantId")
+
+
+def _load_reference(raw: Union[str, Dict[str, Any]]) -> ConversationReference:
+    data = json.loads(raw) if isinstance(raw, str) else raw
+    return ConversationReference().deserialize(data)
+
+
+def parse_ndjson_lines(lines: Iterable[Union[str, bytes]], start: int = 1) -> List[Dict[str, Any]]:
+    """Decode line-delimited JSON, skipping blank lines. Raises ``ValueError`` on bad input.
+
+    ``start`` is the number of the first line, for error messages on a chunk of a longer stream.
+    """
+    records: List[Dict[str, Any]] = []
+    for number, line in enumerate(lines, start):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"line {number}: {exc.msg}") from exc
+        if not isinstance(record, dict):
+            raise ValueError(f"line {number}: expected a JSON object")
+        records.append(record)
+    return records
+
+
+def _read_ndjson_file(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as handle:
+        return parse_ndjson_lines(handle)
+
+
+def build_conversation_store(path: Optional[str] = None, *, sync_interval: float = 1.0) -> ConversationStore:
+    """Return the shared SQLite registry when ``path`` is set, otherwise the in-memory one."""
+    if path:
+        return SqliteConversationStore(path, sync_interval=sync_interval)
+    return ConversationStore()
+
 
-conversation_store = ConversationStore()
+conversation_store = build_conversation_store(
+    settings.CONVERSATION_STORE_PATH,
+    sync_interval=settings.CONVERSATION_STORE_SYNC_SECONDS,
+)
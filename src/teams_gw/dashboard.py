@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import json
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import aiohttp
 from fastapi.responses import HTMLResponse
@@ -90,6 +90,15 @@ async def fetch_controller_generic(url: str) -> Dict[str, Any]:
             return await response.json()
 
 
+def controller_base_url(metrics_url: str, base_url: Optional[str] = None) -> str:
+    if base_url:
+        return base_url.rstrip("/")
+    # Derivar base removiendo el último segmento de metrics
+    url = metrics_url.rstrip("/")
+    parts = url.rsplit("/", 1)
+    return parts[0] if len(parts) == 2 else url
+
+
 def build_dashboard_payload(raw: Dict[str, Any], allowed_roles: List[str]) -> Dict[str, Any]:
     levels = raw.get("levels") or {}
     notifications = raw.get("recent_notifications") or []
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class TimedDedupCache(Generic[T]):
+    """Bounded map of recently seen keys to their results.
+
+    Entries expire ``ttl`` seconds after they were stored and the oldest entries
+    are evicted once ``max_items`` is reached. ``run_once`` also coalesces
+    concurrent callers with the same key onto a single in-flight call, so a retry
+    that arrives while the original is still running waits for it instead of
+    repeating the work.
+    """
+
+    def __init__(self, ttl: float, max_items: int = 10_000) -> None:
+        self._ttl = ttl
+        self._max_items = max(1, max_items)
+        self._items: "OrderedDict[Hashable, Tuple[float, T]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Optional[T]:
+        """Live value for ``key``, counted in ``hits`` when found."""
+        value = self._live(key)
+        if value is not None:
+            self.hits += 1
+        return value
+
+    def _live(self, key: Hashable) -> Optional[T]:
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            return None
+        return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._live(key) is not None
+
+    def put(self, key: Hashable, value: T, ttl: Optional[float] = None) -> None:
+        """Store ``value``; ``ttl`` overrides the cache-wide lifetime for this entry."""
+        self._items[key] = (time.monotonic() + (self._ttl if ttl is None else ttl), value)
+        self._items.move_to_end(key)
+        self._evict()
+
+    def discard(self, key: Hashable) -> bool:
+        """Forget ``key``; returns whether a live entry was removed."""
+        present = key in self
+        self._items.pop(key, None)
+        return present
+
+    def add(self, key: Hashable) -> bool:
+        """Mark ``key`` as seen. Returns False when it was already present (a duplicate)."""
+        if key in self:
+            self.hits += 1
+            return False
+        self.put(key, True)  # type: ignore[arg-type]
+        return True
+
+    async def run_once(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Return ``(result, replayed)``; ``factory`` runs only for unseen keys.
+
+        Failures are not cached, so a later retry runs ``factory`` again.
+        """
+        cached = self._live(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, True
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending), True
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await factory()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved when nobody else was waiting on it.
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            self.put(key, value)
+            return value, False
+        finally:
+            self._inflight.pop(key, None)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._items:
+            oldest_key, (expires_at, _) = next(iter(self._items.items()))
+            if expires_at > now and len(self._items) <= self._max_items:
+                break
+            del self._items[oldest_key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._items), "inflight": len(self._inflight), "hits": self.hits}
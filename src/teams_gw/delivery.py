@@ -0,0 +1,386 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+log = logging.getLogger("teams_gw.delivery")
+
+Sender = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+STATUS_QUEUED = "queued"
+STATUS_SENDING = "sending"
+STATUS_RETRYING = "retrying"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+# Literal in the claim query and index so SQLite can match the partial index.
+_PENDING_STATUSES = f"('{STATUS_QUEUED}', '{STATUS_RETRYING}', '{STATUS_SENDING}')"
+
+
+class PermanentDeliveryError(Exception):
+    """Raised by a sender when retrying the item cannot succeed (e.g. 403/404 from Teams)."""
+
+
+class DeliveryQueue:
+    """Durable outbound queue for proactive messages.
+
+    Items live in a SQLite (WAL) file so they survive restarts and can be shared by
+    several worker processes. A pool of asyncio workers claims due items, hands them
+    to ``sender`` and records the outcome. Failures are retried with exponential
+    backoff plus jitter; after ``max_attempts`` the item is dead-lettered with status
+    ``failed``. Claimed items carry a lease, so an item left ``sending`` by a crashed
+    process becomes eligible again once the lease expires; while a send is in
+    progress (including a Retry-After wait) its lease is renewed every third of
+    ``lease_seconds``.
+
+    Items are claimed by priority lane (higher first). Waiting items age by one lane
+    every ``aging_seconds`` so bulk lanes cannot starve, and ``reserved_workers`` of
+    the pool only take items at or above ``reserved_min_priority``, keeping capacity
+    free for critical escalations while the bulk lanes are saturated. Since every
+    item ages at the same rate, that order is fixed at enqueue time
+    (``created_at - priority * aging_seconds``) and read from an index.
+
+    Sent and failed items are deleted ``retention_seconds`` after their last
+    update by a sweep that runs every ``sweep_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sender: Sender,
+        *,
+        workers: int = 4,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        lease_seconds: float = 60.0,
+        poll_interval: float = 0.5,
+        aging_seconds: float = 30.0,
+        reserved_workers: int = 0,
+        reserved_min_priority: int = 0,
+        retention_seconds: Optional[float] = 86400.0,
+        sweep_interval: float = 600.0,
+    ) -> None:
+        self._sender = sender
+        self._workers = max(1, workers)
+        self._max_attempts = max(1, max_attempts)
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._lease_seconds = lease_seconds
+        self._poll_interval = poll_interval
+        self._aging_seconds = max(0.001, aging_seconds)
+        self._reserved_workers = min(max(0, reserved_workers), self._workers - 1)
+        self._reserved_min_priority = reserved_min_priority
+        self._retention_seconds = retention_seconds
+        self._sweep_interval = max(1.0, sweep_interval)
+        self._sweeper: Optional[asyncio.Task] = None
+        self._latencies: Dict[int, deque] = defaultdict(lambda: deque(maxlen=500))
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS deliveries ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " priority INTEGER NOT NULL DEFAULT 0,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at REAL NOT NULL,"
+            " lease_until REAL NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " request TEXT NOT NULL,"
+            " result TEXT,"
+            " last_error TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(deliveries)")}
+        if "priority" not in columns:
+            self._conn.execute("ALTER TABLE deliveries ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+        if "claim_order" not in columns:
+            self._conn.execute("ALTER TABLE deliveries ADD COLUMN claim_order REAL NOT NULL DEFAULT 0")
+        # Pending rows take this instance's aging_seconds, in case it changed since they were queued.
+        self._conn.execute(
+            f"UPDATE deliveries SET claim_order = created_at - priority * ? WHERE status IN {_PENDING_STATUSES}",
+            (self._aging_seconds,),
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS deliveries_due ON deliveries(status, next_attempt_at)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS deliveries_claim ON deliveries(claim_order) WHERE status IN {_PENDING_STATUSES}"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS deliveries_updated ON deliveries(status, updated_at)")
+
+    # ------------------------------------------------------------------ API
+    async def enqueue(self, request: Dict[str, Any], priority: int = 0) -> str:
+        delivery_id = uuid.uuid4().hex
+        await asyncio.to_thread(
+            self._insert, delivery_id, json.dumps(request, separators=(",", ":")), priority
+        )
+        self._wakeup.set()
+        return delivery_id
+
+    async def get(self, delivery_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._select_one, delivery_id)
+
+    async def stats(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self._count_by_status)
+
+    async def lane_stats(self) -> Dict[int, Dict[str, Any]]:
+        """Pending depth per priority lane plus queue-to-sent latency of recent deliveries."""
+        depths = await asyncio.to_thread(self._depth_by_priority)
+        lanes: Dict[int, Dict[str, Any]] = {}
+        for priority in sorted(set(depths) | set(self._latencies), reverse=True):
+            samples = sorted(self._latencies.get(priority) or ())
+            latency = None
+            if samples:
+                latency = {
+                    "count": len(samples),
+                    "avg_ms": round(sum(samples) / len(samples) * 1000, 1),
+                    "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1),
+                    "max_ms": round(samples[-1] * 1000, 1),
+                }
+            lanes[priority] = {"depth": depths.get(priority, 0), "latency": latency}
+        return lanes
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._worker(idx), name=f"delivery-worker-{idx}")
+            for idx in range(self._workers)
+        ]
+        if self._retention_seconds is not None:
+            self._sweeper = asyncio.create_task(self._sweep(), name="delivery-sweeper")
+        log.info("Delivery queue started with %s workers", self._workers)
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Let workers drain due items for up to ``drain_timeout`` seconds, then cancel them.
+
+        Anything still pending stays in the database and is picked up on the next start.
+        """
+        if not self._tasks:
+            return
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        self._stopping = True
+        self._wakeup.set()
+        done, pending = await asyncio.wait(self._tasks, timeout=drain_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+        log.info("Delivery queue stopped (cancelled=%s)", len(pending))
+
+    async def purge(self, older_than: float) -> int:
+        """Delete sent and failed items last updated more than ``older_than`` seconds ago."""
+        return await asyncio.to_thread(self._delete_finished, time.time() - older_than)
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._conn.close()
+
+    # -------------------------------------------------------------- workers
+    async def _worker(self, idx: int) -> None:
+        min_priority = self._reserved_min_priority if idx < self._reserved_workers else None
+        while True:
+            item = await asyncio.to_thread(self._claim, min_priority)
+            if item is None:
+                if self._stopping:
+                    return
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._process(item)
+
+    async def _sweep(self) -> None:
+        while True:
+            try:
+                deleted = await self.purge(self._retention_seconds)
+            except Exception as exc:
+                log.warning("Delivery retention sweep failed: %r", exc)
+            else:
+                if deleted:
+                    log.info("Deleted %s finished deliveries older than %ss", deleted, self._retention_seconds)
+            await asyncio.sleep(self._sweep_interval)
+
+    async def _keep_lease(self, delivery_id: str) -> None:
+        # A send can outlive the lease while the rate limiter waits out a Retry-After;
+        # without renewing, another worker would reclaim the item and send it twice.
+        while True:
+            await asyncio.sleep(self._lease_seconds / 3)
+            await asyncio.to_thread(self._renew_lease, delivery_id)
+
+    async def _process(self, item: Dict[str, Any]) -> None:
+        delivery_id = item["id"]
+        attempts = item["attempts"]
+        lease = asyncio.create_task(self._keep_lease(delivery_id))
+        try:
+            result = await self._sender(item["request"])
+        except asyncio.CancelledError:
+            # Shutdown mid-send: release the lease so the item is retried on next start.
+            await asyncio.to_thread(self._release, delivery_id)
+            raise
+        except PermanentDeliveryError as exc:
+            log.error("Delivery %s failed permanently: %s", delivery_id, exc)
+            await asyncio.to_thread(self._finish, delivery_id, STATUS_FAILED, None, str(exc))
+            return
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            if attempts >= self._max_attempts:
+                log.error("Delivery %s dead-lettered after %s attempts: %s", delivery_id, attempts, error)
+                await asyncio.to_thread(self._finish, delivery_id, STATUS_FAILED, None, error)
+                return
+            delay = self._backoff(attempts)
+            log.warning("Delivery %s attempt %s failed, retrying in %.1fs: %s", delivery_id, attempts, delay, error)
+            await asyncio.to_thread(self._schedule_retry, delivery_id, time.time() + delay, error)
+            return
+        finally:
+            lease.cancel()
+        self._latencies[item["priority"]].append(time.time() - item["created_at"])
+        await asyncio.to_thread(self._finish, delivery_id, STATUS_SENT, result, None)
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self._max_delay, self._base_delay * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    # ------------------------------------------------------------- storage
+    def _insert(self, delivery_id: str, request: str, priority: int) -> None:
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT INTO deliveries"
+                " (id, status, priority, claim_order, next_attempt_at, created_at, updated_at, request)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (delivery_id, STATUS_QUEUED, priority, now - priority * self._aging_seconds, now, now, now, request),
+            )
+
+    def _claim(self, min_priority: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._db_lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                # Walks deliveries_claim in order and stops at the first due row: no sort.
+                row = cur.execute(
+                    "SELECT id, attempts, request, priority, created_at FROM deliveries INDEXED BY deliveries_claim"
+                    f" WHERE status IN {_PENDING_STATUSES}"
+                    " AND ((status != ? AND next_attempt_at <= ?) OR (status = ? AND lease_until <= ?))"
+                    " AND priority >= ?"
+                    " ORDER BY claim_order LIMIT 1",
+                    (
+                        STATUS_SENDING,
+                        now,
+                        STATUS_SENDING,
+                        now,
+                        min_priority if min_priority is not None else -(2**31),
+                    ),
+                ).fetchone()
+                if row is None:
+                    cur.execute("COMMIT")
+                    return None
+                delivery_id, attempts, request, priority, created_at = row
+                cur.execute(
+                    "UPDATE deliveries SET status = ?, attempts = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                    (STATUS_SENDING, attempts + 1, now + self._lease_seconds, now, delivery_id),
+                )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return {
+            "id": delivery_id,
+            "attempts": attempts + 1,
+            "priority": priority,
+            "created_at": created_at,
+            "request": json.loads(request),
+        }
+
+    def _finish(self, delivery_id: str, status: str, result: Optional[Dict[str, Any]], error: Optional[str]) -> None:
+        with self._db_lock:
+            self._conn.execute(
+                "UPDATE deliveries SET status = ?, result = ?, last_error = ?, lease_until = 0, updated_at = ?"
+                " WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), delivery_id),
+            )
+
+    def _schedule_retry(self, delivery_id: str, next_attempt_at: float, error: str) -> None:
+        with self._db_lock:
+            self._conn.execute(
+                "UPDATE deliveries SET status = ?, next_attempt_at = ?, last_error = ?, lease_until = 0,"
+                " updated_at = ? WHERE id = ?",
+                (STATUS_RETRYING, next_attempt_at, error, time.time(), delivery_id),
+            )
+
+    def _renew_lease(self, delivery_id: str) -> None:
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute(
+                "UPDATE deliveries SET lease_until = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (now + self._lease_seconds, now, delivery_id, STATUS_SENDING),
+            )
+
+    def _delete_finished(self, cutoff: float) -> int:
+        with self._db_lock:
+            cur = self._conn.execute(
+                "DELETE FROM deliveries WHERE status IN (?, ?) AND updated_at < ?",
+                (STATUS_SENT, STATUS_FAILED, cutoff),
+            )
+            return cur.rowcount
+
+    def _release(self, delivery_id: str) -> None:
+        with self._db_lock:
+            self._conn.execute(
+                "UPDATE deliveries SET status = ?, attempts = MAX(attempts - 1, 0), lease_until = 0,"
+                " updated_at = ? WHERE id = ?",
+                (STATUS_QUEUED, time.time(), delivery_id),
+            )
+
+    def _select_one(self, delivery_id: str) -> Optional[Dict[str, Any]]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT id, status, attempts, created_at, updated_at, result, last_error, priority"
+                " FROM deliveries WHERE id = ?",
+                (delivery_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "attempts": row[2],
+            "created_at": row[3],
+            "updated_at": row[4],
+            "result": json.loads(row[5]) if row[5] else None,
+            "last_error": row[6],
+            "priority": row[7],
+        }
+
+    def _depth_by_priority(self) -> Dict[int, int]:
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT priority, COUNT(*) FROM deliveries WHERE status IN (?, ?, ?) GROUP BY priority",
+                (STATUS_QUEUED, STATUS_RETRYING, STATUS_SENDING),
+            ).fetchall()
+        return {priority: count for priority, count in rows}
+
+    def _count_by_status(self) -> Dict[str, int]:
+        with self._db_lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM deliveries GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
@@ -1,7 +1,8 @@
 from __future__ import annotations
 from fastapi import APIRouter
 from .settings import settings
-import msal, os
+from .tokens import default_token_provider
+import os
 
 router = APIRouter()
 
@@ -29,17 +30,12 @@ async def env_echo():
 @router.get("/__auth-probe")
 async def auth_probe():
     """
-    Intenta obtener un token de app para https://api.botframework.com/.default
-    Útil para confirmar AppId/Secret (y tenant si aplica).
+    Intenta obtener un token de app para el scope del bot (https://api.botframework.com/.default).
+    Útil para confirmar AppId/Secret (y tenant si aplica). Usa la caché de tokens del proceso.
     """
-    tenant = settings.MICROSOFT_APP_TENANT_ID or "organizations"
-    authority = f"https://login.microsoftonline.com/{tenant}"
-    app = msal.ConfidentialClientApplication(
-        client_id=settings.MICROSOFT_APP_ID,
-        client_credential=os.getenv("MICROSOFT_APP_PASSWORD"),
-        authority=authority,
-    )
-    result = app.acquire_token_for_client(scopes=["https://api.botframework.com/.default"])
-    if "access_token" in result:
-        return {"ok": True, "expires_in": result.get("expires_in")}
-    return {"ok": False, "error": result.get("error"), "desc": result.get("error_description")}
+    provider = default_token_provider()
+    try:
+        await provider.get_token_async()
+    except Exception as exc:
+        return {"ok": False, "error": type(exc).__name__, "desc": str(exc)}
+    return {"ok": True, "expires_in": provider.stats()["expires_in"]}
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from botframework.connector.auth import JwtTokenExtractor
+from jwt.algorithms import RSAAlgorithm
+
+from .refresh import PeriodicRefresher
+
+log = logging.getLogger("teams_gw.inbound_auth")
+
+
+class SigningKey:
+    """Parsed JWKS entry; same shape as botframework's ``_OpenIdConfig``."""
+
+    __slots__ = ("public_key", "endorsements")
+
+    def __init__(self, public_key: Any, endorsements: List[str]) -> None:
+        self.public_key = public_key
+        self.endorsements = endorsements
+
+
+class OpenIdMetadata:
+    """Async replacement for botframework's ``_OpenIdMetadata``.
+
+    The stock class fetches with blocking ``requests`` on the event loop and
+    re-parses the JWK on every request. Here keys are fetched with aiohttp,
+    parsed once per refresh, and concurrent refreshes share one fetch. An
+    unknown ``kid`` (key rotation) triggers a refresh at most once every
+    ``unknown_kid_interval`` seconds.
+    """
+
+    def __init__(self, url: str, *, unknown_kid_interval: float = 300.0, timeout: float = 10.0) -> None:
+        self.url = url
+        self._unknown_kid_interval = unknown_kid_interval
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._keys: Dict[str, SigningKey] = {}
+        self._inflight: Optional[asyncio.Future] = None
+        self.last_updated = 0.0
+        self.refreshes = 0
+
+    async def get(self, key_id: Optional[str]) -> Optional[SigningKey]:
+        if not self.last_updated:
+            await self.refresh()
+        key = self._keys.get(key_id) if key_id else None
+        if key is None and time.time() - self.last_updated > self._unknown_kid_interval:
+            log.info("Signing key %s not in cached JWKS for %s, refreshing", key_id, self.url)
+            await self.refresh()
+            key = self._keys.get(key_id) if key_id else None
+        if key is None:
+            raise PermissionError(f"Unknown token signing key: {key_id}")
+        return key
+
+    async def refresh(self) -> None:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._fetch())
+        await asyncio.shield(self._inflight)
+
+    async def _fetch(self) -> None:
+        async with aiohttp.ClientSession(timeout=self._timeout) as session:
+            async with session.get(self.url) as response:
+                response.raise_for_status()
+                metadata = await response.json(content_type=None)
+            async with session.get(metadata["jwks_uri"]) as response:
+                response.raise_for_status()
+                jwks = await response.json(content_type=None)
+        keys: Dict[str, SigningKey] = {}
+        for item in jwks.get("keys", []):
+            if "kid" not in item:
+                continue
+            keys[item["kid"]] = SigningKey(RSAAlgorithm.from_jwk(json.dumps(item)), item.get("endorsements", []))
+        # A validation that awaits during this fetch must still find the previous key set intact.
+        self._keys = keys
+        self.last_updated = time.time()
+        self.refreshes += 1
+
+
+class OpenIdMetadataRegistry(PeriodicRefresher):
+    """One ``OpenIdMetadata`` per metadata URL, refreshed in the background.
+
+    ``install`` points botframework's ``JwtTokenExtractor`` at this registry, so
+    every channel/emulator validation path uses the shared, pre-parsed keys.
+    """
+
+    def __init__(self, *, refresh_interval: float = 21600.0, unknown_kid_interval: float = 300.0, retry_delay: float = 60.0) -> None:
+        super().__init__()
+        self._refresh_interval = refresh_interval
+        self._unknown_kid_interval = unknown_kid_interval
+        self._retry_delay = retry_delay
+        self._metadata: Dict[str, OpenIdMetadata] = {}
+
+    def get(self, url: str) -> OpenIdMetadata:
+        metadata = self._metadata.get(url)
+        if metadata is None:
+            metadata = self._metadata[url] = OpenIdMetadata(url, unknown_kid_interval=self._unknown_kid_interval)
+        return metadata
+
+    def install(self) -> None:
+        JwtTokenExtractor.get_open_id_metadata = staticmethod(self.get)
+
+    async def refresh_due(self) -> float:
+        """Refresh metadata older than the interval; returns seconds until the next check."""
+        wait = self._refresh_interval
+        for metadata in list(self._metadata.values()):
+            if not metadata.last_updated:
+                # Registered but no token validated against it yet; get() loads it on demand.
+                continue
+            age = time.time() - metadata.last_updated
+            if age < self._refresh_interval:
+                wait = min(wait, self._refresh_interval - age)
+                continue
+            try:
+                await metadata.refresh()
+            except Exception as exc:
+                log.warning("OpenID metadata refresh failed for %s: %r", metadata.url, exc)
+                wait = min(wait, self._retry_delay)
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            url: {"keys": len(metadata._keys), "age": int(time.time() - metadata.last_updated) if metadata.last_updated else None}
+            for url, metadata in self._metadata.items()
+        }
+
+
+def auth_cache_key(auth_header: str, channel_id: Optional[str], service_url: Optional[str]) -> str:
+    """Hash of the bearer header plus the inputs validation checks it against."""
+    digest = hashlib.sha256(auth_header.encode("utf-8")).hexdigest()
+    return f"{digest}|{channel_id or ''}|{service_url or ''}"
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Any, Dict, Mapping, Optional, Tuple
+
+# Attributes every LogRecord has; anything else came in through ``extra=``.
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and any ``extra`` fields.
+
+    ``extra={"access": {...}}`` dicts are merged into the top level so access log
+    fields can be queried directly; a field that would overwrite one already set
+    (``ts``, ``level``, ``logger``, ``msg`` or another extra) is written as
+    ``"access.<field>"`` instead. Messages longer than ``max_chars`` (connector
+    error bodies, mostly) are truncated.
+    """
+
+    def __init__(self, max_chars: int = 4000) -> None:
+        super().__init__()
+        self._max_chars = max_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if len(message) > self._max_chars:
+            message = f"{message[: self._max_chars]}… (+{len(message) - self._max_chars} chars)"
+        data: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": message,
+        }
+        for key, value in record.__dict__.items():
+            if key in _RECORD_ATTRS or key.startswith("_"):
+                continue
+            if isinstance(value, Mapping):
+                for field, field_value in value.items():
+                    data[f"{key}.{field}" if field in data else field] = field_value
+            else:
+                data[f"extra.{key}" if key in data else key] = value
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class LogSampler(logging.Filter):
+    """Per-logger sampling and rate limiting for records below WARNING.
+
+    ``sample_every`` maps a logger name (or dotted prefix) to N: one in N records
+    is kept. ``rate_limits`` maps a logger name to the records per second allowed
+    through. Warnings and errors always pass. Runs on the caller's thread, before
+    the record is queued, so dropped records cost no formatting at all.
+    """
+
+    def __init__(self, sample_every: Optional[Mapping[str, int]] = None, rate_limits: Optional[Mapping[str, float]] = None) -> None:
+        super().__init__()
+        self._sample_every = {name: max(1, int(n)) for name, n in (sample_every or {}).items()}
+        self._rate_limits = {name: float(rate) for name, rate in (rate_limits or {}).items()}
+        self._counters: Dict[str, int] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._rules: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _rule(self, name: str, table: Mapping[str, Any]) -> Optional[str]:
+        while name:
+            if name in table:
+                return name
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rules = self._rules.get(record.name)
+        if rules is None:
+            rules = self._rules[record.name] = (
+                self._rule(record.name, self._sample_every),
+                self._rule(record.name, self._rate_limits),
+            )
+        sample_rule, rate_rule = rules
+        if sample_rule is None and rate_rule is None:
+            return True
+        with self._lock:
+            if sample_rule is not None:
+                seen = self._counters.get(sample_rule, 0)
+                self._counters[sample_rule] = seen + 1
+                if seen % self._sample_every[sample_rule]:
+                    self.dropped += 1
+                    return False
+            if rate_rule is not None:
+                rate = self._rate_limits[rate_rule]
+                capacity = max(1.0, rate)
+                now = time.monotonic()
+                tokens, updated = self._buckets.get(rate_rule, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                if tokens < 1:
+                    self._buckets[rate_rule] = (tokens, now)
+                    self.dropped += 1
+                    return False
+                self._buckets[rate_rule] = (tokens - 1, now)
+        return True
+
+
+class _LazyQueueHandler(QueueHandler):
+    """Queues the record as-is; the listener thread formats it.
+
+    The stock ``prepare`` renders the message on the calling thread (the event
+    loop). Log arguments must therefore not be mutated after the call, which
+    holds for this codebase. When the queue is full the record is dropped and
+    counted instead of blocking the loop.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.overflow = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.overflow += 1
+
+
+class LogPipeline:
+    """Root logger → bounded queue → background thread writing to ``stream``."""
+
+    def __init__(
+        self,
+        *,
+        level: str = "INFO",
+        json_format: bool = True,
+        sample_every: Optional[Mapping[str, int]] = None,
+        rate_limits: Optional[Mapping[str, float]] = None,
+        max_queue: int = 10_000,
+        stream: Optional[IO[str]] = None,
+    ) -> None:
+        self.level = level
+        self.sampler = LogSampler(sample_every, rate_limits)
+        self.handler = _LazyQueueHandler(queue.Queue(maxsize=max_queue))
+        self.handler.addFilter(self.sampler)
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter() if json_format else logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+        self.listener = QueueListener(self.handler.queue, output, respect_handler_level=True)
+        self._previous: Dict[str, Tuple[list, int, bool]] = {}
+
+    def install(self, logger: Optional[logging.Logger] = None, capture: Tuple[str, ...] = ()) -> None:
+        """Route ``logger`` (root by default) through the queue and start the writer thread.
+
+        Loggers named in ``capture`` (e.g. uvicorn's, which bring their own
+        synchronous handlers) lose their handlers and propagate to ``logger``.
+        """
+        if self._previous:
+            return
+        target = logger or logging.getLogger()
+        for item in (target, *(logging.getLogger(name) for name in capture)):
+            self._previous[item.name] = (item.handlers[:], item.level, item.propagate)
+            item.handlers = []
+            item.propagate = item is not target or item.propagate
+        target.handlers = [self.handler]
+        target.setLevel(self.level)
+        self._target = target
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Flush queued records and restore the previous handlers."""
+        if not self._previous:
+            return
+        self.listener.stop()
+        for name, (handlers, level, propagate) in self._previous.items():
+            item = self._target if name == self._target.name else logging.getLogger(name)
+            item.handlers, item.propagate = handlers, propagate
+            item.setLevel(level)
+        self._previous = {}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.handler.queue.qsize(),
+            "sampled_out": self.sampler.dropped,
+            "overflow": self.handler.overflow,
+        }
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+from urllib.parse import urlparse
+
+log = logging.getLogger("teams_gw.ratelimit")
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Reservation-based token bucket.
+
+    ``reserve`` always takes a token and returns how long the caller must wait for it,
+    so concurrent senders queue up fairly instead of spinning. ``block`` pushes the
+    bucket into the future (used for ``Retry-After``).
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def block(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, until)
+        # Drain the burst so traffic resumes at the sustained rate after the pause.
+        self.tokens = min(self.tokens, 0.0)
+
+
+def region_key(service_url: Optional[str]) -> str:
+    """``https://smba.trafficmanager.net/amer/`` → ``smba.trafficmanager.net/amer``."""
+    if not service_url:
+        return ""
+    parsed = urlparse(service_url)
+    segments = [seg for seg in parsed.path.split("/") if seg]
+    return f"{parsed.netloc}/{segments[0]}" if segments else parsed.netloc
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Return the ``Retry-After`` delay for a throttled (429) connector error, else ``None``."""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    if status != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    raw = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if raw is None:
+        return 1.0
+    try:
+        return max(0.0, float(raw))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(raw).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class OutboundRateLimiter:
+    """Token buckets per conversation and per service_url region for outbound sends.
+
+    Defaults sit just under the documented Teams limits (per conversation ~60
+    messages / 30 s with short bursts of 7; per bot ~50 RPS). A 429 answer pauses
+    the affected buckets for its ``Retry-After`` and the call is retried up to
+    ``max_retries`` times.
+    """
+
+    def __init__(
+        self,
+        *,
+        conversation_rate: float = 1.8,
+        conversation_burst: float = 7,
+        region_rate: float = 45,
+        region_burst: float = 50,
+        max_retries: int = 3,
+        max_retry_after: float = 60.0,
+        max_buckets: int = 10_000,
+    ) -> None:
+        self._conversation_rate = conversation_rate
+        self._conversation_burst = conversation_burst
+        self._region_rate = region_rate
+        self._region_burst = region_burst
+        self._max_retries = max_retries
+        self._max_retry_after = max_retry_after
+        self._max_buckets = max_buckets
+        self._conversations: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._regions: dict[str, TokenBucket] = {}
+        self.throttled = 0
+
+    def _conversation_bucket(self, conversation_id: str) -> TokenBucket:
+        bucket = self._conversations.get(conversation_id)
+        if bucket is None:
+            bucket = TokenBucket(self._conversation_rate, self._conversation_burst)
+            self._conversations[conversation_id] = bucket
+            if len(self._conversations) > self._max_buckets:
+                self._conversations.popitem(last=False)
+        else:
+            self._conversations.move_to_end(conversation_id)
+        return bucket
+
+    def _region_bucket(self, service_url: Optional[str]) -> TokenBucket:
+        key = region_key(service_url)
+        bucket = self._regions.get(key)
+        if bucket is None:
+            bucket = self._regions[key] = TokenBucket(self._region_rate, self._region_burst)
+        return bucket
+
+    async def acquire(self, conversation_id: Optional[str], service_url: Optional[str]) -> None:
+        now = time.monotonic()
+        wait = self._region_bucket(service_url).reserve(now)
+        if conversation_id:
+            wait = max(wait, self._conversation_bucket(conversation_id).reserve(now))
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def penalize(self, conversation_id: Optional[str], service_url: Optional[str], delay: float) -> None:
+        until = time.monotonic() + delay
+        if conversation_id:
+            self._conversation_bucket(conversation_id).block(until)
+        else:
+            self._region_bucket(service_url).block(until)
+
+    async def call(
+        self,
+        conversation_id: Optional[str],
+        service_url: Optional[str],
+        operation: Callable[[], Awaitable[T]],
+    ) -> T:
+        attempt = 0
+        while True:
+            await self.acquire(conversation_id, service_url)
+            try:
+                return await operation()
+            except Exception as exc:
+                delay = retry_after_seconds(exc)
+                if delay is None or attempt >= self._max_retries:
+                    raise
+                attempt += 1
+                self.throttled += 1
+                delay = min(delay, self._max_retry_after)
+                log.warning(
+                    "Teams throttled convo=%s region=%s, retrying in %.1fs (attempt %s)",
+                    conversation_id,
+                    region_key(service_url),
+                    delay,
+                    attempt,
+                )
+                self.penalize(conversation_id, service_url, delay)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "conversations": len(self._conversations),
+            "regions": sorted(self._regions),
+            "throttled": self.throttled,
+        }
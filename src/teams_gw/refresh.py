@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class PeriodicRefresher(ABC):
+    """Base for caches kept fresh by one background task.
+
+    Subclasses implement ``refresh_due``: renew whatever is due and return the
+    seconds until the next check. The task sleeps at least ``min_sleep`` seconds
+    between checks and, when ``max_sleep`` is set, at most that long.
+    """
+
+    def __init__(self, *, min_sleep: float = 1.0, max_sleep: Optional[float] = None) -> None:
+        self._min_sleep = min_sleep
+        self._max_sleep = max_sleep
+        self._task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    async def refresh_due(self) -> float:
+        """Renew whatever is due; return the seconds until the next check."""
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            delay = max(self._min_sleep, await self.refresh_due())
+            if self._max_sleep is not None:
+                delay = min(self._max_sleep, delay)
+            await asyncio.sleep(delay)
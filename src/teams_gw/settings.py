@@ -1,6 +1,6 @@
 from __future__ import annotations
 import os
-from typing import Optional
+from typing import Literal, Optional
 from pydantic import Field, AliasChoices
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -25,19 +25,98 @@ class Settings(BaseSettings):
             "MicrosoftAppScope",
         ),
     )
+    # Renovación en segundo plano del token de la app antes de que venza.
+    MSAL_TOKEN_REFRESH_AHEAD_SECONDS: float = Field(default=600)
+    # Caché MSAL compartida del proceso; si se define, persiste en disco entre reinicios.
+    MSAL_TOKEN_CACHE_PATH: Optional[str] = Field(default=None)
+    # Validación de JWT entrantes: caché por hash del token hasta su exp y metadatos OpenID/JWKS en segundo plano.
+    INBOUND_AUTH_CACHE_ENABLED: bool = Field(default=True)
+    INBOUND_AUTH_CACHE_MAX_ITEMS: int = Field(default=10000)
+    OPENID_METADATA_REFRESH_SECONDS: float = Field(default=21600)
+    OPENID_UNKNOWN_KID_REFRESH_SECONDS: float = Field(default=300)
+    # serviceUrl ya confiados (se recalculan al vencer).
+    SERVICE_URL_TRUST_SECONDS: float = Field(default=43200)
+    SERVICE_URL_TRUST_MAX_ITEMS: int = Field(default=1024)
+    # Logging asíncrono (cola + hilo escritor), JSON por línea y muestreo/límite por logger para INFO.
+    # Por defecto se conserva 1 de cada 10 líneas exitosas del access log de /api/messages.
+    LOG_LEVEL: str = Field(default="INFO")
+    LOG_FORMAT: Literal["json", "text"] = Field(default="json")
+    LOG_SAMPLE_EVERY: dict[str, int] = Field(default_factory=lambda: {"teams_gw.access": 10})
+    LOG_RATE_LIMITS: dict[str, float] = Field(default_factory=dict)
+    LOG_QUEUE_MAX_ITEMS: int = Field(default=10000)
+    # Fast-ack de /api/messages: responde 200 tras validar el token y ejecuta el turno en segundo plano.
+    INBOUND_FAST_ACK: bool = Field(default=False)
+    INBOUND_TURN_CONCURRENCY: int = Field(default=16)
+    INBOUND_TURN_MAX_PENDING: int = Field(default=1000)
+    INBOUND_TURN_DRAIN_SECONDS: float = Field(default=10)
+    # Ventana y tamaño del registro de actividades entrantes ya recibidas (reintentos de Teams).
+    INBOUND_DEDUP_SECONDS: float = Field(default=600)
+    INBOUND_DEDUP_MAX_ITEMS: int = Field(default=10000)
     BOT_DISPLAY_NAME: str = Field(default="bot de Teams")
     BOT_DEFAULT_REPLY: str = Field(default="Hola, soy tu bot de Teams.")
     PROACTIVE_DEFAULT_MESSAGE: str = Field(default="Hola, este es un mensaje proactivo.")
     PROACTIVE_API_KEY: Optional[str] = Field(default=None)
+    PROACTIVE_BATCH_CONCURRENCY: int = Field(default=8)
+    # Registro inicial rol -> aad_object_ids para /api/proactive/broadcast (JSON).
+    BROADCAST_ROLE_MEMBERS: dict[str, list[str]] = Field(default_factory=dict)
+    # Ventana de deduplicación por Idempotency-Key (o ticket_id + nivel + destino). 0 = desactivada.
+    PROACTIVE_DEDUP_SECONDS: float = Field(default=600)
+    PROACTIVE_DEDUP_MAX_ITEMS: int = Field(default=10000)
+    # Agrupa alertas por destinatario y nivel en una tarjeta resumen. 0 = desactivado.
+    PROACTIVE_COALESCE_SECONDS: float = Field(default=0)
+    PROACTIVE_COALESCE_MAX_ITEMS: int = Field(default=20)
+    # Texto + tarjeta en una sola actividad (un envío al Bot Connector por alerta).
+    PROACTIVE_COMPOSITE_MESSAGES: bool = Field(default=True)
+    # Tamaño máximo (bytes) de cada tarjeta enviada; las tablas más grandes se parten en páginas.
+    CARD_MAX_BYTES: int = Field(default=26000)
+    CARD_COMPACT_IMPLIED_TYPES: bool = Field(default=True)
+    # Tarjeta enviada por (conversación, ticket_id) para actualizarla en sitio al escalar.
+    PROACTIVE_CARD_TRACK_SECONDS: float = Field(default=259200)
+    PROACTIVE_CARD_TRACK_MAX_ITEMS: int = Field(default=20000)
+    # Cola durable de envíos proactivos (SQLite). Vacío = envío inline.
+    PROACTIVE_QUEUE_PATH: Optional[str] = Field(default=None)
+    PROACTIVE_QUEUE_WORKERS: int = Field(default=4)
+    PROACTIVE_QUEUE_MAX_ATTEMPTS: int = Field(default=5)
+    PROACTIVE_QUEUE_DRAIN_SECONDS: float = Field(default=10.0)
+    # Horas que se conservan los envíos sent/failed antes de borrarlos (0 = no borrar).
+    PROACTIVE_QUEUE_RETENTION_HOURS: float = Field(default=24.0)
+    # Carriles por prioridad (Nivel 1..4): envejecimiento anti-inanición y workers reservados.
+    PROACTIVE_QUEUE_AGING_SECONDS: float = Field(default=30.0)
+    PROACTIVE_QUEUE_RESERVED_WORKERS: int = Field(default=1)
+    PROACTIVE_QUEUE_RESERVED_MIN_PRIORITY: int = Field(default=3)
     PORT: int = int(os.getenv("PORT", "8000"))
     ENV: str = os.getenv("ENV", "prod")
+    # Límites de envío hacia Teams (token bucket por conversación y por región de serviceUrl).
+    TEAMS_RATE_LIMIT_ENABLED: bool = Field(default=True)
+    TEAMS_CONVERSATION_RATE: float = Field(default=1.8)
+    TEAMS_CONVERSATION_BURST: float = Field(default=7)
+    TEAMS_REGION_RATE: float = Field(default=45)
+    TEAMS_REGION_BURST: float = Field(default=50)
+    TEAMS_THROTTLE_MAX_RETRIES: int = Field(default=3)
+    # Pool HTTP keep-alive compartido por los ConnectorClient de Bot Framework.
+    CONNECTOR_POOL_ENABLED: bool = Field(default=True)
+    CONNECTOR_POOL_LIMIT: int = Field(default=100)
+    CONNECTOR_POOL_LIMIT_PER_HOST: int = Field(default=32)
+    CONNECTOR_POOL_KEEPALIVE_SECONDS: float = Field(default=60.0)
+    CONNECTOR_CLIENT_CACHE_SIZE: int = Field(default=256)
     CONTROLLER_METRICS_URL: str = Field(
         default="https://criteriat-sdp-mda-controller.onrender.com/controller/metrics"
     )
     CONTROLLER_BASE_URL: Optional[str] = Field(default=None)
+    # Copia local de /operations y /risk para los comandos del bot; se renueva en segundo plano.
+    CONTROLLER_SNAPSHOT_SECONDS: float = Field(default=60)
     TACTICAL_SOURCE_URL: Optional[str] = Field(default=None)
     DASHBOARD_ROLES: str = Field(
         default="supervisor,jefe_operacion,jefe_servicios,gerente"
     )
+    # Estado del bot por conversación: LRU/TTL en memoria y, si se define la ruta, SQLite (WAL).
+    BOT_STATE_STORAGE_PATH: Optional[str] = Field(default=None)
+    BOT_STATE_MAX_ITEMS: int = Field(default=5000)
+    BOT_STATE_TTL_SECONDS: float = Field(default=604800)
+    # Registro compartido entre workers (SQLite WAL). Vacío = registro en memoria.
+    CONVERSATION_STORE_PATH: Optional[str] = Field(default=None)
+    CONVERSATION_STORE_SYNC_SECONDS: float = Field(default=1.0)
+    # Export NDJSON de /api/conversations/export que se carga al iniciar.
+    CONVERSATION_SNAPSHOT_PATH: Optional[str] = Field(default=None)
 
 settings = Settings()
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from botbuilder.core import Storage
+from jsonpickle.pickler import Pickler
+from jsonpickle.unpickler import Unpickler
+
+from .settings import settings
+
+
+def _dumps(value: Any) -> str:
+    # Same flattening BotState uses for its change hash, so any state it can track round-trips.
+    return json.dumps(Pickler().flatten(value), sort_keys=True, separators=(",", ":"))
+
+
+def _loads(text: str) -> Any:
+    return Unpickler().restore(json.loads(text))
+
+
+class BoundedStateStorage(Storage):
+    """Bot state storage with LRU/TTL eviction, replacing botbuilder's ``MemoryStorage``.
+
+    Items are kept as their JSON text, which is compact, makes every read return
+    a fresh copy, and makes "unchanged" a string comparison: a write whose JSON
+    equals the stored one is skipped. At most ``max_items`` keys stay in memory
+    and keys untouched for ``ttl`` seconds expire. Without a database evicted
+    state is gone, as with any in-memory store; with ``SqliteStateStorage`` the
+    memory holds only the most recent items. E-tags are not enforced: writes are
+    last-writer-wins, which is how ``BotState`` uses storage.
+    """
+
+    def __init__(self, *, max_items: int = 5000, ttl: Optional[float] = None) -> None:
+        self._max_items = max(1, max_items)
+        self._ttl = ttl
+        self._items: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.reads = 0
+        self.writes = 0
+        self.skipped_writes = 0
+
+    def _cached(self, key: str) -> Optional[str]:
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        touched, text = entry
+        if self._ttl is not None and time.monotonic() - touched > self._ttl:
+            del self._items[key]
+            return None
+        return text
+
+    def _remember(self, key: str, text: str) -> None:
+        self._items[key] = (time.monotonic(), text)
+        self._items.move_to_end(key)
+        while len(self._items) > self._max_items:
+            self._items.popitem(last=False)
+
+    async def read(self, keys: List[str]) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for key in keys or []:
+            text = self._cached(key)
+            if text is None:
+                continue
+            self._remember(key, text)
+            data[key] = _loads(text)
+        self.reads += len(data)
+        return data
+
+    async def write(self, changes: Dict[str, Any]) -> None:
+        if changes is None:
+            raise Exception("Changes are required when writing")
+        pending = self._changed(changes)
+        for key, text in pending:
+            self._remember(key, text)
+
+    def _changed(self, changes: Dict[str, Any]) -> List[Tuple[str, str]]:
+        pending: List[Tuple[str, str]] = []
+        for key, value in changes.items():
+            text = _dumps(value)
+            if self._cached(key) == text:
+                self.skipped_writes += 1
+                continue
+            pending.append((key, text))
+        self.writes += len(pending)
+        return pending
+
+    async def delete(self, keys: List[str]) -> None:
+        for key in keys or []:
+            self._items.pop(key, None)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": len(self._items),
+            "reads": self.reads,
+            "writes": self.writes,
+            "skipped_writes": self.skipped_writes,
+        }
+
+
+class SqliteStateStorage(BoundedStateStorage):
+    """``BoundedStateStorage`` persisted to a SQLite file (WAL), surviving restarts.
+
+    Reads always go to the database, so several workers sharing the file see
+    each other's writes; the in-memory LRU then only remembers the last JSON per
+    key to skip unchanged writes. Rows not written for ``ttl`` seconds are
+    ignored on read and pruned every ``prune_every`` writes.
+    """
+
+    def __init__(self, path: str, *, max_items: int = 5000, ttl: Optional[float] = None, prune_every: int = 500) -> None:
+        super().__init__(max_items=max_items, ttl=ttl)
+        self._prune_every = max(1, prune_every)
+        self._writes_since_prune = 0
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bot_state ("
+            " key TEXT PRIMARY KEY,"
+            " updated_at REAL NOT NULL,"
+            " value TEXT NOT NULL)"
+        )
+
+    async def read(self, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        rows = await asyncio.to_thread(self._read_rows, list(keys))
+        data: Dict[str, Any] = {}
+        for key, text in rows:
+            self._remember(key, text)
+            data[key] = _loads(text)
+        self.reads += len(data)
+        return data
+
+    async def write(self, changes: Dict[str, Any]) -> None:
+        if changes is None:
+            raise Exception("Changes are required when writing")
+        pending = self._changed(changes)
+        if not pending:
+            return
+        await asyncio.to_thread(self._write_rows, pending)
+        for key, text in pending:
+            self._remember(key, text)
+
+    async def delete(self, keys: List[str]) -> None:
+        await super().delete(keys)
+        if keys:
+            await asyncio.to_thread(self._delete_rows, list(keys))
+
+    def _read_rows(self, keys: List[str]) -> List[Tuple[str, str]]:
+        oldest = time.time() - self._ttl if self._ttl is not None else 0.0
+        placeholders = ",".join("?" * len(keys))
+        with self._db_lock:
+            return self._conn.execute(
+                f"SELECT key, value FROM bot_state WHERE key IN ({placeholders}) AND updated_at >= ?",
+                (*keys, oldest),
+            ).fetchall()
+
+    def _write_rows(self, rows: List[Tuple[str, str]]) -> None:
+        now = time.time()
+        with self._db_lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.executemany(
+                    "INSERT OR REPLACE INTO bot_state (key, updated_at, value) VALUES (?, ?, ?)",
+                    [(key, now, text) for key, text in rows],
+                )
+                self._writes_since_prune += len(rows)
+                if self._ttl is not None and self._writes_since_prune >= self._prune_every:
+                    cur.execute("DELETE FROM bot_state WHERE updated_at < ?", (now - self._ttl,))
+                    self._writes_since_prune = 0
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    def _delete_rows(self, keys: List[str]) -> None:
+        with self._db_lock:
+            self._conn.executemany("DELETE FROM bot_state WHERE key = ?", [(key,) for key in keys])
+
+    async def stats(self) -> Dict[str, Any]:
+        rows = await asyncio.to_thread(self._count_rows)
+        return {**await super().stats(), "rows": rows}
+
+    def _count_rows(self) -> int:
+        with self._db_lock:
+            (rows,) = self._conn.execute("SELECT COUNT(*) FROM bot_state").fetchone()
+        return rows
+
+    def close(self) -> None:
+        with self._db_lock:
+            self._conn.close()
+
+
+def build_state_storage(path: Optional[str] = None, *, max_items: int = 5000, ttl: Optional[float] = None) -> BoundedStateStorage:
+    """Return SQLite-backed bot state storage when ``path`` is set, otherwise the in-memory one."""
+    if path:
+        return SqliteStateStorage(path, max_items=max_items, ttl=ttl)
+    return BoundedStateStorage(max_items=max_items, ttl=ttl)
+
+
+state_storage = build_state_storage(
+    settings.BOT_STATE_STORAGE_PATH,
+    max_items=settings.BOT_STATE_MAX_ITEMS,
+    ttl=settings.BOT_STATE_TTL_SECONDS or None,
+)
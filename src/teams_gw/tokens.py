@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from msal import ConfidentialClientApplication, SerializableTokenCache
+
+from .refresh import PeriodicRefresher
+from .settings import settings
+
+log = logging.getLogger("teams_gw.tokens")
+
+
+class TokenUnavailable(RuntimeError):
+    """No valid token is cached and acquiring one would block the event loop."""
+
+
+class AppTokenProvider:
+    """Client-credentials tokens for one (app, authority, scope), acquired off the event loop.
+
+    Callers read the cached token; MSAL only runs in a worker thread. Concurrent
+    refreshes share one in-flight call, and ``TokenRefresher`` renews the token
+    ahead of expiry, so requests do not wait on login.microsoftonline.com once
+    the first token has been issued.
+    """
+
+    def __init__(
+        self,
+        app_id: str,
+        password: str,
+        authority: str,
+        scope: str,
+        *,
+        expiry_margin: float = 300.0,
+        token_cache: Optional[SerializableTokenCache] = None,
+        on_acquired: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.app_id = app_id
+        self.authority = authority
+        self.scope = scope
+        self._password = password
+        self._expiry_margin = expiry_margin
+        self._token_cache = token_cache
+        self._on_acquired = on_acquired
+        self._msal_app: Optional[ConfidentialClientApplication] = None
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._issued_at = 0.0
+        self._expires_at = 0.0
+        self._inflight: Optional[asyncio.Future] = None
+        self.refreshes = 0
+
+    @property
+    def tenant(self) -> str:
+        """Tenant segment of the authority, which MSAL stores as the cache entry's ``realm``."""
+        return self.authority.rstrip("/").rsplit("/", 1)[-1]
+
+    @property
+    def expires_at(self) -> float:
+        return self._expires_at
+
+    def refresh_at(self, refresh_ahead: float) -> float:
+        """When to renew: ``refresh_ahead`` before expiry, or half-life for short-lived tokens."""
+        lifetime = self._expires_at - self._issued_at
+        return self._expires_at - min(refresh_ahead, lifetime / 2)
+
+    def cached(self) -> Optional[str]:
+        """The current token while it is outside the expiry margin, else ``None``."""
+        if self._token and self._expires_at - time.time() > self._expiry_margin:
+            return self._token
+        return None
+
+    def get_token(self) -> str:
+        """Synchronous access for botbuilder's ``signed_session``.
+
+        MSAL never runs on the event loop thread: a token inside the expiry
+        margin is still served while a background refresh renews it, and with
+        no valid token a refresh is scheduled and ``TokenUnavailable`` raised.
+        Only callers without a running loop acquire inline.
+        """
+        token = self.cached()
+        if token:
+            return token
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self._acquire(force=False)
+        if self._inflight is None or self._inflight.done():
+            self._inflight = loop.run_in_executor(None, self._acquire, False)
+            self._inflight.add_done_callback(self._log_failure)
+        if self._token and self._expires_at > time.time():
+            return self._token
+        raise TokenUnavailable(f"No access token cached yet for app_id={self.app_id} scope={self.scope}")
+
+    async def get_token_async(self) -> str:
+        return self.cached() or await self.refresh(force=False)
+
+    async def refresh(self, force: bool = True) -> str:
+        """Acquire a token in the default executor, joining any refresh already running."""
+        if self._inflight is None or self._inflight.done():
+            loop = asyncio.get_running_loop()
+            self._inflight = loop.run_in_executor(None, self._acquire, force)
+        return await asyncio.shield(self._inflight)
+
+    def _log_failure(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            log.warning("Background token acquisition failed for app_id=%s scope=%s: %r", self.app_id, self.scope, future.exception())
+
+    def _acquire(self, force: bool) -> str:
+        with self._lock:
+            if not force:
+                # Another thread may have refreshed while this one waited for the lock.
+                token = self.cached()
+                if token:
+                    return token
+            app = self._app()
+            if force:
+                # MSAL would hand back its cached token until 5 minutes before expiry.
+                stale = app.token_cache.search(
+                    app.token_cache.CredentialType.ACCESS_TOKEN,
+                    target=[self.scope],
+                    # The cache is shared process-wide: only this tenant's entry is stale.
+                    query={"client_id": self.app_id, "realm": self.tenant},
+                )
+                for item in list(stale):
+                    app.token_cache.remove_at(item)
+            result = app.acquire_token_for_client(scopes=[self.scope])
+            token = result.get("access_token")
+            if not token:
+                raise RuntimeError(f"Could not acquire access token via MSAL: {result}")
+            self._token = token
+            self._issued_at = time.time()
+            self._expires_at = self._issued_at + int(result.get("expires_in", 3600))
+            self.refreshes += 1
+        if self._on_acquired:
+            self._on_acquired()
+        return token
+
+    def _app(self) -> ConfidentialClientApplication:
+        if self._msal_app is None:
+            self._msal_app = ConfidentialClientApplication(
+                client_id=self.app_id,
+                client_credential=self._password,
+                authority=self.authority,
+                token_cache=self._token_cache,
+            )
+        return self._msal_app
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "app_id": self.app_id,
+            "scope": self.scope,
+            "expires_in": max(0, int(self._expires_at - time.time())) if self._token else None,
+            "refreshes": self.refreshes,
+        }
+
+
+class TokenRefresher(PeriodicRefresher):
+    """Background task that renews tracked tokens ``refresh_ahead`` seconds before they expire.
+
+    Only providers that already hold a token are refreshed; a failed renewal is
+    retried after ``retry_delay`` while the still-valid token keeps being served.
+    """
+
+    def __init__(self, *, refresh_ahead: float = 600.0, retry_delay: float = 30.0, max_sleep: float = 60.0) -> None:
+        # max_sleep bounds how long a provider registered mid-sleep waits for its first check.
+        super().__init__(max_sleep=max_sleep)
+        self._refresh_ahead = refresh_ahead
+        self._retry_delay = retry_delay
+        self._providers: "weakref.WeakSet[AppTokenProvider]" = weakref.WeakSet()
+        self._retry_at: "weakref.WeakKeyDictionary[AppTokenProvider, float]" = weakref.WeakKeyDictionary()
+        self._warm: "weakref.WeakSet[AppTokenProvider]" = weakref.WeakSet()
+        self.failures = 0
+
+    def track(self, provider: AppTokenProvider, *, warm: bool = False) -> None:
+        """Keep ``provider`` fresh; ``warm`` also fetches its first token in the background."""
+        self._providers.add(provider)
+        if warm and not provider.expires_at:
+            self._warm.add(provider)
+
+    async def refresh_due(self) -> float:
+        """Renew every provider inside its refresh window; returns seconds until the next one is due."""
+        now = time.time()
+        next_due = now + self._max_sleep
+        for provider in list(self._providers):
+            if provider.expires_at:
+                due = provider.refresh_at(self._refresh_ahead)
+            elif provider in self._warm:
+                due = now
+            else:
+                continue
+            due = max(due, self._retry_at.get(provider, 0.0))
+            if due <= now:
+                try:
+                    await provider.refresh(force=bool(provider.expires_at))
+                except Exception as exc:
+                    self.failures += 1
+                    log.warning("Token refresh failed for app_id=%s scope=%s: %r", provider.app_id, provider.scope, exc)
+                    due = self._retry_at[provider] = time.time() + self._retry_delay
+                else:
+                    self._retry_at.pop(provider, None)
+                    self._warm.discard(provider)
+                    due = provider.refresh_at(self._refresh_ahead)
+            next_due = min(next_due, due)
+        return next_due - time.time()
+
+
+class AppTokenRegistry:
+    """Process-wide ``AppTokenProvider`` per (app_id, tenant, scope).
+
+    Every provider shares one MSAL ``SerializableTokenCache``, so credentials
+    built anywhere in the process (botbuilder's own, diagnostics, probes) reuse
+    the same token instead of running their own client-credentials exchange.
+    With ``cache_path`` the cache is written after each acquisition and loaded
+    on start, so a restart within the token lifetime skips AAD entirely.
+    """
+
+    def __init__(self, *, cache_path: Optional[str] = None, refresher: Optional[TokenRefresher] = None) -> None:
+        self._cache_path = cache_path
+        self._refresher = refresher
+        self._cache = SerializableTokenCache()
+        self._providers: Dict[Tuple[str, str, str], AppTokenProvider] = {}
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as handle:
+                    self._cache.deserialize(handle.read())
+            except (OSError, ValueError) as exc:
+                log.warning("Ignoring unreadable MSAL token cache %s: %r", cache_path, exc)
+
+    def provider(self, app_id: str, password: str, tenant: str, scope: str) -> AppTokenProvider:
+        key = (app_id, tenant, scope)
+        provider = self._providers.get(key)
+        if provider is not None:
+            return provider
+        with self._lock:
+            provider = self._providers.get(key)
+            if provider is None:
+                provider = AppTokenProvider(
+                    app_id,
+                    password,
+                    f"https://login.microsoftonline.com/{tenant}",
+                    scope,
+                    token_cache=self._cache,
+                    on_acquired=self._persist,
+                )
+                self._providers[key] = provider
+                if self._refresher:
+                    self._refresher.track(provider)
+        return provider
+
+    def _persist(self) -> None:
+        if not self._cache_path or not self._cache.has_state_changed:
+            return
+        with self._persist_lock:
+            directory = os.path.dirname(os.path.abspath(self._cache_path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".msal-cache-")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                    handle.write(self._cache.serialize())
+                os.chmod(tmp_path, 0o600)
+                os.replace(tmp_path, self._cache_path)
+            except OSError:
+                log.exception("Could not persist MSAL token cache to %s", self._cache_path)
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                return
+            self._cache.has_state_changed = False
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [provider.stats() for provider in self._providers.values()]
+
+
+def normalize_scope(scope: Optional[str]) -> str:
+    scope = (scope or "https://api.botframework.com/.default").strip()
+    if not scope.endswith("/.default"):
+        scope = f"{scope.rstrip('/')}/.default"
+    return scope
+
+
+token_refresher = TokenRefresher(refresh_ahead=settings.MSAL_TOKEN_REFRESH_AHEAD_SECONDS)
+token_registry = AppTokenRegistry(cache_path=settings.MSAL_TOKEN_CACHE_PATH, refresher=token_refresher)
+
+
+def default_token_provider() -> AppTokenProvider:
+    """Provider for the bot's own app registration, as configured in settings."""
+    return token_registry.provider(
+        settings.MICROSOFT_APP_ID,
+        settings.MICROSOFT_APP_PASSWORD,
+        os.getenv("MicrosoftAppTenantId") or settings.MICROSOFT_APP_TENANT_ID or "botframework.com",
+        normalize_scope(os.getenv("MicrosoftAppOAuthScope") or settings.MICROSOFT_APP_OAUTH_SCOPE),
+    )
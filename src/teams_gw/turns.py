@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+log = logging.getLogger("teams_gw.turns")
+
+TurnFactory = Callable[[], Awaitable[Any]]
+
+
+class TurnFailed(Exception):
+    """Raised by a turn whose error was already logged; counted as failed without a traceback."""
+
+
+def _latency_summary(samples: Deque[float]) -> Optional[Dict[str, Any]]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "avg_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+class TurnExecutor:
+    """Runs inbound bot turns in the background after the HTTP request has been acked.
+
+    Turns for the same key (conversation id) run one at a time in arrival order;
+    different keys run concurrently, up to ``concurrency`` turns at once. At most
+    ``max_pending`` turns may be queued; ``submit`` returns False beyond that so
+    the caller can fall back to processing inline.
+    """
+
+    def __init__(self, *, concurrency: int = 16, max_pending: int = 1000, samples: int = 1000) -> None:
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._max_pending = max(1, max_pending)
+        self._queues: Dict[str, Deque[Tuple[float, TurnFactory]]] = {}
+        self._runners: Dict[str, asyncio.Task] = {}
+        self._pending = 0
+        self._running = 0
+        self._turn_latency: Deque[float] = deque(maxlen=samples)
+        self._queue_wait: Deque[float] = deque(maxlen=samples)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(self, key: str, factory: TurnFactory) -> bool:
+        if self._pending >= self._max_pending:
+            self.rejected += 1
+            return False
+        self._queues.setdefault(key, deque()).append((time.monotonic(), factory))
+        self._pending += 1
+        if key not in self._runners:
+            self._runners[key] = asyncio.create_task(self._drain(key))
+        return True
+
+    async def _drain(self, key: str) -> None:
+        queue = self._queues[key]
+        try:
+            while queue:
+                enqueued_at, factory = queue[0]
+                async with self._semaphore:
+                    started = time.monotonic()
+                    self._queue_wait.append(started - enqueued_at)
+                    self._running += 1
+                    try:
+                        await factory()
+                    except TurnFailed:
+                        self.failed += 1
+                    except Exception:
+                        self.failed += 1
+                        log.exception("Background turn failed for convo=%s", key)
+                    else:
+                        self.completed += 1
+                    finally:
+                        self._running -= 1
+                        self._turn_latency.append(time.monotonic() - started)
+                queue.popleft()
+                self._pending -= 1
+        finally:
+            self._runners.pop(key, None)
+            if queue:
+                # Cancelled mid-queue: keep the count honest for whatever is left.
+                self._pending -= len(queue)
+            self._queues.pop(key, None)
+
+    async def drain(self, timeout: float) -> None:
+        """Wait up to ``timeout`` seconds for queued turns, then cancel the rest."""
+        runners = list(self._runners.values())
+        if not runners:
+            return
+        _, pending = await asyncio.wait(runners, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            log.warning("Cancelled %s conversations with unfinished turns on shutdown", len(pending))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._pending,
+            "running": self._running,
+            "conversations": len(self._runners),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "turn_latency": _latency_summary(self._turn_latency),
+            "queue_wait": _latency_summary(self._queue_wait),
+        }
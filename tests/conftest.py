@@ -0,0 +1,4 @@
+import os
+
+os.environ.setdefault("MICROSOFT_APP_ID", "test-app-id")
+os.environ.setdefault("MICROSOFT_APP_PASSWORD", "test-app-password")
@@ -0,0 +1,345 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+from botbuilder.schema import ChannelAccount, ConversationAccount, ConversationReference, ResourceResponse
+from botframework.connector import models as connector_models
+from botframework.connector.auth import ClaimsIdentity
+
+from src.teams_gw import app as app_module
+from src.teams_gw.conversation_store import ConversationStore
+from src.teams_gw.dedup import TimedDedupCache
+from src.teams_gw.delivery import DeliveryQueue
+from src.teams_gw.turns import TurnExecutor
+
+
+def _activity(activity_id="act-1", conversation_id="conv-1"):
+    return {
+        "type": "message",
+        "id": activity_id,
+        "text": "hola",
+        "serviceUrl": "https://smba.trafficmanager.net/amer/",
+        "channelId": "msteams",
+        "conversation": {"id": conversation_id},
+        "from": {"id": "user-1"},
+        "recipient": {"id": "bot-id"},
+    }
+
+
+def _reference(conversation_id):
+    return ConversationReference(
+        service_url="https://example.org",
+        channel_id="msteams",
+        conversation=ConversationAccount(id=conversation_id),
+        user=ChannelAccount(id=f"user-{conversation_id}"),
+        bot=ChannelAccount(id="bot-id"),
+    )
+
+
+def _client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://testserver")
+
+
+def _inbound(monkeypatch, *, authenticated=True, turn=None):
+    """Stub token validation and the bot turn; returns the processed activity ids."""
+    processed = []
+
+    async def authenticate(activity, auth_header):
+        if not authenticated:
+            raise PermissionError("Unauthorized Access. Request is not authorized")
+        return ClaimsIdentity({}, True)
+
+    async def process(activity, identity, logic):
+        processed.append(activity.id)
+        if turn:
+            await turn()
+
+    monkeypatch.setattr(app_module.adapter, "authenticate", authenticate)
+    monkeypatch.setattr(app_module.adapter, "process_activity_with_identity", process)
+    monkeypatch.setattr(app_module, "inbound_dedup", TimedDedupCache(ttl=60))
+    monkeypatch.setattr(app_module, "turn_executor", None)
+    return processed
+
+
+def test_invalid_token_is_401_inline_and_with_fast_ack(monkeypatch):
+    async def _run():
+        processed = _inbound(monkeypatch, authenticated=False)
+        async with _client() as client:
+            inline = await client.post("/api/messages", json=_activity())
+            monkeypatch.setattr(app_module, "turn_executor", TurnExecutor())
+            fast_ack = await client.post("/api/messages", json=_activity())
+        assert (inline.status_code, fast_ack.status_code) == (401, 401)
+        assert inline.json() == fast_ack.json() == {"ok": False, "error": "unauthorized"}
+        assert processed == []
+
+    asyncio.run(_run())
+
+
+def test_failed_background_turns_are_counted(monkeypatch):
+    async def _run():
+        async def failing_connector():
+            raise RuntimeError("connector down")
+
+        _inbound(monkeypatch, turn=failing_connector)
+        executor = TurnExecutor()
+        monkeypatch.setattr(app_module, "turn_executor", executor)
+        async with _client() as client:
+            for n in range(2):
+                response = await client.post("/api/messages", json=_activity(f"act-{n}"))
+                assert response.json() == {"ok": True, "queued": True}
+            await executor.drain(5)
+            stats = (await client.get("/api/messages/stats")).json()["turns"]
+        assert (stats["completed"], stats["failed"]) == (0, 2)
+
+    asyncio.run(_run())
+
+
+def test_conversation_export_and_import_stream_ndjson(monkeypatch):
+    async def _run():
+        source = ConversationStore()
+        for n in range(5):
+            await source.remember(_reference(f"conv-{n}"))
+        target = ConversationStore()
+        monkeypatch.setattr(app_module, "IMPORT_BATCH_SIZE", 2)
+        async with _client() as client:
+            monkeypatch.setattr(app_module, "conversation_store", source)
+            exported = (await client.get("/api/conversations/export")).content
+            monkeypatch.setattr(app_module, "conversation_store", target)
+            imported = await client.post("/api/conversations/import", content=exported)
+            broken = await client.post("/api/conversations/import", content=exported + b"{oops\n")
+
+        assert len(exported.splitlines()) == 5
+        assert imported.json() == {"ok": True, "received": 5, "imported": 5}
+        assert {item["conversation_id"] for item in await target.summaries()} == {f"conv-{n}" for n in range(5)}
+        assert broken.status_code == 400
+        assert broken.json()["detail"].startswith("invalid_ndjson: line 6")
+
+    asyncio.run(_run())
+
+
+def _proactive_setup(monkeypatch, tmp_path):
+    store = ConversationStore()
+    queue = DeliveryQueue(str(tmp_path / "queue.db"), app_module._send_queued_delivery, poll_interval=0.01)
+    monkeypatch.setattr(app_module, "conversation_store", store)
+    monkeypatch.setattr(app_module, "delivery_queue", queue)
+    monkeypatch.setattr(app_module, "alert_coalescer", None)
+    monkeypatch.setattr(app_module, "proactive_dedup", TimedDedupCache(ttl=60))
+    monkeypatch.setattr(app_module.settings, "PROACTIVE_API_KEY", None)
+    return store, queue
+
+
+def test_queued_proactive_send_returns_202_and_can_be_polled(monkeypatch, tmp_path):
+    async def _run():
+        store, queue = _proactive_setup(monkeypatch, tmp_path)
+        await store.remember(_reference("conv-1"))
+
+        async def deliver(reference, message, custom_payload, *, update=False):
+            return ["act-9"]
+
+        monkeypatch.setattr(app_module, "_deliver_proactive", deliver)
+        async with _client() as client:
+            accepted = await client.post("/api/proactive", json={"conversation_id": "conv-1", "message": "hola"})
+            assert accepted.status_code == 202
+            delivery_id = accepted.json()["delivery_id"]
+            assert accepted.headers["Location"] == f"/api/proactive/{delivery_id}"
+            assert (await client.get(accepted.headers["Location"])).json()["status"] == "queued"
+
+            await queue.start()
+            await queue.stop(drain_timeout=1)
+            status = (await client.get(accepted.headers["Location"])).json()
+            assert (status["status"], status["conversation_id"], status["activity_id"]) == ("sent", "conv-1", "act-9")
+
+            missing = await client.get("/api/proactive/does-not-exist")
+            assert (missing.status_code, missing.json()["detail"]) == (404, "delivery_not_found")
+
+    asyncio.run(_run())
+
+
+def test_idempotency_key_replays_the_first_response(monkeypatch, tmp_path):
+    async def _run():
+        store, queue = _proactive_setup(monkeypatch, tmp_path)
+        await store.remember(_reference("conv-1"))
+        request = {"conversation_id": "conv-1", "message": "hola"}
+        async with _client() as client:
+            first = await client.post("/api/proactive", json=request, headers={"Idempotency-Key": "k-1"})
+            retry = await client.post("/api/proactive", json=request, headers={"Idempotency-Key": "k-1"})
+            other = await client.post("/api/proactive", json=request, headers={"Idempotency-Key": "k-2"})
+
+        assert (first.status_code, retry.status_code) == (202, 202)
+        assert retry.json()["delivery_id"] == first.json()["delivery_id"]
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+        assert other.json()["delivery_id"] != first.json()["delivery_id"]
+        assert (await queue.stats()) == {"queued": 2}
+
+    asyncio.run(_run())
+
+
+def test_broadcast_is_queued_and_a_retry_with_the_same_key_is_replayed(monkeypatch, tmp_path):
+    async def _run():
+        store, queue = _proactive_setup(monkeypatch, tmp_path)
+        for n in range(3):
+            reference = _reference(f"conv-{n}")
+            reference.user.aad_object_id = f"aad-{n}"
+            await store.remember(reference)
+        await store.set_role_members("gerente", ["aad-0", "aad-1", "aad-2"])
+        request = {"roles": ["gerente"], "message": "hola"}
+        async with _client() as client:
+            first = (await client.post("/api/proactive/broadcast", json=request, headers={"Idempotency-Key": "b-1"})).json()
+            retry = (await client.post("/api/proactive/broadcast", json=request, headers={"Idempotency-Key": "b-1"})).json()
+
+        assert first["sent"] == 3 and all(item["queued"] for item in first["results"])
+        assert all(item["replayed"] for item in retry["results"])
+        assert {item["delivery_id"] for item in retry["results"]} == {item["delivery_id"] for item in first["results"]}
+        assert (await queue.stats()) == {"queued": 3}
+
+    asyncio.run(_run())
+
+
+def test_batch_retry_only_resends_the_targets_that_failed(monkeypatch, tmp_path):
+    async def _run():
+        store, _queue = _proactive_setup(monkeypatch, tmp_path)
+        monkeypatch.setattr(app_module, "delivery_queue", None)
+        for n in range(2):
+            await store.remember(_reference(f"conv-{n}"))
+        sent = []
+        down = {"conv-1"}
+
+        async def deliver(reference, message, custom_payload, *, update=False):
+            if reference.conversation.id in down:
+                raise RuntimeError("connector down")
+            sent.append(reference.conversation.id)
+            return [f"act-{len(sent)}"]
+
+        monkeypatch.setattr(app_module, "_deliver_proactive", deliver)
+        batch = {"items": [{"conversation_id": f"conv-{n}", "message": "hola"} for n in range(2)]}
+        async with _client() as client:
+            first = (await client.post("/api/proactive/batch", json=batch, headers={"Idempotency-Key": "k-9"})).json()
+            down.clear()
+            retry = (await client.post("/api/proactive/batch", json=batch, headers={"Idempotency-Key": "k-9"})).json()
+
+        assert (first["sent"], first["failed"], retry["sent"]) == (1, 1, 2)
+        assert sent == ["conv-0", "conv-1"]
+        assert [item.get("replayed", False) for item in retry["results"]] == [True, False]
+
+    asyncio.run(_run())
+
+
+def test_bot_connector_retry_is_suppressed_and_counted(monkeypatch):
+    async def _run():
+        processed = _inbound(monkeypatch)
+        async with _client() as client:
+            first = await client.post("/api/messages", json=_activity("act-1"))
+            retry = await client.post("/api/messages", json=_activity("act-1"))
+            other = await client.post("/api/messages", json=_activity("act-2"))
+            stats = (await client.get("/api/messages/stats")).json()
+
+        assert first.json() == other.json() == {"ok": True}
+        assert retry.json() == {"ok": True, "duplicate": True}
+        assert processed == ["act-1", "act-2"]
+        assert stats["suppressed_retries"] == 1
+
+    asyncio.run(_run())
+
+
+def test_retry_after_a_failed_turn_is_processed(monkeypatch):
+    async def _run():
+        failures = [RuntimeError("connector down")]
+
+        async def turn():
+            if failures:
+                raise failures.pop()
+
+        processed = _inbound(monkeypatch, turn=turn)
+        async with _client() as client:
+            first = await client.post("/api/messages", json=_activity("act-1"))
+            retry = await client.post("/api/messages", json=_activity("act-1"))
+
+        assert (first.status_code, retry.status_code) == (500, 200)
+        assert processed == ["act-1", "act-1"]
+        assert app_module.inbound_dedup.hits == 0
+
+    asyncio.run(_run())
+
+
+class _FakeConnector:
+    """Stands in for continue_conversation: records sends and updates, numbering new activities."""
+
+    def __init__(self, update_error=None):
+        self.sent = []
+        self.updated = []
+        self.update_error = update_error
+
+    async def continue_conversation(self, reference, callback, bot_id=None):
+        await callback(self)
+
+    async def send_activities(self, activities):
+        self.sent.extend(activities)
+        return [ResourceResponse(id=f"act-{len(self.sent) - len(activities) + n + 1}") for n in range(len(activities))]
+
+    async def update_activity(self, activity):
+        if self.update_error:
+            raise self.update_error
+        self.updated.append(activity)
+
+
+def _not_found():
+    def raise_for_status():
+        raise RuntimeError("404 Not Found")
+
+    response = SimpleNamespace(
+        status_code=404, reason="Not Found", text=lambda: "gone", headers={}, request=None, raise_for_status=raise_for_status
+    )
+    return connector_models.ErrorResponseException(lambda *args, **kwargs: None, response)
+
+
+_ALERT = {"type": "alerta", "ticket_id": 147, "nivel": "Nivel 1", "subject": "VPN caída"}
+
+
+def test_escalated_card_is_updated_in_place(monkeypatch):
+    async def _run():
+        connector = _FakeConnector()
+        monkeypatch.setattr(app_module.adapter, "continue_conversation", connector.continue_conversation)
+        monkeypatch.setattr(app_module, "card_activity_index", TimedDedupCache(ttl=60))
+        reference = _reference("conv-1")
+
+        assert await app_module._deliver_proactive(reference, None, _ALERT) == ["act-1"]
+        escalated = await app_module._deliver_proactive(reference, None, {**_ALERT, "nivel": "Nivel 2"}, update=True)
+
+        assert escalated == ["act-1"]
+        assert len(connector.sent) == 1
+        assert [activity.id for activity in connector.updated] == ["act-1"]
+
+    asyncio.run(_run())
+
+
+def test_update_of_a_deleted_card_posts_a_new_one(monkeypatch):
+    async def _run():
+        connector = _FakeConnector(update_error=_not_found())
+        monkeypatch.setattr(app_module.adapter, "continue_conversation", connector.continue_conversation)
+        monkeypatch.setattr(app_module, "card_activity_index", TimedDedupCache(ttl=60))
+        reference = _reference("conv-1")
+
+        await app_module._deliver_proactive(reference, None, _ALERT)
+        escalated = await app_module._deliver_proactive(reference, None, {**_ALERT, "nivel": "Nivel 2"}, update=True)
+
+        assert escalated == ["act-2"]
+        assert [activity.id for activity in connector.sent] == [None, None]
+        assert app_module.card_activity_index.get("conv-1|147") == "act-2"
+
+    asyncio.run(_run())
+
+
+def test_stats_endpoint_reports_gateway_components(monkeypatch):
+    async def _run():
+        _inbound(monkeypatch)
+        async with _client() as client:
+            stats = (await client.get("/api/messages/stats")).json()
+
+        assert stats["controller_snapshot"]["tickets"] == 0
+        assert stats["connector_clients"]["size"] >= 0
+        assert isinstance(stats["tokens"], list)
+        for key in ("rate_limit", "coalescer", "connector_pool", "openid_metadata", "auth_cache"):
+            assert key in stats
+
+    asyncio.run(_run())
@@ -0,0 +1,117 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.teams_gw import bot as bot_module
+from src.teams_gw.bot import CommandRouter, TeamsGatewayBot, _compile_reply
+
+
+class FakeTurnContext:
+    def __init__(self, text):
+        self.activity = SimpleNamespace(text=text)
+        self.sent = []
+
+    async def send_activity(self, activity):
+        self.sent.append(activity)
+
+    async def send_activities(self, activities):
+        self.sent.extend(activities)
+
+
+def _send(bot, text, monkeypatch):
+    async def remember(activity):
+        return None
+
+    monkeypatch.setattr(bot_module.conversation_store, "remember", remember)
+    turn_context = FakeTurnContext(text)
+    asyncio.run(bot.on_message_activity(turn_context))
+    return turn_context.sent
+
+
+def test_router_dispatches_on_first_word_with_aliases_and_args():
+    router = CommandRouter()
+    seen = []
+
+    @router.command("riesgo", "risk")
+    async def riesgo(turn_context, args):
+        seen.append(args)
+
+    handler, args = router.resolve("  RISK   Mesa de ayuda ")
+    assert handler is riesgo and args == "Mesa de ayuda"
+    assert router.resolve("riesgoso") is None
+    with pytest.raises(ValueError):
+        router.register("risk", riesgo)
+
+
+def test_router_matches_phrase_commands_on_whole_words():
+    router = CommandRouter()
+
+    @router.command("mis tickets")
+    async def mis_tickets(turn_context, args):
+        pass
+
+    assert router.resolve("Mis  Tickets abiertos") == (mis_tickets, "abiertos")
+    assert router.resolve("mis tickets") == (mis_tickets, "")
+    assert "MIS tickets" in router
+    for text in ("mis", "mismo problema con la VPN", "mis problemas de red", "mis ticketsss"):
+        assert router.resolve(text) is None
+
+
+def test_words_starting_with_mis_get_the_default_reply(monkeypatch):
+    monkeypatch.setattr(bot_module.settings, "BOT_DEFAULT_REPLY", "Eco: {user_input}")
+    bot = TeamsGatewayBot(conversation_state=None)
+    assert _send(bot, "mismo problema con la VPN", monkeypatch) == ["Eco: mismo problema con la VPN"]
+    assert _send(bot, "mis problemas de red", monkeypatch) == ["Eco: mis problemas de red"]
+
+
+def test_demo_card_attachment_is_built_once(monkeypatch):
+    bot = TeamsGatewayBot(conversation_state=None)
+    first = _send(bot, "Tabla", monkeypatch)
+    second = _send(bot, "tablas por favor", monkeypatch)
+    assert first[0].text == "Demo: Tabla"
+    assert first[0].attachments[0] is second[0].attachments[0]
+
+
+def test_ticket_without_a_number_keeps_the_demo_card(monkeypatch):
+    async def ensure():
+        raise AssertionError("the snapshot is only read for numeric ticket ids")
+
+    monkeypatch.setattr(bot_module.controller_snapshot, "ensure", ensure)
+    bot = TeamsGatewayBot(conversation_state=None)
+    for text in ("tickets abiertos", "tickets de redes", "ticket"):
+        assert _send(bot, text, monkeypatch)[0].text == "Demo: Ticket"
+
+
+def test_default_reply_is_precomputed_unless_it_echoes_input(monkeypatch):
+    assert _compile_reply("Hola, soy {bot_name}.", "Bot")("x") == "Hola, soy Bot."
+    assert _compile_reply("Dijiste: {user_input}", "Bot")("hola") == "Dijiste: hola"
+    assert _compile_reply("Hola {desconocido}", "Bot")("x") == "Hola {desconocido}"
+
+    monkeypatch.setattr(bot_module.settings, "BOT_DEFAULT_REPLY", "Eco: {user_input}")
+    assert _send(TeamsGatewayBot(conversation_state=None), "algo", monkeypatch) == ["Eco: algo"]
+
+
+def test_ticket_and_my_tickets_commands_answer_from_snapshot(monkeypatch):
+    from src.teams_gw.controller_cache import ControllerSnapshot
+
+    async def fetch():
+        operations = {
+            "groups": [
+                {"group": "Redes", "tickets": [{"ticket_id": 147, "technician_name": "Ana Ruiz", "risk_band": "rojo"}]}
+            ]
+        }
+        return operations, {"items": []}
+
+    monkeypatch.setattr(bot_module, "controller_snapshot", ControllerSnapshot(fetch))
+    bot = TeamsGatewayBot(conversation_state=None)
+
+    sent = _send(bot, "ticket #147", monkeypatch)
+    assert sent[0].text == "Ticket #147"
+    assert sent[0].attachments[0].content["body"][0]["items"][0]["text"] == "Ticket #147"
+    assert _send(bot, "ticket 999", monkeypatch)[0].startswith("No encontré el ticket #999")
+
+    turn_context = FakeTurnContext("mis tickets")
+    turn_context.activity.from_property = SimpleNamespace(name="ana ruiz", aad_object_id=None)
+    asyncio.run(bot.on_message_activity(turn_context))
+    assert turn_context.sent[0].text == "Mis tickets"
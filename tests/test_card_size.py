@@ -0,0 +1,44 @@
+import copy
+import json
+
+from src.teams_gw.card_size import card_size, compact_card, fit_card
+from src.teams_gw.cards import build_alert_card, build_alert_digest_card
+
+
+def _digest(count):
+    alerts = [
+        {"ticket_id": 1000 + n, "subject": f"Incidente de red en sede {n}", "technician": "Juan Pérez", "umbral": "1.0 días"}
+        for n in range(count)
+    ]
+    return build_alert_digest_card({"nivel": "Nivel 2", "alertas": alerts, "url": "https://mi-tablero"})
+
+
+def test_compact_drops_defaults_and_implied_types_without_mutating_input():
+    card = build_alert_card({"nivel": "Nivel 1", "titulo": "Alerta", "ticket_id": 147})
+    original = copy.deepcopy(card)
+    compact = compact_card(card)
+
+    assert card == original
+    assert card_size(compact) < card_size(card)
+    table = next(element for element in compact["body"] if element.get("type") == "Table")
+    assert "type" not in table["rows"][0] and "type" not in table["rows"][0]["cells"][0]
+    assert table["rows"][0]["cells"][1]["items"][0] == {"type": "TextBlock", "text": "147", "wrap": True}
+    assert compact_card(card, implied_types=False)["body"][2]["rows"][0]["type"] == "TableRow"
+
+
+def test_small_card_is_delivered_as_one_page():
+    assert len(fit_card(_digest(5))) == 1
+
+
+def test_large_table_is_split_into_pages_within_budget():
+    card = _digest(600)
+    assert card_size(card) > 26_000
+
+    pages = fit_card(card, 26_000)
+    assert len(pages) > 1
+    assert all(card_size(page) <= 26_000 for page in pages)
+    tables = [next(element for element in page["body"] if element.get("type") == "Table") for page in pages]
+    assert all(json.dumps(table["rows"][0]).count("Ticket") == 1 for table in tables)
+    assert sum(len(table["rows"]) - 1 for table in tables) == 600
+    assert pages[-1]["body"][-2]["text"] == f"Página {len(pages)} de {len(pages)}"
+    assert pages[0]["body"][-1]["type"] == "ActionSet"
@@ -0,0 +1,38 @@
+from src.teams_gw.cards import ALERT_LEVEL_CONFIG, alert_priority, build_alert_card, demo_table_card
+
+
+def test_alert_priority_follows_level_config():
+    assert alert_priority({"nivel": "Nivel 4"}) > alert_priority({"nivel": "Nivel 1"}) > alert_priority(None)
+    assert alert_priority({"nivel": "Desconocido"}) == 0
+
+
+def test_alert_template_fills_slots_per_render():
+    first = build_alert_card({"nivel": "Nivel 4", "titulo": "Crítico", "ticket_id": {"value": 147}})
+    second = build_alert_card({"nivel": "Nivel 4", "cuerpo": "otro"})
+
+    header = first["body"][0]
+    assert header["style"] == ALERT_LEVEL_CONFIG["Nivel 4"]["style"]
+    assert header["columns"][1]["items"][0]["text"] == "Crítico"
+    assert second["body"][0]["columns"][1]["items"][0]["text"] == "Alerta temprana"
+    assert second["body"][1]["text"] == "otro"
+
+    rows = first["body"][2]["rows"]
+    assert [row["cells"][0]["items"][0]["text"] for row in rows][:2] == ["Ticket", "Asunto"]
+    assert rows[0]["cells"][1]["items"][0]["text"] == "147"
+    assert rows[-1]["cells"][1]["items"][0]["text"] == "Nivel 4"
+    assert first["body"][3]["actions"][0]["url"] == "https://example.org"
+
+
+def test_mutating_a_built_card_does_not_affect_the_next():
+    first = build_alert_card({"nivel": "Nivel 2"})
+    first["body"][0]["columns"][0]["items"][0]["url"] = "https://changed"
+    first["body"][2]["rows"][0]["cells"][0]["items"][0]["text"] = "changed"
+    first["body"][2]["columns"].append({"width": 1})
+    second = build_alert_card({"nivel": "Nivel 2"})
+    assert second["body"][0]["columns"][0]["items"][0]["url"] == ALERT_LEVEL_CONFIG["Nivel 2"]["icon"]
+    assert second["body"][2]["rows"][0]["cells"][0]["items"][0]["text"] == "Ticket"
+    assert len(second["body"][2]["columns"]) == 2
+
+    demo = demo_table_card()
+    demo["body"].clear()
+    assert demo_table_card()["body"]
@@ -0,0 +1,107 @@
+import asyncio
+
+from src.teams_gw.cards import build_alert_digest_card
+from src.teams_gw.coalesce import AlertCoalescer
+
+
+def test_alerts_within_window_are_flushed_once():
+    async def _run():
+        flushed = []
+
+        async def flush(reference, level, items):
+            flushed.append((reference, level, [item["ticket_id"] for item in items]))
+
+        coalescer = AlertCoalescer(flush, window=0.05, max_items=3)
+        await coalescer.add("conv-1", "Nivel 1", "ref-1", {"ticket_id": 1})
+        await coalescer.add("conv-1", "Nivel 1", "ref-1", {"ticket_id": 2})
+        await coalescer.add("conv-1", "Nivel 2", "ref-1", {"ticket_id": 3})
+        assert flushed == []
+
+        await asyncio.sleep(0.1)
+        assert sorted(flushed) == [("ref-1", "Nivel 1", [1, 2]), ("ref-1", "Nivel 2", [3])]
+
+    asyncio.run(_run())
+
+
+def test_size_cap_flushes_immediately():
+    async def _run():
+        flushed = []
+
+        async def flush(reference, level, items):
+            flushed.append(len(items))
+
+        coalescer = AlertCoalescer(flush, window=60, max_items=2)
+        await coalescer.add("conv-1", "Nivel 4", "ref", {"ticket_id": 1})
+        assert await coalescer.add("conv-1", "Nivel 4", "ref", {"ticket_id": 2}) == 2
+        assert coalescer.stats()["pending_digests"] == 0
+        await asyncio.sleep(0)
+        assert flushed == [2]
+
+    asyncio.run(_run())
+
+
+def test_size_cap_does_not_wait_for_the_flush():
+    async def _run():
+        release = asyncio.Event()
+        flushed = []
+
+        async def flush(reference, level, items):
+            await release.wait()
+            flushed.append(len(items))
+
+        coalescer = AlertCoalescer(flush, window=60, max_items=2)
+        await coalescer.add("conv-1", "Nivel 4", "ref", {"ticket_id": 1})
+        await asyncio.wait_for(coalescer.add("conv-1", "Nivel 4", "ref", {"ticket_id": 2}), 0.5)
+        assert await coalescer.add("conv-1", "Nivel 4", "ref", {"ticket_id": 3}) == 1
+        assert flushed == []
+
+        release.set()
+        await coalescer.flush_all()
+        assert sorted(flushed) == [1, 2]
+
+    asyncio.run(_run())
+
+
+def test_digest_card_has_one_row_per_alert():
+    card = build_alert_digest_card(
+        {
+            "nivel": "Nivel 2",
+            "alertas": [
+                {"ticket_id": 147, "subject": "Reporte", "technician": {"name": "Juan"}, "url": "https://t"},
+                {"ticket_id": 128},
+            ],
+        }
+    )
+    table = next(item for item in card["body"] if item["type"] == "Table")
+    assert len(table["rows"]) == 3
+    assert table["rows"][1]["cells"][2]["items"][0]["text"] == "Juan"
+    assert card["body"][-1]["actions"][0]["url"] == "https://t"
+
+
+def test_failed_flush_requeues_alerts_until_retries_run_out():
+    async def _run():
+        calls = []
+
+        async def flaky_flush(reference, level, items):
+            calls.append([item["ticket_id"] for item in items])
+            if len(calls) < 3:
+                raise RuntimeError("connector down")
+
+        coalescer = AlertCoalescer(flaky_flush, window=0.01, max_retries=3)
+        await coalescer.add("conv-1", "Nivel 1", "ref", {"ticket_id": 1})
+        await asyncio.sleep(0.02)
+        await coalescer.add("conv-1", "Nivel 1", "ref", {"ticket_id": 2})
+        await asyncio.sleep(0.1)
+        assert calls == [[1], [1, 2], [1, 2]]
+        assert (coalescer.flushed, coalescer.retried, coalescer.dropped) == (1, 2, 0)
+
+        async def broken_flush(reference, level, items):
+            raise RuntimeError("connector down")
+
+        giving_up = AlertCoalescer(broken_flush, window=0.01, max_retries=1)
+        await giving_up.add("conv-1", "Nivel 1", "ref", {"ticket_id": 3})
+        await asyncio.sleep(0.1)
+        assert (giving_up.retried, giving_up.dropped) == (1, 1)
+        assert giving_up.stats()["pending_alerts"] == 0
+
+    asyncio.run(_run())
@@ -0,0 +1,64 @@
+import asyncio
+
+from aiohttp import web
+from botbuilder.schema import Activity
+from botframework.connector.auth import MicrosoftAppCredentials
+
+from src.teams_gw.connector_pool import ConnectorClientCache, ConnectorSessionPool, build_pooled_connector_client
+
+
+class StaticCredentials(MicrosoftAppCredentials):
+    def get_access_token(self, force_refresh: bool = False) -> str:
+        return "token-123"
+
+    async def get_access_token_async(self) -> str:
+        # Overrides the gateway's MSAL patch, which applies once teams_gw.app is imported.
+        return self.get_access_token()
+
+
+def test_pooled_client_sends_with_bearer_token_over_shared_session():
+    async def _run():
+        seen = []
+
+        async def send_activity(request):
+            seen.append((request.match_info["conversation_id"], request.headers.get("Authorization"), await request.json()))
+            return web.json_response({"id": f"act-{len(seen)}"})
+
+        stub = web.Application()
+        stub.router.add_post("/v3/conversations/{conversation_id}/activities", send_activity)
+        runner = web.AppRunner(stub)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        service_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+
+        pool = ConnectorSessionPool()
+        try:
+            credentials = StaticCredentials("app-id", "secret")
+            first = build_pooled_connector_client(credentials, service_url, pool)
+            second = build_pooled_connector_client(credentials, service_url, pool)
+            r1 = await first.conversations.send_to_conversation("c1", Activity(type="message", text="hola"))
+            session = pool.session
+            r2 = await second.conversations.send_to_conversation("c2", Activity(type="message", text="chau"))
+            assert pool.session is session
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+        assert (r1.id, r2.id) == ("act-1", "act-2")
+        assert [item[:2] for item in seen] == [("c1", "Bearer token-123"), ("c2", "Bearer token-123")]
+        assert seen[0][2]["text"] == "hola"
+        assert pool.requests == 2
+
+    asyncio.run(_run())
+
+
+def test_client_cache_evicts_least_recently_used():
+    cache = ConnectorClientCache(max_items=2)
+    cache.put("a", "client-a")
+    cache.put("b", "client-b")
+    assert cache.get("a") == "client-a"
+    cache.put("c", "client-c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "client-a"
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 1}
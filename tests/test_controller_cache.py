@@ -0,0 +1,75 @@
+import asyncio
+
+from src.teams_gw.controller_cache import ControllerSnapshot
+
+OPERATIONS = {
+    "groups": [
+        {
+            "group": "Mesa de Ayuda",
+            "tickets": [
+                {"ticket_id": 147, "technician_name": "José Pérez", "risk_band": "rojo", "ratio": 1.3},
+                {"ticket_id": 150, "technician_name": "Ana Ruiz", "risk_band": "verde", "ratio": 0.2},
+            ],
+        },
+        {
+            "group": "Redes",
+            "tickets": [{"ticket_id": 151, "technician_name": "José Pérez", "risk_band": "naranja", "ratio": 0.9}],
+        },
+    ]
+}
+RISK = {"items": [{"ticket_id": 147, "subject": "VPN caída", "group": "Mesa de Ayuda", "pause_days": 0}]}
+
+
+def _snapshot(responses):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    return ControllerSnapshot(fetch), calls
+
+
+def test_cold_cache_fetches_once_and_indexes_tickets():
+    async def _run():
+        snapshot, calls = _snapshot([(OPERATIONS, RISK)])
+        assert all(await asyncio.gather(*(snapshot.ensure() for _ in range(5))))
+        assert len(calls) == 1
+
+        ticket = snapshot.ticket("#147")
+        assert (ticket["subject"], ticket["technician_name"], ticket["group"]) == ("VPN caída", "José Pérez", "Mesa de Ayuda")
+        assert [item["ticket_id"] for item in snapshot.technician_tickets("jose  PEREZ")] == [147, 151]
+        group, tickets = snapshot.group_tickets("mesa")
+        assert group == "Mesa de Ayuda" and [item["ticket_id"] for item in tickets] == [147, 150]
+        assert snapshot.group_tickets("zzz") is None
+
+    asyncio.run(_run())
+
+
+def test_failed_refresh_keeps_serving_last_snapshot():
+    async def _run():
+        snapshot, calls = _snapshot([(OPERATIONS, RISK), RuntimeError("controller down")])
+        await snapshot.ensure()
+        snapshot.last_updated -= 3600
+        assert await snapshot.refresh_due() == 15.0
+        assert snapshot.ticket(151) is not None
+        assert snapshot.stats()["failures"] == 1
+
+    asyncio.run(_run())
+
+
+def test_cold_fetch_failure_backs_off():
+    async def _run():
+        snapshot, calls = _snapshot([RuntimeError("controller down"), (OPERATIONS, RISK)])
+        assert await snapshot.ensure() is False
+        assert await snapshot.ensure() is False
+        assert len(calls) == 1
+
+        await snapshot.refresh()
+        assert await snapshot.ensure() is True
+
+    asyncio.run(_run())
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from src.teams_gw.dedup import TimedDedupCache
+
+
+def test_run_once_replays_result_and_coalesces_inflight_calls():
+    async def _run():
+        cache = TimedDedupCache(ttl=60)
+        calls = []
+
+        async def send():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"ok": True}
+
+        first, second = await asyncio.gather(cache.run_once("k", send), cache.run_once("k", send))
+        assert first == ({"ok": True}, False)
+        assert second == ({"ok": True}, True)
+        assert await cache.run_once("k", send) == ({"ok": True}, True)
+        assert len(calls) == 1
+        assert cache.hits == 2
+
+    asyncio.run(_run())
+
+
+def test_failures_are_not_cached():
+    async def _run():
+        cache = TimedDedupCache(ttl=60)
+
+        async def boom():
+            raise RuntimeError("connector down")
+
+        with pytest.raises(RuntimeError):
+            await cache.run_once("k", boom)
+
+        async def ok():
+            return "sent"
+
+        assert await cache.run_once("k", ok) == ("sent", False)
+
+    asyncio.run(_run())
+
+
+def test_cache_is_bounded_and_expires():
+    cache = TimedDedupCache(ttl=60, max_items=2)
+    assert cache.add("a") and cache.add("b") and cache.add("c")
+    assert "a" not in cache and "c" in cache
+    assert cache.add("c") is False
+
+    expiring = TimedDedupCache(ttl=0)
+    expiring.put("x", 1)
+    assert expiring.get("x") is None
+
+
+def test_discard_forgets_live_entries_only():
+    cache = TimedDedupCache(ttl=60)
+    cache.put("conv|147", "activity-1")
+    assert cache.discard("conv|147") is True
+    assert cache.get("conv|147") is None
+    assert cache.discard("conv|147") is False
@@ -0,0 +1,151 @@
+import asyncio
+
+from src.teams_gw.delivery import DeliveryQueue, PermanentDeliveryError
+
+
+def test_queue_delivers_retries_and_dead_letters(tmp_path):
+    async def _run():
+        attempts = {"flaky": 0}
+
+        async def sender(request):
+            if request["kind"] == "flaky":
+                attempts["flaky"] += 1
+                if attempts["flaky"] < 3:
+                    raise RuntimeError("throttled")
+            if request["kind"] == "broken":
+                raise RuntimeError("always down")
+            if request["kind"] == "gone":
+                raise PermanentDeliveryError("404")
+            return {"kind": request["kind"]}
+
+        queue = DeliveryQueue(
+            str(tmp_path / "queue.db"), sender, workers=2, max_attempts=3, base_delay=0.01, poll_interval=0.01
+        )
+        ids = {kind: await queue.enqueue({"kind": kind}) for kind in ("ok", "flaky", "broken", "gone")}
+        await queue.start()
+        for _ in range(200):
+            stats = await queue.stats()
+            if set(stats) <= {"sent", "failed"}:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop(drain_timeout=1)
+
+        ok = await queue.get(ids["ok"])
+        assert ok["status"] == "sent" and ok["result"] == {"kind": "ok"}
+        flaky = await queue.get(ids["flaky"])
+        assert flaky["status"] == "sent" and flaky["attempts"] == 3
+        broken = await queue.get(ids["broken"])
+        assert broken["status"] == "failed" and broken["attempts"] == 3
+        gone = await queue.get(ids["gone"])
+        assert gone["status"] == "failed" and gone["attempts"] == 1
+
+    asyncio.run(_run())
+
+
+def test_queue_keeps_pending_items_across_restarts(tmp_path):
+    async def _run():
+        path = str(tmp_path / "queue.db")
+        delivered = []
+
+        async def sender(request):
+            delivered.append(request["n"])
+            return None
+
+        first = DeliveryQueue(path, sender)
+        delivery_id = await first.enqueue({"n": 1})
+        first.close()
+
+        second = DeliveryQueue(path, sender, poll_interval=0.01)
+        await second.start()
+        await second.stop(drain_timeout=1)
+        assert delivered == [1]
+        assert (await second.get(delivery_id))["status"] == "sent"
+
+    asyncio.run(_run())
+
+
+def test_higher_priority_lanes_are_claimed_first(tmp_path):
+    async def _run():
+        order = []
+
+        async def sender(request):
+            order.append(request["n"])
+            return None
+
+        queue = DeliveryQueue(str(tmp_path / "queue.db"), sender, workers=1, poll_interval=0.01)
+        for n, priority in ((1, 1), (2, 1), (3, 4), (4, 2)):
+            await queue.enqueue({"n": n}, priority=priority)
+        await queue.start()
+        await queue.stop(drain_timeout=1)
+
+        assert order == [3, 4, 1, 2]
+        lanes = await queue.lane_stats()
+        assert lanes[4]["depth"] == 0 and lanes[4]["latency"]["count"] == 1
+
+    asyncio.run(_run())
+
+
+def test_aging_protects_low_lanes_from_starvation(tmp_path):
+    async def _run():
+        order = []
+
+        async def sender(request):
+            order.append(request["n"])
+            return None
+
+        queue = DeliveryQueue(str(tmp_path / "queue.db"), sender, workers=1, aging_seconds=0.01)
+        await queue.enqueue({"n": "old-low"}, priority=1)
+        await asyncio.sleep(0.05)
+        await queue.enqueue({"n": "new-high"}, priority=4)
+        await queue.start()
+        await queue.stop(drain_timeout=1)
+
+        assert order == ["old-low", "new-high"]
+
+    asyncio.run(_run())
+
+
+def test_lease_is_renewed_while_a_send_waits(tmp_path):
+    async def _run():
+        path = str(tmp_path / "queue.db")
+        calls = []
+
+        async def slow_sender(request):
+            calls.append(request["n"])
+            await asyncio.sleep(0.3)
+            return None
+
+        queue = DeliveryQueue(path, slow_sender, workers=1, lease_seconds=0.1, poll_interval=0.01)
+        other_worker = DeliveryQueue(path, slow_sender, workers=1, lease_seconds=0.1, poll_interval=0.01)
+        await queue.enqueue({"n": 1})
+        await queue.start()
+        await asyncio.sleep(0.05)
+        await other_worker.start()
+        await asyncio.sleep(0.4)
+        await other_worker.stop(drain_timeout=1)
+        await queue.stop(drain_timeout=1)
+
+        assert calls == [1]
+
+    asyncio.run(_run())
+
+
+def test_finished_items_are_purged_after_retention(tmp_path):
+    async def _run():
+        async def sender(request):
+            if request["n"] == 2:
+                raise PermanentDeliveryError("404")
+            return None
+
+        queue = DeliveryQueue(str(tmp_path / "queue.db"), sender, poll_interval=0.01)
+        ids = [await queue.enqueue({"n": n}) for n in (1, 2)]
+        await queue.start()
+        await queue.stop(drain_timeout=1)
+        pending = await queue.enqueue({"n": 3})
+
+        assert await queue.purge(older_than=3600) == 0
+        assert await queue.purge(older_than=0) == 2
+        assert [await queue.get(delivery_id) for delivery_id in ids] == [None, None]
+        assert (await queue.get(pending))["status"] == "queued"
+
+    asyncio.run(_run())
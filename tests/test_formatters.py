@@ -1,8 +1,9 @@
 import asyncio
+import json
 
-from botbuilder.schema import ChannelAccount, ConversationAccount, ConversationReference
+from botbuilder.schema import Activity, ChannelAccount, ConversationAccount, ConversationReference
 
-from src.teams_gw.conversation_store import ConversationStore
+from src.teams_gw.conversation_store import ConversationStore, SqliteConversationStore, parse_ndjson_lines
 
 
 def build_reference(conversation_id: str, user_id: str, aad_id: str | None = None):
@@ -54,3 +55,168 @@ def test_store_returns_summaries():
         assert any(item["conversation_id"] == "conv-3" for item in summaries)
 
     asyncio.run(_run())
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    async def _run():
+        path = str(tmp_path / "conversations.db")
+        worker_a = SqliteConversationStore(path, sync_interval=60)
+        worker_b = SqliteConversationStore(path, sync_interval=60)
+        await worker_a.remember(build_reference("conv-5", "user-5", "aad-5"))
+
+        # A miss forces worker B to tail the change log even inside the sync interval.
+        by_aad = await worker_b.resolve(aad_object_id="aad-5")
+        assert by_aad.conversation.id == "conv-5"
+        assert by_aad.service_url == "https://example.org"
+
+        await worker_b.remember(build_reference("conv-6", "user-6"))
+        worker_a._last_sync = 0
+        summaries = await worker_a.summaries()
+        assert {item["conversation_id"] for item in summaries} == {"conv-5", "conv-6"}
+
+    asyncio.run(_run())
+
+
+def test_store_export_and_bulk_load_round_trip(tmp_path):
+    async def _run():
+        source = ConversationStore()
+        for idx in range(3):
+            await source.remember(build_reference(f"conv-{idx}", f"user-{idx}", f"aad-{idx}"))
+        records = await source.export()
+
+        snapshot = tmp_path / "refs.ndjson"
+        snapshot.write_text("\n".join(json.dumps(r) for r in records) + "\n\n", encoding="utf-8")
+
+        target = SqliteConversationStore(str(tmp_path / "conversations.db"))
+        assert await target.load_snapshot(str(snapshot)) == 3
+        resolved = await target.resolve(user_id="user-2")
+        assert resolved.conversation.id == "conv-2"
+
+        assert parse_ndjson_lines([b"", b'{"a": 1}']) == [{"a": 1}]
+
+    asyncio.run(_run())
+
+
+def test_store_resolves_many_in_one_pass():
+    async def _run():
+        store = ConversationStore()
+        await store.remember(build_reference("conv-7", "user-7", "aad-7"))
+        await store.remember(build_reference("conv-8", "user-8"))
+
+        resolved = await store.resolve_many(
+            [("conv-8", None, None), (None, None, "aad-7"), (None, "missing", None)]
+        )
+        assert [ref.conversation.id if ref else None for ref in resolved] == ["conv-8", "conv-7", None]
+
+    asyncio.run(_run())
+
+
+def test_store_selects_broadcast_targets(tmp_path):
+    async def _run():
+        store = SqliteConversationStore(str(tmp_path / "conversations.db"))
+        await store.remember(build_reference("conv-a", "user-a", "aad-a"))
+        await store.remember(build_reference("conv-b", "user-b", "aad-b"))
+        await store.set_role_members("gerente", ["aad-b", "aad-unknown"])
+
+        by_tenant = await store.select(tenant_id="tenant-123")
+        assert {ref.conversation.id for ref in by_tenant} == {"conv-a", "conv-b"}
+        by_role = await store.select(roles=["gerente"])
+        assert [ref.conversation.id for ref in by_role] == ["conv-b"]
+        mixed = await store.select(aad_object_ids=["aad-a"], roles=["gerente"], tenant_id="other")
+        assert mixed == []
+        assert await store.select(roles=["unregistered"], tenant_id="tenant-123") == []
+
+        other_worker = SqliteConversationStore(str(tmp_path / "conversations.db"))
+        assert await other_worker.role_members() == {"gerente": ["aad-b", "aad-unknown"]}
+
+    asyncio.run(_run())
+
+
+def test_sqlite_store_reloads_roles_only_when_their_version_moves(tmp_path):
+    async def _run():
+        path = str(tmp_path / "conversations.db")
+        writer = SqliteConversationStore(path)
+        reader = SqliteConversationStore(path, sync_interval=0)
+        await writer.set_role_members("gerente", ["aad-a"])
+        assert await reader.role_members() == {"gerente": ["aad-a"]}
+
+        # A row changed behind the version is not picked up: the table is not re-read on every sync.
+        writer._conn.execute("DELETE FROM role_members")
+        assert await reader.role_members() == {"gerente": ["aad-a"]}
+
+        await writer.set_role_members("gerente", ["aad-b"])
+        assert await reader.role_members() == {"gerente": ["aad-b"]}
+
+    asyncio.run(_run())
+
+
+def test_store_takes_tenant_from_teams_channel_data():
+    async def _run():
+        store = ConversationStore()
+        activity = Activity().deserialize(
+            {
+                "type": "message",
+                "serviceUrl": "https://smba.trafficmanager.net/amer/",
+                "channelId": "msteams",
+                "conversation": {"id": "conv-t"},
+                "from": {"id": "user-t"},
+                "recipient": {"id": "bot-id"},
+                "channelData": {"tenant": {"id": "tenant-xyz"}},
+            }
+        )
+        stored = await store.remember(activity)
+        assert stored.tenant_id == "tenant-xyz"
+
+    asyncio.run(_run())
+
+
+def test_sqlite_store_selects_tenant_after_bulk_load(tmp_path):
+    async def _run():
+        store = SqliteConversationStore(str(tmp_path / "conversations.db"), sync_interval=60)
+        records = [build_reference(f"conv-{idx}", f"user-{idx}").serialize() for idx in range(2)]
+        assert await store.bulk_load(records) == 2
+
+        by_tenant = await store.select(tenant_id="tenant-123")
+        assert {ref.conversation.id for ref in by_tenant} == {"conv-0", "conv-1"}
+
+    asyncio.run(_run())
+
+
+def test_bulk_load_updates_the_indexes_of_replaced_references():
+    async def _run():
+        store = ConversationStore()
+        await store.bulk_load([build_reference(f"conv-{idx}", f"user-{idx}") for idx in range(3)])
+        moved = build_reference("conv-0", "user-new")
+        moved.conversation.tenant_id = "tenant-456"
+        assert await store.bulk_load([moved]) == 1
+
+        assert await store.resolve(user_id="user-0") is None
+        assert (await store.resolve(user_id="user-new")).conversation.id == "conv-0"
+        assert {ref.conversation.id for ref in await store.select(tenant_id="tenant-123")} == {"conv-1", "conv-2"}
+        assert [ref.conversation.id for ref in await store.select(tenant_id="tenant-456")] == ["conv-0"]
+
+    asyncio.run(_run())
+
+
+def test_snapshot_does_not_overwrite_newer_references(tmp_path):
+    async def _run():
+        path = str(tmp_path / "conversations.db")
+        snapshot = tmp_path / "refs.ndjson"
+        old = build_reference("conv-s", "user-s")
+        snapshot.write_text(
+            "\n".join(json.dumps(r.serialize()) for r in (old, build_reference("conv-new", "user-n"))),
+            encoding="utf-8",
+        )
+        worker_a = SqliteConversationStore(path, sync_interval=60)
+        newer = build_reference("conv-s", "user-s")
+        newer.service_url = "https://newer.example.org"
+        await worker_a.remember(newer)
+
+        worker_b = SqliteConversationStore(path, sync_interval=60)
+        assert await worker_b.load_snapshot(str(snapshot)) == 1
+        assert (await worker_b.resolve(conversation_id="conv-s")).service_url == "https://newer.example.org"
+        reopened = SqliteConversationStore(path)
+        assert (await reopened.resolve(conversation_id="conv-s")).service_url == "https://newer.example.org"
+        assert await reopened.resolve(conversation_id="conv-new") is not None
+
+    asyncio.run(_run())
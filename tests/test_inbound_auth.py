@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+from botbuilder.core import BotFrameworkAdapter, BotFrameworkAdapterSettings
+from botbuilder.schema import Activity
+from botframework.connector.auth import ClaimsIdentity
+
+from src.teams_gw.adapter import GatewayAdapter
+from src.teams_gw.dedup import TimedDedupCache
+from src.teams_gw.inbound_auth import OpenIdMetadata, SigningKey
+
+
+class RotatingMetadata(OpenIdMetadata):
+    def __init__(self, key_sets, **kwargs):
+        super().__init__("https://login.botframework.com/v1/.well-known/openidconfiguration", **kwargs)
+        self._key_sets = list(key_sets)
+
+    async def _fetch(self):
+        await asyncio.sleep(0.01)
+        self._keys = {kid: SigningKey(f"public-{kid}", ["msteams"]) for kid in self._key_sets.pop(0)}
+        self.last_updated = time.time()
+        self.refreshes += 1
+
+
+def test_metadata_fetches_once_and_refreshes_on_rotated_key():
+    async def _run():
+        metadata = RotatingMetadata([["k1"], ["k1", "k2"]], unknown_kid_interval=0)
+        keys = await asyncio.gather(*(metadata.get("k1") for _ in range(10)))
+        assert {key.public_key for key in keys} == {"public-k1"}
+        assert metadata.refreshes == 1
+
+        assert (await metadata.get("k2")).public_key == "public-k2"
+        assert metadata.refreshes == 2
+
+    asyncio.run(_run())
+
+
+def test_unknown_key_refresh_is_rate_limited():
+    async def _run():
+        metadata = RotatingMetadata([["k1"]], unknown_kid_interval=300)
+        await metadata.get("k1")
+        with pytest.raises(PermissionError):
+            await metadata.get("k9")
+        assert metadata.refreshes == 1
+
+    asyncio.run(_run())
+
+
+def test_adapter_caches_validated_identity_until_exp(monkeypatch):
+    calls = []
+
+    async def validate(self, request, auth_header):
+        calls.append(auth_header)
+        return ClaimsIdentity({"aud": "app", "exp": time.time() + 60}, True)
+
+    monkeypatch.setattr(BotFrameworkAdapter, "_authenticate_request", validate)
+
+    async def _run():
+        adapter = GatewayAdapter(BotFrameworkAdapterSettings("app", "pw"), auth_cache=TimedDedupCache(ttl=3600))
+        activity = Activity(channel_id="msteams", service_url="https://smba.trafficmanager.net/amer/")
+        first = await adapter.authenticate(activity, "Bearer a")
+        assert await adapter.authenticate(activity, "Bearer a") is first
+        await adapter.authenticate(activity, "Bearer b")
+        other_region = Activity(channel_id="msteams", service_url="https://smba.trafficmanager.net/emea/")
+        await adapter.authenticate(other_region, "Bearer a")
+        assert calls == ["Bearer a", "Bearer b", "Bearer a"]
+        assert adapter.auth_cache.hits == 1
+
+    asyncio.run(_run())
@@ -0,0 +1,62 @@
+import io
+import json
+import logging
+
+from src.teams_gw.logs import JsonFormatter, LogPipeline, LogSampler
+
+
+def _record(name, level=logging.INFO, msg="hola %s", args=("mundo",), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_sampler_keeps_one_in_n_info_and_every_warning():
+    sampler = LogSampler(sample_every={"teams_gw.access": 5})
+    kept = [sampler.filter(_record("teams_gw.access")) for _ in range(20)]
+    assert kept.count(True) == 4
+    assert all(sampler.filter(_record("teams_gw.access", logging.ERROR)) for _ in range(5))
+    assert all(sampler.filter(_record("teams_gw.app")) for _ in range(5))
+    assert sampler.dropped == 16
+
+
+def test_rate_limit_applies_to_child_loggers():
+    sampler = LogSampler(rate_limits={"teams_gw": 3})
+    kept = [sampler.filter(_record("teams_gw.bot")) for _ in range(10)]
+    assert kept.count(True) == 3
+
+
+def test_json_formatter_flattens_access_fields_and_truncates():
+    line = JsonFormatter(max_chars=8).format(_record("teams_gw.access", access={"status": 200, "convo": "c1"}))
+    data = json.loads(line)
+    assert data["logger"] == "teams_gw.access"
+    assert data["msg"].startswith("hola mun")
+    assert (data["status"], data["convo"]) == (200, "c1")
+
+
+def test_json_formatter_keeps_core_fields_when_extras_collide():
+    record = _record("teams_gw.access", access={"level": "tenant", "msg": "x", "status": 200}, logger="other")
+    data = json.loads(JsonFormatter().format(record))
+    assert (data["level"], data["msg"], data["logger"]) == ("INFO", "hola mundo", "teams_gw.access")
+    assert (data["access.level"], data["access.msg"], data["extra.logger"], data["status"]) == ("tenant", "x", "other", 200)
+
+
+def test_pipeline_writes_from_listener_thread_and_restores_handlers():
+    stream = io.StringIO()
+    logger = logging.getLogger("teams_gw.test_logs")
+    logger.propagate = False
+    pipeline = LogPipeline(stream=stream, sample_every={"teams_gw.test_logs": 2})
+    pipeline.install(logger)
+    for n in range(4):
+        logger.info("evento %s", n)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("falló")
+    pipeline.stop()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["msg"] for line in lines] == ["evento 0", "evento 2", "falló"]
+    assert "ValueError: boom" in lines[-1]["exc"]
+    assert pipeline.stats()["sampled_out"] == 2
+    assert logger.handlers == []
@@ -0,0 +1,50 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from src.teams_gw.ratelimit import OutboundRateLimiter, TokenBucket, region_key, retry_after_seconds
+
+
+class Throttled(Exception):
+    def __init__(self, retry_after):
+        super().__init__("429")
+        self.response = SimpleNamespace(status_code=429, headers={"Retry-After": retry_after})
+
+
+def test_region_key_uses_first_path_segment():
+    assert region_key("https://smba.trafficmanager.net/amer/") == "smba.trafficmanager.net/amer"
+    assert region_key("https://smba.trafficmanager.net") == "smba.trafficmanager.net"
+    assert region_key(None) == ""
+
+
+def test_bucket_allows_burst_then_spaces_out():
+    bucket = TokenBucket(rate=10, capacity=2)
+    now = bucket.updated
+    assert bucket.reserve(now) == 0
+    assert bucket.reserve(now) == 0
+    assert abs(bucket.reserve(now) - 0.1) < 1e-9
+    assert abs(bucket.reserve(now) - 0.2) < 1e-9
+
+
+def test_retry_after_is_parsed_only_for_429():
+    assert retry_after_seconds(Throttled("2")) == 2.0
+    assert retry_after_seconds(RuntimeError("boom")) is None
+
+
+def test_limiter_honors_retry_after_and_retries():
+    async def _run():
+        limiter = OutboundRateLimiter(max_retries=2)
+        calls = []
+
+        async def operation():
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise Throttled("0.05")
+            return "ok"
+
+        assert await limiter.call("conv-1", "https://smba.trafficmanager.net/amer/", operation) == "ok"
+        assert len(calls) == 2
+        assert calls[1] - calls[0] >= 0.04
+        assert limiter.throttled == 1
+
+    asyncio.run(_run())
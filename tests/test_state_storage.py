@@ -0,0 +1,53 @@
+import asyncio
+
+from src.teams_gw.state_storage import BoundedStateStorage, SqliteStateStorage
+
+
+def test_memory_storage_evicts_lru_and_skips_unchanged_writes():
+    async def _run():
+        storage = BoundedStateStorage(max_items=2)
+        await storage.write({"a": {"n": 1}, "b": {"n": 2}})
+        state = (await storage.read(["a"]))["a"]
+        state["n"] = 99  # reads are copies
+        await storage.write({"a": {"n": 1}})
+        await storage.write({"c": {"n": 3}})
+
+        assert await storage.read(["a", "b", "c"]) == {"a": {"n": 1}, "c": {"n": 3}}
+        assert (await storage.stats())["skipped_writes"] == 1
+        await storage.delete(["a"])
+        assert await storage.read(["a"]) == {}
+
+    asyncio.run(_run())
+
+
+def test_memory_storage_expires_idle_items(monkeypatch):
+    async def _run():
+        storage = BoundedStateStorage(ttl=60)
+        await storage.write({"a": {"n": 1}})
+        clock = __import__("time").monotonic() + 61
+        monkeypatch.setattr("src.teams_gw.state_storage.time.monotonic", lambda: clock)
+        assert await storage.read(["a"]) == {}
+
+    asyncio.run(_run())
+
+
+def test_sqlite_storage_survives_restart(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    async def _run():
+        first = SqliteStateStorage(path, max_items=1)
+        await first.write({"convo/1": {"step": "ticket", "ids": [147]}, "convo/2": {"step": None}})
+        await first.write({"convo/2": {"step": None}})
+        assert (await first.stats())["skipped_writes"] == 1
+        first.close()
+
+        second = SqliteStateStorage(path, max_items=1)
+        assert await second.read(["convo/1", "convo/2"]) == {
+            "convo/1": {"step": "ticket", "ids": [147]},
+            "convo/2": {"step": None},
+        }
+        await second.delete(["convo/1"])
+        assert (await second.stats())["rows"] == 1
+        second.close()
+
+    asyncio.run(_run())
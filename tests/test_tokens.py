@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from msal import TokenCache
+
+from src.teams_gw.refresh import PeriodicRefresher
+from src.teams_gw.tokens import AppTokenProvider, AppTokenRegistry, TokenRefresher, TokenUnavailable
+
+
+class FakeMsalApp:
+    def __init__(self, expires_in=3600, delay=0.05):
+        self.token_cache = TokenCache()
+        self.calls = 0
+        self.threads = set()
+        self._expires_in = expires_in
+        self._delay = delay
+
+    def acquire_token_for_client(self, scopes):
+        self.calls += 1
+        self.threads.add(threading.get_ident())
+        time.sleep(self._delay)
+        return {"access_token": f"token-{self.calls}", "expires_in": self._expires_in}
+
+
+def _provider(app):
+    provider = AppTokenProvider("app-id", "secret", "https://login.microsoftonline.com/tenant", "https://api.botframework.com/.default")
+    provider._msal_app = app
+    return provider
+
+
+def test_concurrent_async_requests_share_one_acquisition_off_the_loop():
+    async def _run():
+        app = FakeMsalApp()
+        provider = _provider(app)
+        tokens = await asyncio.gather(*(provider.get_token_async() for _ in range(20)))
+        assert set(tokens) == {"token-1"}
+        assert app.calls == 1
+        assert threading.get_ident() not in app.threads
+        assert provider.get_token() == "token-1"
+
+    asyncio.run(_run())
+
+
+def test_sync_access_on_the_loop_never_runs_msal_inline():
+    async def _run():
+        app = FakeMsalApp()
+        provider = _provider(app)
+        with pytest.raises(TokenUnavailable):
+            provider.get_token()  # cold: fail fast, refresh scheduled
+        assert await provider.get_token_async() == "token-1"
+        assert app.calls == 1
+
+        provider._expires_at = time.time() + 120  # inside the 300 s margin, still valid
+        assert provider.get_token() == "token-1"
+        assert await provider._inflight == "token-2"
+        assert provider.get_token() == "token-2"
+        assert app.calls == 2
+        assert threading.get_ident() not in app.threads
+
+    asyncio.run(_run())
+
+
+def test_refresher_renews_tokens_inside_the_refresh_window():
+    async def _run():
+        app = FakeMsalApp()
+        provider = _provider(app)
+        refresher = TokenRefresher(refresh_ahead=600)
+        refresher.track(provider)
+
+        await refresher.refresh_due()
+        assert app.calls == 0  # nothing issued yet, nothing to renew
+
+        assert await provider.get_token_async() == "token-1"
+        await refresher.refresh_due()
+        assert app.calls == 1  # fresh token, not due yet
+
+        provider._issued_at -= 3200
+        provider._expires_at -= 3200  # 400 s left: inside the 600 s window
+        await refresher.refresh_due()
+        assert app.calls == 2
+        assert provider.cached() == "token-2"
+
+    asyncio.run(_run())
+
+
+def test_registry_shares_providers_and_persists_the_msal_cache(tmp_path):
+    cache_path = tmp_path / "msal-cache.json"
+    registry = AppTokenRegistry(cache_path=str(cache_path))
+    provider = registry.provider("app-id", "secret", "tenant", "https://api.botframework.com/.default")
+    assert registry.provider("app-id", "other-secret", "tenant", "https://api.botframework.com/.default") is provider
+    assert registry.provider("app-id", "secret", "other-tenant", "https://api.botframework.com/.default") is not provider
+
+    registry._cache.add(
+        {
+            "client_id": "app-id",
+            "scope": ["https://api.botframework.com/.default"],
+            "token_endpoint": "https://login.microsoftonline.com/tenant/oauth2/v2.0/token",
+            "response": {"access_token": "persisted", "expires_in": 3600, "token_type": "Bearer"},
+        }
+    )
+    registry._persist()
+    assert cache_path.stat().st_mode & 0o777 == 0o600
+
+    restored = AppTokenRegistry(cache_path=str(cache_path))
+    tokens = restored._cache.search(restored._cache.CredentialType.ACCESS_TOKEN, query={"client_id": "app-id"})
+    assert [item["secret"] for item in tokens] == ["persisted"]
+
+
+def test_periodic_refresher_requires_refresh_due():
+    class Incomplete(PeriodicRefresher):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_forced_refresh_only_purges_its_own_tenant_from_the_shared_cache():
+    registry = AppTokenRegistry()
+    scope = "https://api.botframework.com/.default"
+    for tenant in ("tenant-a", "tenant-b"):
+        registry._cache.add(
+            {
+                "client_id": "app-id",
+                "scope": [scope],
+                "token_endpoint": f"https://login.microsoftonline.com/{tenant}/oauth2/v2.0/token",
+                "response": {"access_token": f"cached-{tenant}", "expires_in": 3600, "token_type": "Bearer"},
+            }
+        )
+    provider = registry.provider("app-id", "secret", "tenant-a", scope)
+    provider._msal_app = FakeMsalApp(delay=0)
+    provider._msal_app.token_cache = registry._cache
+
+    assert provider._acquire(force=True) == "token-1"
+    remaining = registry._cache.search(registry._cache.CredentialType.ACCESS_TOKEN, query={"client_id": "app-id"})
+    assert [item["secret"] for item in remaining] == ["cached-tenant-b"]
+
+
+def test_periodic_refresher_loops_until_stopped():
+    async def _run():
+        class Counter(PeriodicRefresher):
+            def __init__(self):
+                super().__init__(min_sleep=0.01, max_sleep=0.02)
+                self.calls = 0
+
+            async def refresh_due(self):
+                self.calls += 1
+                return 3600
+
+        counter = Counter()
+        counter.start()
+        await asyncio.sleep(0.1)
+        await counter.stop()
+        calls = counter.calls
+        await asyncio.sleep(0.05)
+        assert 3 <= calls == counter.calls
+
+    asyncio.run(_run())
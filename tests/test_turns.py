@@ -0,0 +1,75 @@
+import asyncio
+
+from src.teams_gw.turns import TurnExecutor
+
+
+def test_same_conversation_runs_in_order_and_others_in_parallel():
+    async def _run():
+        executor = TurnExecutor(concurrency=4)
+        order = []
+        active = 0
+        peak = 0
+
+        def turn(key, n):
+            async def _turn():
+                nonlocal active, peak
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01 * (3 - n))
+                order.append((key, n))
+                active -= 1
+
+            return _turn
+
+        for n in range(3):
+            for key in ("a", "b"):
+                assert executor.submit(key, turn(key, n))
+        await executor.drain(5)
+
+        assert [n for key, n in order if key == "a"] == [0, 1, 2]
+        assert [n for key, n in order if key == "b"] == [0, 1, 2]
+        assert peak == 2
+        stats = executor.stats()
+        assert stats["completed"] == 6 and stats["pending"] == 0
+        assert stats["turn_latency"]["count"] == 6
+
+    asyncio.run(_run())
+
+
+def test_full_executor_rejects_and_failures_are_counted():
+    async def _run():
+        executor = TurnExecutor(max_pending=2)
+
+        async def boom():
+            raise RuntimeError("boom")
+
+        async def ok():
+            return None
+
+        assert executor.submit("a", boom)
+        assert executor.submit("b", ok)
+        assert not executor.submit("c", ok)
+        await executor.drain(5)
+        stats = executor.stats()
+        assert (stats["completed"], stats["failed"], stats["rejected"]) == (1, 1, 1)
+        assert executor.submit("c", ok)
+        await executor.drain(5)
+
+    asyncio.run(_run())
+
+
+def test_drain_cancels_turns_past_the_timeout():
+    async def _run():
+        executor = TurnExecutor()
+
+        async def slow():
+            await asyncio.sleep(10)
+
+        executor.submit("a", slow)
+        executor.submit("a", slow)
+        await asyncio.sleep(0)
+        await executor.drain(0.05)
+        assert executor.pending == 0
+        assert executor.stats()["conversations"] == 0
+
+    asyncio.run(_run())